@@ -3,14 +3,27 @@ StudyPal AI OS - FastAPI Backend
 Complete local AI system for intelligent study assistance
 """
 
+import asyncio
 import logging
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 # Import routers
-from routes import audio_routes, material_routes, ai_routes
+from routes import audio_routes, material_routes, ai_routes, job_routes
 from routes import ai_routes_v2  # New intelligent AI system
+from services.executor_service import (
+    get_execution_service, run_in_pool, shutdown_execution_service,
+    ENCODER_POOL, WHISPER_POOL, LLM_POOL, STORAGE_POOL
+)
+from services.ollama_service import shutdown_ollama_service
+from services.whisper_service import shutdown_whisper_service
+from services.whisper_models import get_whisper_models, sweep_idle_tiers
+from services.response_cache import get_response_cache
+from services.transcript_cache import get_transcript_cache
+import services.reranker as reranker_service
+from services.job_queue import get_job_queue
+from services.ingestion_jobs import register_ingestion_jobs
 
 # Configure logging
 logging.basicConfig(
@@ -33,11 +46,22 @@ async def lifespan(app: FastAPI):
     
     # Pre-load services (lazy initialization will happen on first use)
     logger.info("Services will be initialized on first request")
-    logger.info("- Whisper: Speech to Text (base model)")
+    logger.info("- Whisper: Speech to Text (tiered models, warm tiers load in background)")
     logger.info("- Qdrant: Vector Memory (localhost:6333)")
     logger.info("- Ollama: AI Brain (Mixtral + Qwen)")
     logger.info("- Embeddings: sentence-transformers/all-MiniLM-L6-v2")
     
+    # Background job workers (resumes jobs interrupted by the last shutdown)
+    job_queue = get_job_queue()
+    register_ingestion_jobs(job_queue)
+    await job_queue.start()
+    
+    # Load warm Whisper tiers without delaying startup
+    warm_up = asyncio.create_task(run_in_pool(WHISPER_POOL, get_whisper_models().warm_up))
+    
+    # Free idle Whisper tiers under memory pressure even when no requests arrive
+    whisper_sweep = asyncio.create_task(sweep_idle_tiers())
+    
     logger.info("=" * 60)
     logger.info("✅ Backend ready at http://localhost:8000")
     logger.info("📚 API docs at http://localhost:8000/docs")
@@ -47,6 +71,13 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("🛑 Shutting down StudyPal AI OS Backend")
+    await job_queue.stop()
+    if not warm_up.done():
+        warm_up.cancel()
+    whisper_sweep.cancel()
+    shutdown_ollama_service()
+    shutdown_whisper_service()
+    shutdown_execution_service()
 
 
 # Create FastAPI application
@@ -123,6 +154,7 @@ app.include_router(audio_routes.router)
 app.include_router(material_routes.router)
 app.include_router(ai_routes.router)
 app.include_router(ai_routes_v2.router)  # New intelligent AI system
+app.include_router(job_routes.router)
 
 
 # Root endpoint
@@ -141,13 +173,31 @@ async def root():
             "ask": "/ai/ask",
             "intelligent_ask": "/ai/intelligent-ask",  # New intelligent endpoint
             "flashcards": "/ai/flashcards/generate",
-            "study_plan": "/ai/plan/create"
+            "study_plan": "/ai/plan/create",
+            "jobs": "/jobs/{job_id}"
         },
         "docs": "/docs",
         "health": "/health"
     }
 
 
+def cache_stats(memory_service) -> dict:
+    """Hit rates and sizes of the response, transcript and embedding caches."""
+    stats = {
+        "llm_responses": get_response_cache().stats()
+    }
+    transcript_cache = get_transcript_cache()
+    if transcript_cache is not None:
+        stats["transcripts"] = transcript_cache.stats()
+    if memory_service is not None:
+        stats["query_embeddings"] = memory_service.query_cache.stats()
+        if memory_service.embedding_store is not None:
+            stats["embedding_store"] = memory_service.embedding_store.stats()
+        if memory_service.sparse_index is not None:
+            stats["sparse_index"] = memory_service.sparse_index.stats()
+    return stats
+
+
 @app.get("/health")
 async def health_check():
     """
@@ -157,7 +207,6 @@ async def health_check():
     try:
         from services.memory_service import get_memory_service
         from services.ollama_service import get_ollama_service
-        from services.whisper_service import get_whisper_service
         import requests
         
         health_status = {
@@ -167,12 +216,16 @@ async def health_check():
         }
         
         # Check Qdrant (Memory Service)
+        memory_service = None
         try:
-            memory = get_memory_service()
-            stats = memory.get_collection_stats()
+            # First call loads the embedding model; keep it off the event loop
+            memory = await run_in_pool(ENCODER_POOL, get_memory_service)
+            memory_service = memory
+            stats = await run_in_pool(STORAGE_POOL, memory.get_collection_stats)
             health_status["services"]["qdrant"] = {
                 "status": "healthy",
-                "connected": True,
+                "connected": memory.backend == "qdrant",
+                "backend": memory.backend,
                 "collection": stats.get("collection_name", "studypal"),
                 "vectors_count": stats.get("vectors_count", 0),
                 "url": "http://localhost:6333"
@@ -187,10 +240,10 @@ async def health_check():
         
         # Check Ollama
         try:
-            ollama = get_ollama_service()
+            ollama = await run_in_pool(LLM_POOL, get_ollama_service)
             # Try to get available models
             try:
-                response = requests.get("http://localhost:11434/api/tags", timeout=2)
+                response = await run_in_pool(LLM_POOL, requests.get, "http://localhost:11434/api/tags", timeout=2)
                 if response.status_code == 200:
                     models_data = response.json().get("models", [])
                     model_names = [m.get("name", "") for m in models_data]
@@ -198,7 +251,8 @@ async def health_check():
                         "status": "healthy",
                         "connected": True,
                         "models": model_names,
-                        "url": "http://localhost:11434"
+                        "url": "http://localhost:11434",
+                        "concurrency": ollama.stats()
                     }
                 else:
                     health_status["services"]["ollama"] = {
@@ -220,14 +274,15 @@ async def health_check():
                 "error": str(e)
             }
         
-        # Check Whisper
+        # Check Whisper (model manager state only; never takes a transcription slot)
         try:
-            whisper = get_whisper_service()
+            whisper = await run_in_pool(STORAGE_POOL, get_whisper_models().health)
             health_status["services"]["whisper"] = {
-                "status": "healthy",
-                "loaded": True,
-                "model": "base"
+                "status": "healthy" if whisper["loaded"] else "degraded",
+                **whisper
             }
+            if not whisper["loaded"]:
+                health_status["services"]["whisper"]["message"] = "Default model not loaded yet (loads on first use)"
         except Exception as e:
             health_status["services"]["whisper"] = {
                 "status": "unhealthy",
@@ -235,6 +290,19 @@ async def health_check():
                 "error": str(e)
             }
         
+        # Execution pools (queue depth and wait time per pool)
+        health_status["execution"] = get_execution_service().stats()
+        
+        # Background job queue
+        health_status["jobs"] = await run_in_pool(STORAGE_POOL, get_job_queue().stats)
+        
+        # Cross-encoder re-ranking (only once loaded)
+        if reranker_service.reranker is not None:
+            health_status["rerank"] = reranker_service.reranker.stats()
+        
+        # Cache hit rates (SQLite-backed stats are read on the storage pool)
+        health_status["cache"] = await run_in_pool(STORAGE_POOL, cache_stats, memory_service)
+        
         # Determine overall status
         service_statuses = [svc.get("status") for svc in health_status["services"].values()]
         if all(s == "healthy" for s in service_statuses):
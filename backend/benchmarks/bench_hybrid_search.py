@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Benchmark: dense-only vs hybrid (BM25 + dense, RRF) retrieval
+Builds a synthetic multi-course corpus in a throwaway collection and reports
+recall@k and search latency for exact-term queries (course codes, acronyms,
+formula names) and paraphrased concept queries
+
+Usage (from backend/):
+    python benchmarks/bench_hybrid_search.py --chunks 5000 --queries 200
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+# Throwaway collections' keyword index files go to a temp dir, not the cache dir
+os.environ.setdefault("SPARSE_INDEX_DIR", tempfile.mkdtemp())
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.memory_service import MemoryService  # noqa: E402
+
+DEPARTMENTS = ["CS", "MATH", "PHYS", "CHEM", "BIO", "ECON"]
+CONCEPTS = [
+    ("deadlock", "processes wait forever on each other's locks"),
+    ("paging", "memory is split into fixed-size frames mapped by a page table"),
+    ("entropy", "a measure of disorder in a thermodynamic system"),
+    ("eigenvalue", "a scalar that a linear map stretches its eigenvector by"),
+    ("osmosis", "water diffuses across a membrane toward higher solute concentration"),
+    ("inflation", "the general price level rises and purchasing power falls"),
+    ("recursion", "a function is defined in terms of itself on smaller inputs"),
+    ("catalysis", "a substance speeds up a reaction without being consumed"),
+]
+
+
+def acronym(rng: random.Random) -> str:
+    return "".join(rng.choice("ABCDEFGHJKLMNPQRSTUVWXYZ") for _ in range(4))
+
+
+def synthetic_corpus(n: int, seed: int = 7):
+    """
+    Chunks that each carry a unique course code, acronym and named formula.
+
+    Returns:
+        (items, targets) where targets[i] = (course_code, acronym, formula, concept)
+    """
+    rng = random.Random(seed)
+    items, targets = [], []
+    for i in range(n):
+        course = f"{rng.choice(DEPARTMENTS)}-{100 + i}"
+        name = acronym(rng)
+        formula = f"{rng.choice(['Varga', 'Okafor', 'Lindqvist', 'Haber', 'Moreau'])}-{i} identity"
+        concept, definition = CONCEPTS[i % len(CONCEPTS)]
+        text = (f"In {course} we study the {name} method. The {formula} relates it to {concept}: "
+                f"{definition}. Section {i % 40} lists worked examples and exam pitfalls.")
+        items.append({"text": text, "metadata": {"course": course, "source": "benchmark"}})
+        targets.append((course, name, formula, concept))
+    return items, targets
+
+
+def queries_for(targets, n: int, seed: int = 11):
+    """(query, target index, kind) tuples."""
+    rng = random.Random(seed)
+    queries = []
+    for _ in range(n):
+        i = rng.randrange(len(targets))
+        course, name, formula, _ = targets[i]
+        kind = rng.choice(["course code", "acronym", "formula"])
+        query = {
+            "course code": f"What do we study in {course}?",
+            "acronym": f"Explain the {name} method",
+            "formula": f"What does the {formula} say?"
+        }[kind]
+        queries.append((query, i, kind))
+    return queries
+
+
+def run(memory: MemoryService, queries, point_ids, top_k: int):
+    """Recall@k per query kind and latency percentiles (ms)."""
+    hits, totals, latencies = {}, {}, []
+    for query, target, kind in queries:
+        start = time.perf_counter()
+        results = memory.search(query, top_k=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = point_ids[target] in {str(r["id"]) for r in results}
+        hits[kind] = hits.get(kind, 0) + found
+        totals[kind] = totals.get(kind, 0) + 1
+    latencies.sort()
+    recall = {kind: hits[kind] / totals[kind] for kind in totals}
+    recall["all"] = sum(hits.values()) / len(queries)
+    return recall, statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--qdrant-url", default="http://localhost:6333")
+    args = parser.parse_args()
+
+    collection = f"studypal_bench_{uuid.uuid4().hex[:8]}"
+    memory = MemoryService(qdrant_url=args.qdrant_url, collection_name=collection)
+    sparse_index = memory.sparse_index
+    if sparse_index is None:
+        sys.exit("Hybrid search is disabled (HYBRID_SEARCH=0)")
+
+    try:
+        items, targets = synthetic_corpus(args.chunks)
+        start = time.perf_counter()
+        point_ids = memory.add_items_batch(items)
+        print(f"corpus: {len(items)} chunks ingested in {time.perf_counter() - start:.1f}s "
+              f"(sparse index {sparse_index.stats()['size_bytes'] / 1e6:.1f} MB)")
+
+        queries = queries_for(targets, args.queries)
+        memory.search("warm up", top_k=args.top_k)
+
+        for label, index in (("dense only", None), ("hybrid RRF", sparse_index)):
+            memory.sparse_index = index
+            recall, p50, p95 = run(memory, queries, point_ids, args.top_k)
+            by_kind = "  ".join(f"{kind} {value:.2f}" for kind, value in recall.items())
+            print(f"{label:11s}: recall@{args.top_k} {by_kind}  |  p50 {p50:.1f} ms  p95 {p95:.1f} ms")
+    finally:
+        memory.sparse_index = sparse_index
+        memory.client.delete_collection(collection_name=collection)
+
+
+if __name__ == "__main__":
+    main()
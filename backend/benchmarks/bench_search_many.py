@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Benchmark: sequential search() calls vs one search_many() call
+Fans out N queries (like exam simulation subtopics) over a synthetic corpus
+in a throwaway collection and reports wall time per fan-out for both paths.
+The query embedding cache is disabled so every run pays for encoding.
+
+Usage (from backend/):
+    python benchmarks/bench_search_many.py --chunks 5000 --fanout 4 8 16 --rounds 20
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+
+# Throwaway collections' keyword index files go to a temp dir, not the cache dir
+os.environ.setdefault("SPARSE_INDEX_DIR", tempfile.mkdtemp())
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.memory_service import MemoryService, QueryEmbeddingCache  # noqa: E402
+
+SUBJECTS = ["deadlock", "paging", "scheduling", "entropy", "enthalpy", "eigenvalues",
+            "recursion", "hashing", "osmosis", "inflation", "catalysis", "induction"]
+ASPECTS = ["definition", "causes", "worked example", "common exam mistakes", "comparison", "proof sketch"]
+
+
+def synthetic_corpus(n: int):
+    """Short study notes over SUBJECTS x ASPECTS."""
+    return [
+        {
+            "text": f"Note {i}: {ASPECTS[i % len(ASPECTS)]} of {SUBJECTS[i % len(SUBJECTS)]}, "
+                    f"section {i // len(SUBJECTS)} with details for revision.",
+            "metadata": {"course": "BENCH", "source": "benchmark"}
+        }
+        for i in range(n)
+    ]
+
+
+def fanout_queries(fanout: int, round_index: int):
+    """Distinct subtopic queries per round so the encoder always runs."""
+    return [
+        f"{SUBJECTS[(round_index + i) % len(SUBJECTS)]}: {ASPECTS[i % len(ASPECTS)]} (round {round_index})"
+        for i in range(fanout)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=5000)
+    parser.add_argument("--fanout", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--qdrant-url", default="http://localhost:6333")
+    args = parser.parse_args()
+
+    collection = f"studypal_bench_{uuid.uuid4().hex[:8]}"
+    memory = MemoryService(qdrant_url=args.qdrant_url, collection_name=collection)
+    memory.query_cache = QueryEmbeddingCache(max_entries=0)
+    print(f"backend: {memory.backend}")
+
+    try:
+        start = time.perf_counter()
+        memory.add_items_batch(synthetic_corpus(args.chunks))
+        print(f"corpus: {args.chunks} chunks ingested in {time.perf_counter() - start:.1f}s")
+        memory.search("warm up", top_k=args.top_k)
+
+        for fanout in args.fanout:
+            sequential, batched, mismatches = [], [], 0
+            for round_index in range(args.rounds):
+                queries = fanout_queries(fanout, round_index)
+
+                start = time.perf_counter()
+                one_by_one = [memory.search(query, top_k=args.top_k) for query in queries]
+                sequential.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                together = memory.search_many(queries, top_k=args.top_k)
+                batched.append((time.perf_counter() - start) * 1000)
+
+                mismatches += sum(
+                    [r["id"] for r in a] != [r["id"] for r in b] for a, b in zip(one_by_one, together)
+                )
+
+            seq_ms, batch_ms = statistics.median(sequential), statistics.median(batched)
+            print(f"fan-out {fanout:3d}: sequential {seq_ms:7.1f} ms  search_many {batch_ms:7.1f} ms  "
+                  f"speedup {seq_ms / batch_ms:.2f}x  result mismatches {mismatches}")
+    finally:
+        memory.client.delete_collection(collection_name=collection)
+
+
+if __name__ == "__main__":
+    main()
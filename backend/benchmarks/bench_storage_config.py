@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Qdrant vector storage settings
+Loads the same clustered 384-d corpus into one throwaway collection per
+setting (float32 / scalar int8 / binary, in RAM or on disk, HNSW m and
+ef_construct) and reports estimated vector RAM, search latency and
+recall@k against exact search
+
+Usage (from backend/):
+    python benchmarks/bench_storage_config.py --points 100000 --queries 200
+    python benchmarks/bench_storage_config.py --hnsw 16:100 32:200
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+import uuid
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from qdrant_client import QdrantClient  # noqa: E402
+from qdrant_client.models import (  # noqa: E402
+    VectorParams, PointStruct, PayloadSchemaType, SearchParams, CollectionStatus,
+    QuantizationSearchParams
+)
+from services.memory_service import (  # noqa: E402
+    VECTOR_SIZE, DISTANCE_METRIC, TENANT_FIELD, HNSW_EF_CONSTRUCT,
+    quantization_config, hnsw_config, search_params, metadata_filter
+)
+
+# (label, quantization, vectors on disk)
+SETTINGS = [
+    ("float32", "none", False),
+    ("scalar", "scalar", False),
+    ("scalar+disk", "scalar", True),
+    ("binary", "binary", False),
+    ("binary+disk", "binary", True),
+]
+TENANT = "benchmark"
+UPSERT_BATCH = 1024
+
+
+def clustered_vectors(n: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Unit vectors around random centres (closer to real embeddings than uniform noise)."""
+    centres = rng.standard_normal((clusters, VECTOR_SIZE)).astype(np.float32)
+    vectors = centres[rng.integers(0, clusters, n)] + 0.6 * rng.standard_normal((n, VECTOR_SIZE)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def vector_ram_mb(n: int, quantization: str, on_disk: bool) -> float:
+    """Estimated resident vector storage: originals (unless on disk) plus quantized copies."""
+    original = 0 if on_disk else n * VECTOR_SIZE * 4
+    quantized = {"none": 0, "scalar": n * VECTOR_SIZE, "binary": n * VECTOR_SIZE // 8}[quantization]
+    return (original + quantized) / 1e6
+
+
+def load(client: QdrantClient, name: str, vectors: np.ndarray, quantization: str,
+         on_disk: bool, m: int, ef_construct: int) -> float:
+    """Create and fill a collection; returns seconds until it is fully indexed."""
+    client.create_collection(
+        collection_name=name,
+        vectors_config=VectorParams(size=VECTOR_SIZE, distance=DISTANCE_METRIC, on_disk=on_disk),
+        hnsw_config=hnsw_config(m, ef_construct),
+        quantization_config=quantization_config(quantization)
+    )
+    client.create_payload_index(name, f"metadata.{TENANT_FIELD}", PayloadSchemaType.KEYWORD)
+    start = time.perf_counter()
+    for offset in range(0, len(vectors), UPSERT_BATCH):
+        client.upsert(
+            collection_name=name,
+            points=[
+                PointStruct(id=offset + i, vector=vector.tolist(), payload={"metadata": {TENANT_FIELD: TENANT}})
+                for i, vector in enumerate(vectors[offset:offset + UPSERT_BATCH])
+            ],
+            wait=False
+        )
+    while client.get_collection(name).status != CollectionStatus.GREEN:
+        time.sleep(0.5)
+    return time.perf_counter() - start
+
+
+def exact_neighbours(client: QdrantClient, name: str, queries: np.ndarray, top_k: int):
+    """Ground truth: brute-force search over the float32 vectors."""
+    exact = SearchParams(exact=True, quantization=QuantizationSearchParams(ignore=True))
+    return [
+        {hit.id for hit in client.search(name, query_vector=query.tolist(), search_params=exact, limit=top_k)}
+        for query in queries
+    ]
+
+
+def run(client: QdrantClient, name: str, queries: np.ndarray, truth, quantization: str, top_k: int):
+    """Recall@k against exact search and latency percentiles (ms)."""
+    query_filter = metadata_filter(None, tenant=TENANT)
+    params = search_params(quantization)
+    recalls, latencies = [], []
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        hits = client.search(name, query_vector=query.tolist(), query_filter=query_filter,
+                             search_params=params, limit=top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & {hit.id for hit in hits}) / len(expected))
+    latencies.sort()
+    return statistics.mean(recalls), statistics.median(latencies), latencies[int(len(latencies) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--points", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--hnsw", nargs="+", default=[f"0:{HNSW_EF_CONSTRUCT}"],
+                        help="m:ef_construct pairs (m=0: configured default)")
+    parser.add_argument("--settings", nargs="+", default=[label for label, _, _ in SETTINGS],
+                        choices=[label for label, _, _ in SETTINGS])
+    parser.add_argument("--qdrant-url", default="http://localhost:6333")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(7)
+    vectors = clustered_vectors(args.points, max(8, args.points // 500), rng)
+    queries = clustered_vectors(args.queries, max(8, args.points // 500), rng)
+    client = QdrantClient(url=args.qdrant_url)
+
+    truth = None
+    for hnsw in args.hnsw:
+        m, ef_construct = (int(value) for value in hnsw.split(":"))
+        for label, quantization, on_disk in SETTINGS:
+            if label not in args.settings:
+                continue
+            name = f"studypal_bench_{uuid.uuid4().hex[:8]}"
+            try:
+                seconds = load(client, name, vectors, quantization, on_disk, m, ef_construct)
+                if truth is None:
+                    truth = exact_neighbours(client, name, queries, args.top_k)
+                recall, p50, p95 = run(client, name, queries, truth, quantization, args.top_k)
+                print(f"{label:12s} m={m or 'default':7} ef_construct={ef_construct:<4d}: "
+                      f"vector RAM ~{vector_ram_mb(args.points, quantization, on_disk):7.1f} MB  "
+                      f"load+index {seconds:6.1f}s  recall@{args.top_k} {recall:.3f}  "
+                      f"p50 {p50:.2f} ms  p95 {p95:.2f} ms")
+            finally:
+                client.delete_collection(collection_name=name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark: full-file Whisper vs the VAD pre-pass
+Reports wall time, real-time factor (RTF), speech ratio and how closely the
+VAD transcript matches the full-file one (word-level similarity)
+
+Usage (from backend/):
+    python benchmarks/bench_vad.py lecture.mp3 --model base
+"""
+
+import argparse
+import difflib
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import services.whisper_service as whisper_service  # noqa: E402
+from services.vad import StreamingVAD  # noqa: E402
+from services.whisper_service import WhisperService, iter_pcm_blocks, SAMPLE_RATE  # noqa: E402
+
+
+def speech_profile(path: str):
+    """Decoded duration, speech ratio and VAD-only time for one file."""
+    vad = StreamingVAD(SAMPLE_RATE)
+    samples = 0
+    start = time.perf_counter()
+    for block in iter_pcm_blocks(path, 30 * SAMPLE_RATE):
+        samples += len(block)
+        vad.process(block)
+    return samples / SAMPLE_RATE, vad.speech_ratio(), time.perf_counter() - start
+
+
+def bench(service: WhisperService, path: str, vad: bool):
+    whisper_service.VAD_ENABLED = vad
+    start = time.perf_counter()
+    result = service.transcribe(path)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio")
+    parser.add_argument("--model", default="base")
+    args = parser.parse_args()
+
+    duration, ratio, vad_seconds = speech_profile(args.audio)
+    print(f"audio: {duration:.1f}s  speech: {ratio:.0%}  VAD pass: {vad_seconds:.2f}s")
+
+    service = WhisperService(model_name=args.model)
+    baseline, full = bench(service, args.audio, vad=False)
+    print(f"full file : {baseline:7.2f}s  RTF {baseline / duration:.3f}")
+
+    seconds, speech = bench(service, args.audio, vad=True)
+    print(f"VAD       : {seconds:7.2f}s  RTF {seconds / duration:.3f}  speedup {baseline / seconds:.2f}x")
+
+    similarity = difflib.SequenceMatcher(
+        None, full["transcript"].lower().split(), speech["transcript"].lower().split(), autojunk=False
+    ).ratio()
+    print(f"word similarity to full-file transcript: {similarity:.3f}")
+    print(f"segments: {len(full['segments'])} full, {len(speech['segments'])} VAD")
+
+
+if __name__ == "__main__":
+    main()
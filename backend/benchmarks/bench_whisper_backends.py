@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Benchmark: Whisper inference backends (FP32 vs int8)
+Reports load time, wall time, real-time factor (RTF) and word error rate
+(WER) per backend for one audio file. WER is measured against a reference
+transcript when given, otherwise against the FP32 openai-whisper output.
+
+Usage (from backend/):
+    python benchmarks/bench_whisper_backends.py lecture.mp3 --reference lecture.txt
+    python benchmarks/bench_whisper_backends.py lecture.mp3 --backends openai faster-whisper
+"""
+
+import argparse
+import os
+import re
+import sys
+import time
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.whisper_backends import WHISPER_BACKENDS, OPENAI_BACKEND  # noqa: E402
+from services.whisper_service import WhisperService, iter_pcm_blocks, SAMPLE_RATE  # noqa: E402
+
+
+def audio_seconds(path: str) -> float:
+    """Duration of the decoded audio."""
+    return sum(len(block) for block in iter_pcm_blocks(path, 30 * SAMPLE_RATE)) / SAMPLE_RATE
+
+
+def words(text: str) -> List[str]:
+    """Lowercase words without punctuation."""
+    return re.findall(r"[a-z0-9']+", text.lower())
+
+
+def wer(reference: List[str], hypothesis: List[str]) -> float:
+    """Word error rate: word-level edit distance / reference length."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current[j] = min(
+                previous[j] + 1,                               # deletion
+                current[j - 1] + 1,                            # insertion
+                previous[j - 1] + (ref_word != hyp_word)       # substitution
+            )
+        previous = current
+    return previous[-1] / max(1, len(reference))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--backends", nargs="+", default=WHISPER_BACKENDS, choices=WHISPER_BACKENDS)
+    parser.add_argument("--reference", help="Reference transcript (text file)")
+    args = parser.parse_args()
+
+    duration = audio_seconds(args.audio)
+    print(f"audio: {duration:.1f}s  model: {args.model}")
+
+    reference = None
+    if args.reference:
+        with open(args.reference) as f:
+            reference = words(f.read())
+
+    backends = list(args.backends)
+    if reference is None and OPENAI_BACKEND not in backends:
+        backends.insert(0, OPENAI_BACKEND)
+    elif reference is None:
+        # The FP32 baseline runs first so the others are scored against it
+        backends.remove(OPENAI_BACKEND)
+        backends.insert(0, OPENAI_BACKEND)
+
+    baseline = None
+    for backend in backends:
+        start = time.perf_counter()
+        try:
+            service = WhisperService(model_name=args.model, backend=backend)
+        except Exception as e:
+            print(f"{backend:15s}: unavailable ({e})")
+            continue
+        load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = service.transcribe(args.audio)
+        seconds = time.perf_counter() - start
+
+        hypothesis = words(result["transcript"])
+        if reference is None and backend == OPENAI_BACKEND:
+            reference = hypothesis
+        if baseline is None:
+            baseline = seconds
+        score = f"WER {wer(reference, hypothesis):.3f}" if reference is not None else "WER n/a"
+        print(f"{backend:15s}: load {load:6.2f}s  transcribe {seconds:7.2f}s  RTF {seconds / duration:.3f}  "
+              f"speedup {baseline / seconds:.2f}x  {score}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Benchmark: in-process Whisper vs the multi-process window pool
+Reports wall time, real-time factor (RTF) and speedup for one audio file
+
+Usage (from backend/):
+    python benchmarks/bench_whisper_pool.py lecture.mp3 --processes 2 4 8
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.whisper_service import WhisperService, iter_audio_windows, SAMPLE_RATE  # noqa: E402
+
+
+def audio_seconds(path: str) -> float:
+    """Duration of the decoded audio."""
+    duration = 0.0
+    for offset, audio, is_last in iter_audio_windows(path, window_seconds=30, overlap_seconds=0):
+        duration = offset + len(audio) / SAMPLE_RATE
+    return duration
+
+
+def bench(service: WhisperService, path: str) -> float:
+    start = time.perf_counter()
+    service.transcribe(path)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("audio")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--processes", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    duration = audio_seconds(args.audio)
+    print(f"audio: {duration:.1f}s")
+
+    baseline_service = WhisperService(model_name=args.model)
+    baseline = bench(baseline_service, args.audio)
+    print(f"in-process       : {baseline:7.2f}s  RTF {baseline / duration:.3f}")
+
+    for processes in args.processes:
+        service = WhisperService(model_name=args.model, processes=processes)
+        try:
+            # Warm up: the first call waits for workers to load the model
+            service.transcribe(args.audio)
+            seconds = bench(service, args.audio)
+        finally:
+            service.close()
+        print(f"{processes:2d} processes     : {seconds:7.2f}s  RTF {seconds / duration:.3f}  "
+              f"speedup {baseline / seconds:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
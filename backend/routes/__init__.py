@@ -2,6 +2,6 @@
 Routes package for StudyPal AI OS
 """
 
-from . import audio_routes, material_routes, ai_routes
+from . import audio_routes, material_routes, ai_routes, job_routes
 
-__all__ = ["audio_routes", "material_routes", "ai_routes"]
+__all__ = ["audio_routes", "material_routes", "ai_routes", "job_routes"]
@@ -6,13 +6,18 @@ Includes EXAM-GRADE flashcard generation system
 
 import logging
 import json
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List, Literal
 
 from services.memory_service import get_memory_service
 from services.ollama_service import get_ollama_service
+from services.response_cache import SemanticKey
 from services.flashcard_engine import create_flashcard_engine, ExamGradeFlashcard, CardType, Difficulty
+from services.executor_service import run_in_pool, ENCODER_POOL, LLM_POOL
+from routes.filters import MemoryFilter, memory_filters
+from routes.streaming import sse_response, stream_answer
+from routes.tenancy import get_tenant
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -29,6 +34,8 @@ class AskRequest(BaseModel):
     question: str = Field(..., min_length=1, description="Question to ask")
     use_memory: bool = Field(True, description="Whether to retrieve context from memory")
     top_k: int = Field(5, ge=1, le=20, description="Number of context chunks to retrieve")
+    filters: Optional[MemoryFilter] = Field(None, description="Restrict memory retrieval by course/topic/source")
+    stream: bool = Field(False, description="Stream the answer as Server-Sent Events")
 
 
 class AskResponse(BaseModel):
@@ -45,6 +52,7 @@ class FlashcardRequest(BaseModel):
     topic: Optional[str] = Field(None, description="Topic to generate flashcards about")
     num_cards: int = Field(5, ge=1, le=20, description="Number of flashcards to generate")
     use_memory: bool = Field(True, description="Retrieve content from memory if no text provided")
+    filters: Optional[MemoryFilter] = Field(None, description="Restrict memory retrieval by course/topic/source")
 
 
 class Flashcard(BaseModel):
@@ -87,6 +95,7 @@ class ExamGradeFlashcardRequest(BaseModel):
         "intermediate", description="Target difficulty level"
     )
     use_memory: bool = Field(True, description="Retrieve content from memory if no text provided")
+    filters: Optional[MemoryFilter] = Field(None, description="Restrict memory retrieval by course/topic/source")
     user_mistakes: Optional[List[str]] = Field(None, description="User's past mistakes for TRAP card generation")
     force_card_types: Optional[List[str]] = Field(None, description="Force specific card types")
 
@@ -131,12 +140,14 @@ class ExamSimulationRequest(BaseModel):
         "multiple_choice", description="Type of exam format"
     )
     num_cards: int = Field(10, ge=1, le=30, description="Number of exam cards")
+    use_memory: bool = Field(False, description="Ground each subtopic in the user's materials")
+    filters: Optional[MemoryFilter] = Field(None, description="Restrict memory retrieval by course/topic/source")
 
 
 # ==================== ENDPOINTS ====================
 
 @router.post("/ask", response_model=AskResponse)
-async def ask_question(request: AskRequest) -> Dict[str, Any]:
+async def ask_question(request: AskRequest, tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     RAG Pipeline: Ask questions with memory-augmented responses.
     
@@ -146,6 +157,10 @@ async def ask_question(request: AskRequest) -> Dict[str, Any]:
     3. Send to Mixtral for reasoning
     4. Return answer with source information
     
+    With stream=true the answer is sent as Server-Sent Events: a metadata
+    event with the sources first, then token events, then done (or error
+    if generation fails).
+    
     Args:
         request: Question and retrieval parameters
     
@@ -158,12 +173,22 @@ async def ask_question(request: AskRequest) -> Dict[str, Any]:
         
         context_text = None
         sources = []
+        semantic_key = None
         
         # Retrieve relevant context from memory
         if request.use_memory:
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.question, top_k=request.top_k)
+                search_results = await run_in_pool(
+                    ENCODER_POOL, memory.search, request.question, top_k=request.top_k,
+                    filters=memory_filters(request.filters), tenant=tenant
+                )
+                
+                # Cache key for near-identical questions answered from the same chunks
+                semantic_key = SemanticKey(
+                    question_embedding=await run_in_pool(ENCODER_POOL, memory.encode_query, request.question),
+                    chunk_ids=[r['id'] for r in search_results]
+                )
                 
                 if search_results:
                     # Build context from search results
@@ -183,9 +208,25 @@ async def ask_question(request: AskRequest) -> Dict[str, Any]:
         
         # Generate answer using Mixtral
         ollama = get_ollama_service()
-        answer = ollama.ask_mixtral(
+        
+        if request.stream:
+            return sse_response(stream_answer(
+                metadata={
+                    "context_used": context_text is not None,
+                    "sources_count": len(sources),
+                    "sources": sources if sources else None
+                },
+                fragments=ollama.ask_mixtral_stream(
+                    prompt=request.question,
+                    context=context_text,
+                    semantic=semantic_key
+                )
+            ))
+        
+        answer = await ollama.ask_mixtral_async(
             prompt=request.question,
-            context=context_text
+            context=context_text,
+            semantic=semantic_key
         )
         
         return {
@@ -203,7 +244,7 @@ async def ask_question(request: AskRequest) -> Dict[str, Any]:
 
 
 @router.post("/flashcards/generate", response_model=FlashcardResponse)
-async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
+async def generate_flashcards(request: FlashcardRequest, tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Generate flashcards from text or topic.
     
@@ -231,7 +272,10 @@ async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
             # Retrieve content from memory
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.topic, top_k=10)
+                search_results = await run_in_pool(
+                    ENCODER_POOL, memory.search, request.topic, top_k=10,
+                    filters=memory_filters(request.filters), tenant=tenant
+                )
                 
                 if search_results:
                     # Combine retrieved content
@@ -258,7 +302,7 @@ async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
         
         # Generate flashcards using Qwen
         ollama = get_ollama_service()
-        flashcards_json = ollama.generate_flashcards(content, num_cards=request.num_cards)
+        flashcards_json = await ollama.generate_flashcards_async(content, num_cards=request.num_cards)
         
         # Parse JSON response
         try:
@@ -306,7 +350,7 @@ async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
 
 
 @router.post("/plan/create", response_model=StudyPlanResponse)
-async def create_study_plan(request: StudyPlanRequest) -> Dict[str, Any]:
+async def create_study_plan(request: StudyPlanRequest, tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Generate comprehensive study plan.
     
@@ -332,7 +376,7 @@ async def create_study_plan(request: StudyPlanRequest) -> Dict[str, Any]:
         if request.retrieve_materials:
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.subject, top_k=5)
+                search_results = await run_in_pool(ENCODER_POOL, memory.search, request.subject, top_k=5, tenant=tenant)
                 
                 if search_results:
                     materials_count = len(search_results)
@@ -353,7 +397,7 @@ async def create_study_plan(request: StudyPlanRequest) -> Dict[str, Any]:
         
         # Generate study plan
         ollama = get_ollama_service()
-        plan = ollama.generate_study_plan(
+        plan = await ollama.generate_study_plan_async(
             subject=request.subject,
             days=request.days,
             current_knowledge=enhanced_knowledge
@@ -397,7 +441,8 @@ async def ai_health() -> Dict[str, str]:
 # ==================== EXAM-GRADE FLASHCARD ENDPOINTS ====================
 
 @router.post("/flashcards/exam-grade", response_model=ExamGradeFlashcardResponse)
-async def generate_exam_grade_flashcards(request: ExamGradeFlashcardRequest) -> Dict[str, Any]:
+async def generate_exam_grade_flashcards(request: ExamGradeFlashcardRequest,
+                                         tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Generate EXAM-GRADE flashcards - world-class memory weapons.
     
@@ -428,7 +473,10 @@ async def generate_exam_grade_flashcards(request: ExamGradeFlashcardRequest) ->
             # Retrieve content from memory
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.topic, top_k=10)
+                search_results = await run_in_pool(
+                    ENCODER_POOL, memory.search, request.topic, top_k=10,
+                    filters=memory_filters(request.filters), tenant=tenant
+                )
                 
                 if search_results:
                     # Filter by quality threshold
@@ -458,7 +506,9 @@ async def generate_exam_grade_flashcards(request: ExamGradeFlashcardRequest) ->
             if len(force_types) != request.num_cards:
                 force_types = None  # Invalid, use auto distribution
         
-        flashcards = engine.generate_exam_grade_flashcards(
+        flashcards = await run_in_pool(
+            LLM_POOL,
+            engine.generate_exam_grade_flashcards,
             content=content,
             topic=request.topic,
             num_cards=request.num_cards,
@@ -514,7 +564,9 @@ async def generate_trap_cards(request: TrapCardRequest) -> Dict[str, Any]:
         ollama = get_ollama_service()
         engine = create_flashcard_engine(ollama)
         
-        trap_cards = engine.generate_trap_cards_from_mistakes(
+        trap_cards = await run_in_pool(
+            LLM_POOL,
+            engine.generate_trap_cards_from_mistakes,
             mistakes=request.mistakes,
             topic=request.topic,
             num_cards=request.num_cards
@@ -537,7 +589,8 @@ async def generate_trap_cards(request: TrapCardRequest) -> Dict[str, Any]:
 
 
 @router.post("/flashcards/exam-simulation")
-async def generate_exam_simulation(request: ExamSimulationRequest) -> Dict[str, Any]:
+async def generate_exam_simulation(request: ExamSimulationRequest,
+                                   tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Generate flashcards that simulate real exam questions.
     
@@ -554,14 +607,35 @@ async def generate_exam_simulation(request: ExamSimulationRequest) -> Dict[str,
         if not request.subtopics:
             raise HTTPException(status_code=400, detail="At least one subtopic is required")
         
+        # One batched search for all subtopics
+        subtopic_notes = {}
+        if request.use_memory:
+            try:
+                memory = get_memory_service()
+                search_results = await run_in_pool(
+                    ENCODER_POOL, memory.search_many,
+                    [f"{request.topic}: {subtopic}" for subtopic in request.subtopics], top_k=3,
+                    filters=memory_filters(request.filters), tenant=tenant
+                )
+                for subtopic, results in zip(request.subtopics, search_results):
+                    quality_results = [r['text'] for r in results if r.get('score', 0) >= 0.5]
+                    if quality_results:
+                        subtopic_notes[subtopic] = quality_results
+                logger.info(f"✓ Grounded {len(subtopic_notes)}/{len(request.subtopics)} subtopics in memory")
+            except Exception as e:
+                logger.warning(f"Memory retrieval failed: {e}")
+        
         ollama = get_ollama_service()
         engine = create_flashcard_engine(ollama)
         
-        exam_cards = engine.generate_exam_simulation_cards(
+        exam_cards = await run_in_pool(
+            LLM_POOL,
+            engine.generate_exam_simulation_cards,
             topic=request.topic,
             subtopics=request.subtopics,
             exam_format=request.exam_format,
-            num_cards=request.num_cards
+            num_cards=request.num_cards,
+            subtopic_notes=subtopic_notes
         )
         
         logger.info(f"✓ Generated {len(exam_cards)} exam simulation cards")
@@ -571,7 +645,8 @@ async def generate_exam_simulation(request: ExamSimulationRequest) -> Dict[str,
             "count": len(exam_cards),
             "source": "exam_simulation",
             "exam_format": request.exam_format,
-            "subtopics_covered": request.subtopics
+            "subtopics_covered": request.subtopics,
+            "subtopics_from_memory": list(subtopic_notes)
         }
         
     except HTTPException:
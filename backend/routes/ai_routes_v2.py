@@ -8,12 +8,18 @@ Action > explanation. Fewer words, more direction.
 
 import logging
 import json
-from fastapi import APIRouter, HTTPException
+import re
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional, List, Literal
 
 from services.memory_service import get_memory_service
 from services.ollama_service import get_ollama_service
+from services.executor_service import run_in_pool, ENCODER_POOL
+from services.reranker import rerank_candidates, RERANK_ENABLED, RERANK_CANDIDATES
+from routes.filters import MemoryFilter, memory_filters
+from routes.streaming import sse_response, single_fragment, stream_answer
+from routes.tenancy import get_tenant
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -57,7 +63,10 @@ class IntelligentAskRequest(BaseModel):
     mode: Optional[AIMode] = Field(None, description="Force specific mode (auto-detected if not provided)")
     context: Optional[UserStudyContext] = Field(None, description="User's study context")
     use_memory: bool = Field(True, description="Whether to retrieve context from memory")
+    filters: Optional[MemoryFilter] = Field(None, description="Restrict memory retrieval by course/topic/source")
+    rerank: Optional[bool] = Field(None, description="Re-rank retrieved chunks with the cross-encoder (default: RERANK_ENABLED)")
     skip_intervention: bool = Field(False, description="Skip intervention checks")
+    stream: bool = Field(False, description="Stream the answer as Server-Sent Events")
 
 
 class MemoryChunk(BaseModel):
@@ -97,27 +106,13 @@ class IntelligentAskResponse(BaseModel):
     suggestions: List[ProactiveSuggestion] = []
 
 
-class AskRequest(BaseModel):
-    """Legacy request model for AI question answering"""
-    question: str = Field(..., min_length=1, description="Question to ask")
-    use_memory: bool = Field(True, description="Whether to retrieve context from memory")
-    top_k: int = Field(5, ge=1, le=20, description="Number of context chunks to retrieve")
-
-
-class AskResponse(BaseModel):
-    """Legacy response model for AI answers"""
-    answer: str
-    context_used: bool
-    sources_count: int
-    sources: Optional[List[Dict[str, Any]]] = None
-
-
 class FlashcardRequest(BaseModel):
     """Request model for flashcard generation"""
     text: Optional[str] = Field(None, description="Source text for flashcards")
     topic: Optional[str] = Field(None, description="Topic to generate flashcards about")
     num_cards: int = Field(5, ge=1, le=20, description="Number of flashcards to generate")
     use_memory: bool = Field(True, description="Retrieve content from memory if no text provided")
+    filters: Optional[MemoryFilter] = Field(None, description="Restrict memory retrieval by course/topic/source")
 
 
 class Flashcard(BaseModel):
@@ -419,10 +414,56 @@ RESPONSE RULES:
 - Always end with clear next step"""
 
 
+def parse_structured_output(mode: AIMode, answer: str) -> Optional[Any]:
+    """Extract JSON output for structured modes (plan, quiz, flashcards)."""
+    if mode not in ["plan", "quiz", "flashcards"]:
+        return None
+    
+    try:
+        # Clean response to extract JSON
+        json_str = answer
+        if "```" in answer:
+            match = re.search(r'```(?:json)?\s*([\s\S]*?)```', answer)
+            if match:
+                json_str = match.group(1)
+        
+        # Find JSON in response
+        json_match = re.search(r'[\[{][\s\S]*[\]}]', json_str)
+        if json_match:
+            return json.loads(json_match.group(0))
+    except Exception as e:
+        logger.warning(f"Could not parse structured output: {e}")
+    return None
+
+
+def memory_sources(chunks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Summarize strong memory chunks for the client."""
+    sources = []
+    for chunk in chunks:
+        if chunk.get('score', 0) < RELEVANCE_THRESHOLD:
+            continue
+        metadata = chunk.get('metadata', {})
+        source = {
+            "text": chunk.get('text', '')[:200],
+            "relevance_score": round(chunk.get('score', 0), 3),
+            "source": metadata.get("source"),
+            "topic": metadata.get("topic")
+        }
+        # Transcript chunks point at the moment in the recording
+        if "start_time" in metadata:
+            source.update({
+                "filename": metadata.get("filename"),
+                "start_time": metadata["start_time"],
+                "end_time": metadata.get("end_time")
+            })
+        sources.append(source)
+    return sources[:MAX_CONTEXT_CHUNKS]
+
+
 # ==================== ENDPOINTS ====================
 
 @router.post("/intelligent-ask", response_model=IntelligentAskResponse)
-async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
+async def intelligent_ask(request: IntelligentAskRequest, tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Intelligent RAG Pipeline with mode-based processing.
     
@@ -432,6 +473,9 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
     3. Retrieve relevant memory (with quality filter)
     4. Build mode-specific prompt
     5. Generate disciplined response
+    
+    With stream=true the answer is sent as Server-Sent Events: a metadata
+    event first, then token events, then a done event with structured output.
     """
     try:
         if not request.message or not request.message.strip():
@@ -450,6 +494,20 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
             intervention = check_intervention(mode, ctx)
             if intervention and intervention.should_intervene:
                 logger.info(f"Intervention triggered: {intervention.priority}")
+                suggestions = [s.model_dump() for s in get_proactive_suggestions(ctx)]
+                if request.stream:
+                    return sse_response(stream_answer(
+                        metadata={
+                            "mode": intervention.suggested_mode,
+                            "intervention": intervention.model_dump(),
+                            "memory_used": False,
+                            "memory_quality": "none",
+                            "chunks_used": 0,
+                            "sources": []
+                        },
+                        fragments=single_fragment(intervention.message),
+                        finalize=lambda answer: {"structured_output": None, "suggestions": suggestions}
+                    ))
                 return {
                     "mode": intervention.suggested_mode,
                     "answer": intervention.message,
@@ -458,7 +516,7 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
                     "memory_used": False,
                     "memory_quality": "none",
                     "chunks_used": 0,
-                    "suggestions": [s.model_dump() for s in get_proactive_suggestions(ctx)]
+                    "suggestions": suggestions
                 }
         
         # 3. Retrieve memory with quality filter
@@ -468,7 +526,17 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
         if request.use_memory:
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.message, top_k=MAX_CONTEXT_CHUNKS)
+                rerank = RERANK_ENABLED if request.rerank is None else request.rerank
+                search_results = await run_in_pool(
+                    ENCODER_POOL, memory.search, request.message,
+                    top_k=max(RERANK_CANDIDATES, MAX_CONTEXT_CHUNKS) if rerank else MAX_CONTEXT_CHUNKS,
+                    filters=memory_filters(request.filters), tenant=tenant
+                )
+                if rerank:
+                    # Cross-encoder scores replace cosine ones, so the threshold keeps fewer, better chunks
+                    search_results = await run_in_pool(
+                        ENCODER_POOL, rerank_candidates, request.message, search_results, MAX_CONTEXT_CHUNKS
+                    )
                 
                 if search_results:
                     memory_chunks = search_results
@@ -482,34 +550,42 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
         ollama = get_ollama_service()
         system_prompt = build_system_prompt(mode, ctx, memory_chunks)
         
+        use_mixtral = mode in ["plan", "explain", "coach"]
+        qwen_prompt = f"{system_prompt}\n\nUSER: {request.message}"
+        chunks_used = len([c for c in memory_chunks if c.get('score', 0) >= RELEVANCE_THRESHOLD])
+        suggestions = [s.model_dump() for s in get_proactive_suggestions(ctx)]
+        
+        if request.stream:
+            if use_mixtral:
+                fragments = ollama.ask_mixtral_stream(request.message, context=system_prompt)
+            else:
+                fragments = ollama.ask_qwen_stream(qwen_prompt, temperature=0.3)
+            
+            return sse_response(stream_answer(
+                metadata={
+                    "mode": mode,
+                    "intervention": intervention.model_dump() if intervention else None,
+                    "memory_used": len(memory_chunks) > 0,
+                    "memory_quality": memory_quality,
+                    "chunks_used": chunks_used,
+                    "sources": memory_sources(memory_chunks)
+                },
+                fragments=fragments,
+                finalize=lambda answer: {
+                    "structured_output": parse_structured_output(mode, answer),
+                    "suggestions": suggestions
+                }
+            ))
+        
         # Use appropriate model based on mode
-        if mode in ["plan", "explain", "coach"]:
-            answer = ollama.ask_mixtral(request.message, context=system_prompt)
+        if use_mixtral:
+            answer = await ollama.ask_mixtral_async(request.message, context=system_prompt)
         else:
             # Quiz, flashcards, review - use Qwen for structured output
-            answer = ollama.ask_qwen(
-                f"{system_prompt}\n\nUSER: {request.message}",
-                temperature=0.3
-            )
+            answer = await ollama.ask_qwen_async(qwen_prompt, temperature=0.3)
         
         # 5. Try to parse structured output
-        structured_output = None
-        if mode in ["plan", "quiz", "flashcards"]:
-            try:
-                # Clean response to extract JSON
-                json_str = answer
-                if "```" in answer:
-                    import re
-                    match = re.search(r'```(?:json)?\s*([\s\S]*?)```', answer)
-                    if match:
-                        json_str = match.group(1)
-                
-                # Find JSON in response
-                json_match = re.search(r'[\[{][\s\S]*[\]}]', json_str)
-                if json_match:
-                    structured_output = json.loads(json_match.group(0))
-            except Exception as e:
-                logger.warning(f"Could not parse structured output: {e}")
+        structured_output = parse_structured_output(mode, answer)
         
         return {
             "mode": mode,
@@ -518,8 +594,8 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
             "intervention": intervention.model_dump() if intervention else None,
             "memory_used": len(memory_chunks) > 0,
             "memory_quality": memory_quality,
-            "chunks_used": len([c for c in memory_chunks if c.get('score', 0) >= RELEVANCE_THRESHOLD]),
-            "suggestions": [s.model_dump() for s in get_proactive_suggestions(ctx)]
+            "chunks_used": chunks_used,
+            "suggestions": suggestions
         }
         
     except HTTPException:
@@ -529,78 +605,8 @@ async def intelligent_ask(request: IntelligentAskRequest) -> Dict[str, Any]:
         raise HTTPException(status_code=500, detail=f"Processing failed: {str(e)}")
 
 
-@router.post("/ask", response_model=AskResponse)
-async def ask_question(request: AskRequest) -> Dict[str, Any]:
-    """
-    Legacy RAG Pipeline: Ask questions with memory-augmented responses.
-    Maintained for backward compatibility.
-    """
-    try:
-        if not request.question or not request.question.strip():
-            raise HTTPException(status_code=400, detail="Question cannot be empty")
-        
-        context_text = None
-        sources = []
-        
-        # Retrieve relevant context with quality filter
-        if request.use_memory:
-            try:
-                memory = get_memory_service()
-                search_results = memory.search(request.question, top_k=request.top_k)
-                
-                if search_results:
-                    # Filter by relevance threshold
-                    strong_results = [r for r in search_results if r.get('score', 0) >= RELEVANCE_THRESHOLD]
-                    
-                    if strong_results:
-                        context_parts = []
-                        for idx, result in enumerate(strong_results[:MAX_CONTEXT_CHUNKS], 1):
-                            context_parts.append(f"[{idx}] {result['text']}")
-                            sources.append({
-                                "text_preview": result['text'][:200] + "..." if len(result['text']) > 200 else result['text'],
-                                "metadata": result.get('metadata', {}),
-                                "relevance_score": round(result['score'], 3)
-                            })
-                        
-                        context_text = "\n\n".join(context_parts)
-                        logger.info(f"✓ Retrieved {len(strong_results)} relevant chunks (threshold: {RELEVANCE_THRESHOLD})")
-                    else:
-                        logger.info("Retrieved chunks below relevance threshold")
-            except Exception as e:
-                logger.warning(f"Memory retrieval failed: {e}")
-        
-        # Generate answer
-        ollama = get_ollama_service()
-        
-        # Add weak memory warning if applicable
-        if context_text is None and request.use_memory:
-            answer = ollama.ask_mixtral(
-                prompt=request.question,
-                context="Note: I don't have strong study material on this topic in your notes. The answer is based on general knowledge."
-            )
-            answer += "\n\n💡 *I don't have strong material on this in your notes. Want to add some?*"
-        else:
-            answer = ollama.ask_mixtral(
-                prompt=request.question,
-                context=context_text
-            )
-        
-        return {
-            "answer": answer,
-            "context_used": context_text is not None,
-            "sources_count": len(sources),
-            "sources": sources if sources else None
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Failed to process question: {e}")
-        raise HTTPException(status_code=500, detail=f"Question processing failed: {str(e)}")
-
-
 @router.post("/flashcards/generate", response_model=FlashcardResponse)
-async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
+async def generate_flashcards(request: FlashcardRequest, tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Generate flashcards with strict output format.
     """
@@ -614,7 +620,10 @@ async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
         elif request.topic and request.use_memory:
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.topic, top_k=10)
+                search_results = await run_in_pool(
+                    ENCODER_POOL, memory.search, request.topic, top_k=10,
+                    filters=memory_filters(request.filters), tenant=tenant
+                )
                 
                 # Filter by relevance
                 strong_results = [r for r in search_results if r.get('score', 0) >= RELEVANCE_THRESHOLD]
@@ -639,7 +648,7 @@ async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
         
         # Generate with strict format
         ollama = get_ollama_service()
-        flashcards_json = ollama.generate_flashcards(content, num_cards=request.num_cards)
+        flashcards_json = await ollama.generate_flashcards_async(content, num_cards=request.num_cards)
         
         try:
             flashcards_data = json.loads(flashcards_json)
@@ -676,7 +685,7 @@ async def generate_flashcards(request: FlashcardRequest) -> Dict[str, Any]:
 
 
 @router.post("/plan/create", response_model=StudyPlanResponse)
-async def create_study_plan(request: StudyPlanRequest) -> Dict[str, Any]:
+async def create_study_plan(request: StudyPlanRequest, tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Generate study plan with strict JSON output format.
     """
@@ -690,7 +699,7 @@ async def create_study_plan(request: StudyPlanRequest) -> Dict[str, Any]:
         if request.retrieve_materials:
             try:
                 memory = get_memory_service()
-                search_results = memory.search(request.subject, top_k=5)
+                search_results = await run_in_pool(ENCODER_POOL, memory.search, request.subject, top_k=5, tenant=tenant)
                 
                 # Filter by relevance
                 strong_results = [r for r in search_results if r.get('score', 0) >= RELEVANCE_THRESHOLD]
@@ -707,7 +716,7 @@ async def create_study_plan(request: StudyPlanRequest) -> Dict[str, Any]:
                 logger.warning(f"Failed to retrieve materials: {e}")
         
         ollama = get_ollama_service()
-        plan = ollama.generate_study_plan(
+        plan = await ollama.generate_study_plan_async(
             subject=request.subject,
             days=request.days,
             current_knowledge=enhanced_knowledge
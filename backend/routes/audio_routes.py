@@ -3,34 +3,117 @@ Audio Routes - Speech to Text Pipeline
 Handles audio uploads, transcription, and memory storage
 """
 
+import hashlib
 import logging
 import os
 import uuid
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import aiofiles
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
 from pydantic import BaseModel
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Optional, Tuple
 
-from services.whisper_service import get_whisper_service
-from services.memory_service import get_memory_service
+from services.executor_service import run_in_pool, STORAGE_POOL
+from services.whisper_models import get_whisper_models, AUTO_TIER, WHISPER_TIERS
+from services.ingestion_jobs import transcribe_and_store, AUDIO_TRANSCRIBE_JOB, AUDIO_SPOOL_DIR
+from services.job_queue import get_job_queue
+from routes.tenancy import get_tenant
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create router
-router = APIRouter(prefix="/audio", tags=["audio"])
-
 # Temporary directory for audio files
 TEMP_DIR = "/tmp/studypal_audio"
 os.makedirs(TEMP_DIR, exist_ok=True)
 
+# Upload streaming
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # bytes copied per read
+AUDIO_MAX_UPLOAD_BYTES = int(os.getenv("AUDIO_MAX_UPLOAD_BYTES", str(1024 ** 3)))
+MULTIPART_OVERHEAD_BYTES = 64 * 1024  # boundaries, part headers and form fields
+
+
+def upload_too_large() -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Audio upload exceeds {AUDIO_MAX_UPLOAD_BYTES} bytes")
+
+
+class UploadLimitRoute(APIRoute):
+    """
+    Enforces the upload limit on the raw request body, before the multipart
+    form is parsed. Starlette spools the whole form to disk before the handler
+    runs, so checking inside the handler would only fire after an oversized
+    upload had already been received and written.
+    
+    Requests declaring a larger Content-Length are rejected without reading
+    the body; chunked bodies are cut off as soon as they pass the limit.
+    """
+    
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        max_body = AUDIO_MAX_UPLOAD_BYTES + MULTIPART_OVERHEAD_BYTES
+        
+        async def limited_handler(request: Request):
+            content_length = request.headers.get("content-length")
+            if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+                raise upload_too_large()
+            
+            received = 0
+            
+            async def receive():
+                nonlocal received
+                message = await request.receive()
+                if message["type"] == "http.request":
+                    received += len(message.get("body", b""))
+                    if received > max_body:
+                        raise upload_too_large()
+                return message
+            
+            return await handler(Request(request.scope, receive))
+        
+        return limited_handler
+
+
+# Create router
+router = APIRouter(prefix="/audio", tags=["audio"], route_class=UploadLimitRoute)
+
 
 class AudioTranscriptResponse(BaseModel):
     """Response model for audio transcription"""
     transcript: str
     stored_chunks: int
     language: str
+    model: Optional[str] = None
     chunks: Optional[list] = None
+    audio_sha256: Optional[str] = None
+
+
+async def save_upload(file: UploadFile, path: str) -> Tuple[int, str]:
+    """
+    Stream an upload to disk in fixed-size chunks, hashing as it goes.
+    Memory use is one chunk regardless of file size. Oversized request
+    bodies are already rejected by UploadLimitRoute; this enforces the
+    exact file size.
+    
+    Returns:
+        (size in bytes, sha256 hex digest)
+    
+    Raises:
+        HTTPException 413 if the upload exceeds AUDIO_MAX_UPLOAD_BYTES
+    """
+    digest = hashlib.sha256()
+    size = 0
+    async with aiofiles.open(path, "wb") as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > AUDIO_MAX_UPLOAD_BYTES:
+                raise upload_too_large()
+            digest.update(chunk)
+            await f.write(chunk)
+    return size, digest.hexdigest()
 
 
 @router.post("/upload", response_model=AudioTranscriptResponse)
@@ -38,26 +121,42 @@ async def upload_audio(
     file: UploadFile = File(...),
     store_in_memory: bool = True,
     course: Optional[str] = None,
-    topic: Optional[str] = None
+    topic: Optional[str] = None,
+    background: bool = False,
+    streaming: bool = False,
+    model: Optional[str] = None,
+    tenant: str = Depends(get_tenant)
 ) -> Dict[str, Any]:
     """
     Upload audio file for transcription and optional memory storage.
     
     Flow:
-    1. Save uploaded audio to temp file
+    1. Stream uploaded audio to a temp file (chunked, size-limited, hashed)
     2. Transcribe using Whisper
     3. Chunk transcript into meaningful segments
     4. Store chunks in Qdrant memory
     5. Return transcript and metadata
     
+    With background=true the file is queued instead and the response is
+    202 with a job_id; poll GET /jobs/{job_id} for progress and the result.
+    
+    With streaming=true the recording is transcribed in overlapping windows
+    and each window's chunks are stored as soon as it finishes. Combined
+    with background=true, the job progress carries the partial transcript.
+    
     Args:
         file: Audio file (wav, mp3, m4a, etc.)
         store_in_memory: Whether to store chunks in memory (default: True)
         course: Optional course name for metadata
         topic: Optional topic for metadata
+        background: Queue the work and return immediately (default: False)
+        streaming: Windowed transcription for long recordings (default: False)
+        model: Whisper tier (tiny, base, small) or "auto" to pick from duration
+               and queue depth (default: WHISPER_DEFAULT_TIER)
+        tenant: Owning user of the stored chunks (X-User-ID header)
     
     Returns:
-        Transcript, stored chunk count, and language
+        Transcript, stored chunk count, and language (or job_id when queued)
     """
     temp_path = None
     
@@ -65,59 +164,59 @@ async def upload_audio(
         # Validate file
         if not file.filename:
             raise HTTPException(status_code=400, detail="No file provided")
+        if model and model != AUTO_TIER and model not in WHISPER_TIERS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown model '{model}' (available: {', '.join(WHISPER_TIERS)}, {AUTO_TIER})"
+            )
         
-        # Generate unique temp filename
+        # Generate unique temp filename (queued uploads must outlive the request)
         file_extension = os.path.splitext(file.filename)[1] or ".wav"
         temp_filename = f"{uuid.uuid4()}{file_extension}"
-        temp_path = os.path.join(TEMP_DIR, temp_filename)
+        temp_path = os.path.join(AUDIO_SPOOL_DIR if background else TEMP_DIR, temp_filename)
         
-        # Save uploaded file
+        # Stream uploaded file to disk
         logger.info(f"Saving uploaded audio: {file.filename}")
-        with open(temp_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        logger.info(f"✓ Audio saved to {temp_path}")
-        
-        # Transcribe and chunk
-        whisper = get_whisper_service()
-        result = whisper.transcribe_and_chunk(temp_path)
+        size, audio_hash = await save_upload(file, temp_path)
         
-        transcript = result["transcript"]
-        chunks = result["chunks"]
-        language = result["language"]
+        logger.info(f"✓ Audio saved to {temp_path} ({size} bytes, sha256 {audio_hash[:12]})")
         
-        logger.info(f"✓ Transcription complete: {len(chunks)} chunks")
-        
-        # Store in memory if requested
-        stored_count = 0
-        if store_in_memory and chunks:
-            memory = get_memory_service()
-            
-            # Build metadata
-            metadata = {
-                "source": "audio",
+        if background:
+            job_id = await get_job_queue().enqueue(AUDIO_TRANSCRIBE_JOB, {
+                "path": temp_path,
                 "filename": file.filename,
-                "language": language
-            }
-            if course:
-                metadata["course"] = course
-            if topic:
-                metadata["topic"] = topic
-            
-            # Store chunks in batch
-            point_ids = memory.add_texts_batch(chunks, metadata=metadata)
-            stored_count = len(point_ids)
-            
-            logger.info(f"✓ Stored {stored_count} chunks in memory")
+                "store_in_memory": store_in_memory,
+                "course": course,
+                "topic": topic,
+                "streaming": streaming,
+                "audio_hash": audio_hash,
+                "model": model,
+                "user_id": tenant
+            })
+            # The worker owns the file now
+            temp_path = None
+            return JSONResponse(status_code=202, content={
+                "success": True,
+                "job_id": job_id,
+                "status": "queued",
+                "audio_sha256": audio_hash
+            })
         
-        return {
-            "transcript": transcript,
-            "stored_chunks": stored_count,
-            "language": language,
-            "chunks": chunks if not store_in_memory else None
-        }
+        # Transcribe, chunk and store
+        return await transcribe_and_store(
+            temp_path,
+            file.filename,
+            store_in_memory=store_in_memory,
+            course=course,
+            topic=topic,
+            streaming=streaming,
+            audio_hash=audio_hash,
+            tier=model,
+            user_id=tenant
+        )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Failed to process audio: {e}")
         raise HTTPException(status_code=500, detail=f"Audio processing failed: {str(e)}")
@@ -133,16 +232,19 @@ async def upload_audio(
 
 
 @router.get("/health")
-async def audio_health() -> Dict[str, str]:
+async def audio_health() -> Dict[str, Any]:
     """
     Health check for audio service.
     """
     try:
-        whisper = get_whisper_service()
+        whisper = await run_in_pool(STORAGE_POOL, get_whisper_models().health)
         return {
             "status": "healthy",
             "service": "audio",
-            "whisper_loaded": whisper.model is not None
+            "whisper_loaded": whisper["loaded"],
+            "whisper_backend": whisper["backend"],
+            "whisper_processes": whisper["processes"],
+            "whisper_tiers": whisper["tiers"]
         }
     except Exception as e:
         return {
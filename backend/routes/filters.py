@@ -0,0 +1,19 @@
+"""
+Filters - Memory retrieval filters
+Request model shared by the routers that search memory
+"""
+
+from pydantic import BaseModel, Field
+from typing import Dict, Any, Optional
+
+
+class MemoryFilter(BaseModel):
+    """Restrict memory retrieval to matching material metadata"""
+    course: Optional[str] = Field(None, description="Only material from this course")
+    topic: Optional[str] = Field(None, description="Only material on this topic")
+    source: Optional[str] = Field(None, description="Only material from this source (textbook, lecture, audio, ...)")
+
+
+def memory_filters(filters: Optional[MemoryFilter]) -> Optional[Dict[str, Any]]:
+    """MemoryService.search filters from a request's MemoryFilter."""
+    return filters.model_dump(exclude_none=True) if filters else None
@@ -0,0 +1,44 @@
+"""
+Job Routes - Background job status
+Poll queued ingestion and transcription jobs
+"""
+
+import logging
+from fastapi import APIRouter, HTTPException
+from typing import Dict, Any
+
+from services.executor_service import run_in_pool, STORAGE_POOL
+from services.job_queue import get_job_queue
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Create router
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+
+
+@router.get("/{job_id}")
+async def get_job(job_id: str) -> Dict[str, Any]:
+    """
+    Get status, progress and result of a background job.
+
+    Status is one of: queued, running, completed, failed.
+    The result is set once the job has completed. A failed run is retried
+    with backoff (status queued, retry_at set) until JOB_MAX_ATTEMPTS.
+    """
+    job = await run_in_pool(STORAGE_POOL, get_job_queue().get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("")
+async def job_stats() -> Dict[str, Any]:
+    """
+    Get job counts by type and status, and worker concurrency per type.
+    """
+    return {
+        "success": True,
+        "jobs": await run_in_pool(STORAGE_POOL, get_job_queue().stats)
+    }
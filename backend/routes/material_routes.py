@@ -4,11 +4,20 @@ Handles adding notes, documents, and study materials to memory
 """
 
 import logging
-from fastapi import APIRouter, HTTPException
+import os
+import time
+import aiofiles
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import Dict, Any, Optional
 
-from services.memory_service import get_memory_service
+from services.memory_service import get_memory_service, TENANT_FIELD, DEDUP_MIN_SIMILARITY
+from services.executor_service import run_in_pool, ENCODER_POOL, STORAGE_POOL
+from services.ingestion_jobs import ingest_materials, MATERIAL_INGEST_JOB
+from services.job_queue import get_job_queue
+from services.bulk_import import import_job_view, spool_path, BULK_IMPORT_JOB, IMPORT_MAX_BYTES
+from routes.tenancy import get_tenant, is_admin
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -47,8 +56,44 @@ class MaterialBatchAddResponse(BaseModel):
     point_ids: list[str]
 
 
+def build_metadata(material: MaterialAddRequest, tenant: str) -> Dict[str, Any]:
+    """Merge explicit fields and the owning tenant into the material's metadata dictionary."""
+    metadata = material.metadata.copy() if material.metadata else {}
+    
+    if material.course:
+        metadata["course"] = material.course
+    if material.topic:
+        metadata["topic"] = material.topic
+    if material.source:
+        metadata["source"] = material.source
+    
+    # Default source if not specified
+    if "source" not in metadata:
+        metadata["source"] = "manual_entry"
+    
+    # The request's tenant always wins over client-supplied metadata
+    metadata[TENANT_FIELD] = tenant
+    
+    return metadata
+
+
+async def enqueue_materials(materials: list[MaterialAddRequest], tenant: str) -> JSONResponse:
+    """Queue materials for background ingestion and return 202 with the job ID."""
+    items = [
+        {"text": material.text, "metadata": build_metadata(material, tenant)}
+        for material in materials
+    ]
+    job_id = await get_job_queue().enqueue(MATERIAL_INGEST_JOB, {"items": items})
+    return JSONResponse(status_code=202, content={
+        "success": True,
+        "job_id": job_id,
+        "status": "queued"
+    })
+
+
 @router.post("/add", response_model=MaterialAddResponse)
-async def add_material(request: MaterialAddRequest) -> Dict[str, Any]:
+async def add_material(request: MaterialAddRequest, background: bool = False,
+                       tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Add study material or notes to memory.
     
@@ -59,34 +104,34 @@ async def add_material(request: MaterialAddRequest) -> Dict[str, Any]:
     4. Store in Qdrant
     5. Return success confirmation
     
+    With background=true the material is queued instead and the response is
+    202 with a job_id; poll GET /jobs/{job_id} for progress and the result.
+    
     Args:
         request: Material content and metadata
+        background: Queue the work and return immediately (default: False)
+        tenant: Owning user (X-User-ID header)
     
     Returns:
-        Success status and point ID
+        Success status and point ID (or job_id when queued)
     """
     try:
         # Validate text
         if not request.text or not request.text.strip():
             raise HTTPException(status_code=400, detail="Text content cannot be empty")
         
-        # Build comprehensive metadata
-        metadata = request.metadata.copy() if request.metadata else {}
-        
-        if request.course:
-            metadata["course"] = request.course
-        if request.topic:
-            metadata["topic"] = request.topic
-        if request.source:
-            metadata["source"] = request.source
+        if background:
+            return await enqueue_materials([request], tenant)
         
-        # Default source if not specified
-        if "source" not in metadata:
-            metadata["source"] = "manual_entry"
+        # Build comprehensive metadata
+        metadata = build_metadata(request, tenant)
         
         # Store in memory
-        memory = get_memory_service()
-        point_id = memory.add_text(request.text, metadata=metadata)
+        # First call loads the embedding model; keep it off the event loop
+        memory = await run_in_pool(ENCODER_POOL, get_memory_service)
+        point_id = await run_in_pool(
+            ENCODER_POOL, memory.add_text, request.text, metadata=metadata
+        )
         
         logger.info(f"✓ Material stored with ID: {point_id}")
         
@@ -104,48 +149,41 @@ async def add_material(request: MaterialAddRequest) -> Dict[str, Any]:
 
 
 @router.post("/add-batch", response_model=MaterialBatchAddResponse)
-async def add_materials_batch(request: MaterialBatchAddRequest) -> Dict[str, Any]:
+async def add_materials_batch(request: MaterialBatchAddRequest, background: bool = False,
+                              tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Add multiple study materials in batch for efficiency.
     
+    All materials are encoded in mini-batches and upserted in bounded
+    Qdrant batches (one request per batch, not per material).
+    
     Args:
         request: List of materials with metadata
+        background: Queue the work and return 202 with a job_id (default: False)
+        tenant: Owning user (X-User-ID header)
     
     Returns:
-        Success status and stored count
+        Success status and stored count (or job_id when queued)
     """
     try:
         if not request.materials:
             raise HTTPException(status_code=400, detail="No materials provided")
         
-        memory = get_memory_service()
-        point_ids = []
+        if background:
+            return await enqueue_materials(request.materials, tenant)
         
-        for material in request.materials:
-            # Build metadata
-            metadata = material.metadata.copy() if material.metadata else {}
-            
-            if material.course:
-                metadata["course"] = material.course
-            if material.topic:
-                metadata["topic"] = material.topic
-            if material.source:
-                metadata["source"] = material.source
-            
-            if "source" not in metadata:
-                metadata["source"] = "manual_entry"
-            
-            # Store individual material
-            point_id = memory.add_text(material.text, metadata=metadata)
-            point_ids.append(point_id)
+        items = [
+            {"text": material.text, "metadata": build_metadata(material, tenant)}
+            for material in request.materials
+        ]
+        result = await ingest_materials(items)
         
-        logger.info(f"✓ Batch stored {len(point_ids)} materials")
+        logger.info(f"✓ Batch stored {result['stored_count']} materials")
         
         return {
             "success": True,
-            "message": f"Successfully stored {len(point_ids)} materials",
-            "stored_count": len(point_ids),
-            "point_ids": point_ids
+            "message": f"Successfully stored {result['stored_count']} materials",
+            **result
         }
         
     except HTTPException:
@@ -155,17 +193,149 @@ async def add_materials_batch(request: MaterialBatchAddRequest) -> Dict[str, Any
         raise HTTPException(status_code=500, detail=f"Batch add failed: {str(e)}")
 
 
+@router.post("/import", status_code=202)
+async def import_materials(
+    request: Request,
+    course: Optional[str] = None,
+    topic: Optional[str] = None,
+    source: Optional[str] = None,
+    chunk_size: int = 500,
+    tenant: str = Depends(get_tenant)
+) -> Dict[str, Any]:
+    """
+    Streaming bulk import of NDJSON materials (one JSON object per line).
+    
+    Each line: {"text": "...", "course": "...", "topic": "...", "source": "...", "metadata": {...}}
+    Query parameters provide defaults for lines that omit course/topic/source.
+    
+    The body is streamed to disk in fixed-size chunks (never held in memory).
+    The parse -> chunk -> embed -> upsert pipeline then runs as a job on the
+    persistent job queue, so a restart resumes it instead of losing it.
+    Poll GET /materials/import/{job_id} for progress.
+    """
+    if chunk_size < 50:
+        raise HTTPException(status_code=400, detail="chunk_size must be at least 50")
+    
+    path = spool_path()
+    bytes_received = 0
+    
+    try:
+        async with aiofiles.open(path, "wb") as f:
+            async for chunk in request.stream():
+                bytes_received += len(chunk)
+                if bytes_received > IMPORT_MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Import exceeds {IMPORT_MAX_BYTES} bytes")
+                await f.write(chunk)
+    except Exception as e:
+        if os.path.exists(path):
+            os.remove(path)
+        if isinstance(e, HTTPException):
+            raise
+        logger.error(f"Failed to receive import: {e}")
+        raise HTTPException(status_code=500, detail=f"Import upload failed: {str(e)}")
+    
+    defaults = {"course": course, "topic": topic, "source": source, TENANT_FIELD: tenant}
+    job_id = await get_job_queue().enqueue(BULK_IMPORT_JOB, {
+        "path": path,
+        "defaults": defaults,
+        "chunk_size": chunk_size,
+        "bytes_received": bytes_received
+    })
+    
+    logger.info(f"✓ Import {job_id} received ({bytes_received} bytes)")
+    return {
+        "success": True,
+        "job_id": job_id,
+        "status": "queued",
+        "bytes_received": bytes_received
+    }
+
+
+@router.get("/import/{job_id}")
+async def import_status(job_id: str) -> Dict[str, Any]:
+    """
+    Get progress of a bulk import.
+    """
+    job = await run_in_pool(STORAGE_POOL, get_job_queue().get, job_id)
+    if job is None or job["type"] != BULK_IMPORT_JOB:
+        raise HTTPException(status_code=404, detail="Import job not found")
+    return import_job_view(job)
+
+
+# Near-duplicate collapse job state (one run at a time)
+dedup_state: Dict[str, Any] = {"status": "idle"}
+
+
+async def run_deduplication(similarity_threshold: float, dry_run: bool, tenant: Optional[str]):
+    """Background task: collapse near-duplicate vectors (one tenant, or all when None)."""
+    dedup_state.update({"status": "running", "started_at": time.time(), "result": None, "error": None})
+    try:
+        memory = await run_in_pool(ENCODER_POOL, get_memory_service)
+        result = await run_in_pool(
+            STORAGE_POOL, memory.collapse_duplicates,
+            similarity_threshold=similarity_threshold, dry_run=dry_run, tenant=tenant
+        )
+        dedup_state.update({"status": "completed", "result": result})
+    except Exception as e:
+        logger.error(f"Deduplication failed: {e}")
+        dedup_state.update({"status": "failed", "error": str(e)})
+    finally:
+        dedup_state["finished_at"] = time.time()
+
+
+@router.post("/deduplicate")
+async def deduplicate_materials(
+    background_tasks: BackgroundTasks,
+    similarity_threshold: float = 0.98,
+    dry_run: bool = False,
+    all_tenants: bool = False,
+    tenant: str = Depends(get_tenant),
+    admin: bool = Depends(is_admin)
+) -> Dict[str, Any]:
+    """
+    Start a background scan that collapses near-duplicate vectors.
+    Only the caller's materials are scanned; all_tenants=true scans every
+    user's and requires the admin token. Duplicates are only collapsed
+    within the same user/course/topic scope.
+    Poll GET /materials/deduplicate for progress.
+    """
+    if not DEDUP_MIN_SIMILARITY <= similarity_threshold <= 1.0:
+        raise HTTPException(status_code=400, detail=f"similarity_threshold must be in [{DEDUP_MIN_SIMILARITY}, 1]")
+    if all_tenants and not admin:
+        raise HTTPException(status_code=403, detail="Deduplicating all tenants requires X-Admin-Token")
+    if dedup_state["status"] == "running":
+        raise HTTPException(status_code=409, detail="Deduplication already running")
+    
+    scope = None if all_tenants else tenant
+    dedup_state["status"] = "running"
+    background_tasks.add_task(run_deduplication, similarity_threshold, dry_run, scope)
+    return {
+        "success": True,
+        "message": "Deduplication started",
+        "dry_run": dry_run,
+        "tenant": scope
+    }
+
+
+@router.get("/deduplicate")
+async def deduplication_status() -> Dict[str, Any]:
+    """
+    Get status of the latest deduplication run.
+    """
+    return dedup_state
+
+
 @router.get("/stats")
-async def get_memory_stats() -> Dict[str, Any]:
+async def get_memory_stats(tenant: str = Depends(get_tenant)) -> Dict[str, Any]:
     """
     Get statistics about stored materials.
     
     Returns:
-        Memory collection statistics
+        Memory collection statistics, including the caller's own point count
     """
     try:
-        memory = get_memory_service()
-        stats = memory.get_collection_stats()
+        memory = await run_in_pool(ENCODER_POOL, get_memory_service)
+        stats = await run_in_pool(STORAGE_POOL, memory.get_collection_stats, tenant=tenant)
         return {
             "success": True,
             "stats": stats
@@ -181,8 +351,8 @@ async def materials_health() -> Dict[str, str]:
     Health check for materials service.
     """
     try:
-        memory = get_memory_service()
-        stats = memory.get_collection_stats()
+        memory = await run_in_pool(ENCODER_POOL, get_memory_service)
+        stats = await run_in_pool(STORAGE_POOL, memory.get_collection_stats)
         return {
             "status": "healthy",
             "service": "materials",
@@ -0,0 +1,66 @@
+"""
+Streaming - Server-Sent Events for AI answers
+Shared by the AI routers that stream answers token by token
+"""
+
+import json
+import logging
+from fastapi.responses import StreamingResponse
+from typing import Dict, Any, Optional, AsyncIterator, Callable
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def sse_response(events: AsyncIterator[str]) -> StreamingResponse:
+    """Wrap an SSE event iterator in a non-buffered streaming response."""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+async def single_fragment(text: str) -> AsyncIterator[str]:
+    """Yield pre-computed text as a single stream fragment."""
+    yield text
+
+
+async def stream_answer(
+    metadata: Dict[str, Any],
+    fragments: AsyncIterator[str],
+    suffix: Optional[str] = None,
+    finalize: Optional[Callable[[str], Dict[str, Any]]] = None
+) -> AsyncIterator[str]:
+    """
+    Emit a streamed answer as SSE.
+    
+    Events:
+    - metadata: sent first, before any token (mode, memory quality, sources)
+    - token: {"text": fragment} for every generated fragment
+    - done: final data computed from the full answer
+    - error: if generation fails mid-stream
+    """
+    yield sse_event("metadata", metadata)
+    
+    parts = []
+    try:
+        async for fragment in fragments:
+            parts.append(fragment)
+            yield sse_event("token", {"text": fragment})
+        
+        if suffix:
+            parts.append(suffix)
+            yield sse_event("token", {"text": suffix})
+        
+        answer = "".join(parts)
+        yield sse_event("done", finalize(answer) if finalize else {})
+    except Exception as e:
+        logger.error(f"Streaming failed: {e}")
+        yield sse_event("error", {"detail": str(e)})
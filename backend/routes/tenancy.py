@@ -0,0 +1,49 @@
+"""
+Tenancy - Request user identity
+Resolves the tenant (user) a request acts for from the X-User-ID header
+
+Trust assumption: X-User-ID is NOT authenticated here. Any client that can
+reach the API can act as any user by sending their ID, so tenant isolation
+only holds when the backend sits behind an authenticating proxy (or
+gateway) that sets X-User-ID itself and strips client-supplied values.
+With STUDYPAL_REQUIRE_USER_ID=1 (multi-tenant deployments) a request
+without the header is rejected instead of falling back to the shared
+default tenant.
+
+Operations across all tenants (e.g. an unscoped deduplication) require
+X-Admin-Token to match STUDYPAL_ADMIN_TOKEN, and are disabled when it is unset.
+"""
+
+import hmac
+import os
+from fastapi import Header, HTTPException
+from typing import Optional
+
+from services.memory_service import resolve_tenant
+
+# Reject requests without X-User-ID instead of using the default tenant
+REQUIRE_USER_ID = os.getenv("STUDYPAL_REQUIRE_USER_ID", "0") == "1"
+
+# Shared secret for cross-tenant operations (unset: disabled)
+ADMIN_TOKEN = os.getenv("STUDYPAL_ADMIN_TOKEN", "")
+
+
+def get_tenant(x_user_id: Optional[str] = Header(None, description="User whose materials are read and written")) -> str:
+    """
+    FastAPI dependency: tenant ID from X-User-ID (default tenant when absent,
+    401 when absent and STUDYPAL_REQUIRE_USER_ID=1).
+    """
+    if REQUIRE_USER_ID and not (x_user_id or "").strip():
+        raise HTTPException(status_code=401, detail="X-User-ID header is required")
+    try:
+        return resolve_tenant(x_user_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def is_admin(x_admin_token: Optional[str] = Header(None, description="Admin token for cross-tenant operations")) -> bool:
+    """
+    FastAPI dependency: whether the request carries the admin token
+    (always False when STUDYPAL_ADMIN_TOKEN is unset).
+    """
+    return bool(ADMIN_TOKEN) and hmac.compare_digest((x_admin_token or "").encode(), ADMIN_TOKEN.encode())
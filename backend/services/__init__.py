@@ -5,6 +5,11 @@ Services package for StudyPal AI OS
 from .memory_service import get_memory_service, MemoryService
 from .ollama_service import get_ollama_service, OllamaService
 from .whisper_service import get_whisper_service, WhisperService
+from .executor_service import get_execution_service, ExecutionService, run_in_pool
+from .response_cache import get_response_cache, ResponseCache, SemanticKey
+from .embedding_store import get_embedding_store, EmbeddingStore
+from .job_queue import get_job_queue, JobQueue
+from .transcript_cache import get_transcript_cache, TranscriptCache
 
 __all__ = [
     "get_memory_service",
@@ -13,4 +18,16 @@ __all__ = [
     "OllamaService",
     "get_whisper_service",
     "WhisperService",
+    "get_execution_service",
+    "ExecutionService",
+    "run_in_pool",
+    "get_response_cache",
+    "ResponseCache",
+    "SemanticKey",
+    "get_embedding_store",
+    "EmbeddingStore",
+    "get_job_queue",
+    "JobQueue",
+    "get_transcript_cache",
+    "TranscriptCache",
 ]
@@ -0,0 +1,221 @@
+"""
+Bulk Import - Streaming NDJSON ingestion pipeline
+Reads one material per line and pipelines parse/chunk -> embed -> upsert
+with bounded queues between stages, so memory stays flat for any corpus size.
+Runs as a job on the persistent job queue; a resumed or retried import starts
+the spooled file again and skips chunks that are already stored
+"""
+
+import asyncio
+import json
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, List, Optional
+
+import aiofiles
+
+from services.chunking import chunk_text
+from services.executor_service import run_in_pool, ENCODER_POOL, STORAGE_POOL
+from services.job_queue import ProgressCallback
+from services.memory_service import get_memory_service, ENCODE_BATCH_SIZE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pipeline configuration
+IMPORT_DIR = os.getenv("STUDYPAL_IMPORT_DIR", "/tmp/studypal_import")
+IMPORT_QUEUE_SIZE = int(os.getenv("IMPORT_QUEUE_SIZE", "1024"))      # chunks between parse and embed
+IMPORT_UPSERT_QUEUE_SIZE = 4                                          # encoded batches awaiting upsert
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(2 * 1024 ** 3)))
+MAX_REPORTED_ERRORS = 20
+
+# Job type on the persistent job queue
+BULK_IMPORT_JOB = "bulk_import"
+
+os.makedirs(IMPORT_DIR, exist_ok=True)
+
+
+@dataclass
+class ImportJob:
+    """Progress of one bulk import run (reported as job progress and result)."""
+    bytes_received: int = 0
+    lines_read: int = 0
+    items_parsed: int = 0
+    chunks_queued: int = 0
+    chunks_skipped: int = 0
+    chunks_embedded: int = 0
+    chunks_stored: int = 0
+    error_count: int = 0
+    errors: List[str] = field(default_factory=list)
+
+    def record_error(self, message: str):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(message)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def spool_path() -> str:
+    """New temp file for an upload to be streamed into (kept until its job finishes)."""
+    return os.path.join(IMPORT_DIR, f"{uuid.uuid4()}.ndjson")
+
+
+def import_job_view(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Flatten a bulk import job from the job queue into the import status format:
+    pipeline counters (latest progress, or the result once completed) plus job state.
+    """
+    return {
+        **ImportJob().to_dict(),
+        **(job["result"] or job["progress"] or {}),
+        "id": job["id"],
+        "status": job["status"],
+        "error": job["error"],
+        "attempts": job["attempts"],
+        "created_at": job["created_at"],
+        "finished_at": job["finished_at"]
+    }
+
+
+def parse_line(line: str, defaults: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Parse one NDJSON material.
+
+    Accepted fields: text (required), course, topic, source, metadata.
+
+    Returns:
+        {"text", "metadata"} or None for blank lines
+    """
+    line = line.strip()
+    if not line:
+        return None
+
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError("line is not a JSON object")
+    text = record.get("text")
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError("missing 'text'")
+
+    metadata = dict(record.get("metadata") or {})
+    for key in ("course", "topic", "source"):
+        value = record.get(key) or defaults.get(key)
+        if value:
+            metadata[key] = value
+        # Filters match strings; numbers (e.g. "course": 101) are stored as text
+        if isinstance(metadata.get(key), (int, float)):
+            metadata[key] = str(metadata[key])
+        elif metadata.get(key) is not None and not isinstance(metadata[key], str):
+            raise ValueError(f"'{key}' must be a string")
+    metadata.setdefault("source", "bulk_import")
+    # Lines cannot write into another user's materials
+    if defaults.get("user_id"):
+        metadata["user_id"] = defaults["user_id"]
+
+    return {"text": text, "metadata": metadata}
+
+
+async def _parse_stage(job: ImportJob, path: str, defaults: Dict[str, Any],
+                       chunk_size: int, out_queue: asyncio.Queue):
+    """Read the spool file line by line, parse and chunk each material."""
+    async with aiofiles.open(path, "r", encoding="utf-8") as f:
+        async for line in f:
+            job.lines_read += 1
+            try:
+                material = parse_line(line, defaults)
+            except Exception as e:
+                job.record_error(f"line {job.lines_read}: {e}")
+                continue
+            if material is None:
+                continue
+
+            job.items_parsed += 1
+            for chunk in chunk_text(material["text"], chunk_size=chunk_size):
+                await out_queue.put({"text": chunk, "metadata": material["metadata"]})
+                job.chunks_queued += 1
+    await out_queue.put(None)
+
+
+async def _embed_stage(job: ImportJob, in_queue: asyncio.Queue, out_queue: asyncio.Queue):
+    """Group chunks into mini-batches, drop already-stored ones and encode the rest."""
+    memory = get_memory_service()
+    batch = []
+    finished = False
+
+    while not finished:
+        item = await in_queue.get()
+        if item is None:
+            finished = True
+        else:
+            batch.append(item)
+
+        if batch and (finished or len(batch) >= ENCODE_BATCH_SIZE):
+            point_ids, pending = await run_in_pool(STORAGE_POOL, memory.new_items, batch)
+            job.chunks_skipped += len(point_ids) - len(pending)
+            if pending:
+                vectors = await run_in_pool(
+                    ENCODER_POOL, memory.encode_texts, [text for _, (text, _) in pending]
+                )
+                job.chunks_embedded += len(pending)
+                await out_queue.put((pending, vectors))
+            batch = []
+
+    await out_queue.put(None)
+
+
+async def _upsert_stage(job: ImportJob, in_queue: asyncio.Queue, progress: ProgressCallback):
+    """Write encoded batches to Qdrant and report progress after each one."""
+    memory = get_memory_service()
+    while True:
+        entry = await in_queue.get()
+        if entry is None:
+            break
+        pending, vectors = entry
+        await run_in_pool(STORAGE_POOL, memory.upsert_encoded, pending, vectors, wait=False)
+        job.chunks_stored += len(pending)
+        await progress(job.to_dict())
+
+
+async def run_import(job: ImportJob, path: str, defaults: Dict[str, Any], chunk_size: int,
+                     progress: ProgressCallback):
+    """
+    Run the import pipeline over a spooled NDJSON file.
+
+    Args:
+        job: Counters to report progress on
+        path: NDJSON file
+        defaults: Default course/topic/source for lines that omit them, and the owning user_id
+        chunk_size: Target chunk size (characters)
+        progress: Job progress callback
+    """
+    chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_QUEUE_SIZE)
+    upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=IMPORT_UPSERT_QUEUE_SIZE)
+    tasks = [
+        asyncio.create_task(_parse_stage(job, path, defaults, chunk_size, chunk_queue)),
+        asyncio.create_task(_embed_stage(job, chunk_queue, upsert_queue)),
+        asyncio.create_task(_upsert_stage(job, upsert_queue, progress)),
+    ]
+
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        # A failed stage (or shutdown) stops the others
+        for task in tasks:
+            task.cancel()
+    logger.info(f"✓ Import of {os.path.basename(path)}: {job.items_parsed} materials, "
+                f"{job.chunks_stored} chunks stored, {job.chunks_skipped} already in memory")
+
+
+async def bulk_import_handler(payload: Dict[str, Any], progress: ProgressCallback) -> Dict[str, Any]:
+    """Job handler: payload {"path", "defaults", "chunk_size", "bytes_received"}."""
+    path = payload["path"]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Spooled import file is missing: {path}")
+    job = ImportJob(bytes_received=payload.get("bytes_received", 0))
+    await run_import(job, path, payload["defaults"], payload.get("chunk_size", 500), progress)
+    return job.to_dict()
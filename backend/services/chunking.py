@@ -0,0 +1,143 @@
+"""
+Text Chunking - Split long material into memory-sized chunks
+Sentence-aware splitting shared by ingestion pipelines, and
+segment-aware splitting of transcripts that keeps timestamps
+"""
+
+import os
+import re
+from collections import deque
+from typing import Any, Deque, Dict, List, Tuple
+
+# Sentence boundary: whitespace following ., ! or ?
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+# Transcript chunk sizing in whitespace tokens (override with environment variables).
+# The default stays under the encoder's 256 word-piece input limit.
+TRANSCRIPT_CHUNK_TOKENS = int(os.getenv("TRANSCRIPT_CHUNK_TOKENS", "128"))
+TRANSCRIPT_OVERLAP_TOKENS = int(os.getenv("TRANSCRIPT_OVERLAP_TOKENS", "16"))
+
+
+def chunk_text(text: str, chunk_size: int = 500) -> List[str]:
+    """
+    Split text into chunks of roughly chunk_size characters on sentence boundaries.
+    Runs in linear time (sentences are joined once per chunk).
+
+    Args:
+        text: Text to split
+        chunk_size: Target size for each chunk (characters)
+
+    Returns:
+        List of text chunks
+    """
+    chunks = []
+    current: List[str] = []
+    current_length = 0
+
+    for sentence in SENTENCE_BOUNDARY.split(text.strip()):
+        if not sentence:
+            continue
+        # If adding this sentence would exceed chunk_size and we have content
+        if current and current_length + len(sentence) > chunk_size:
+            chunks.append(" ".join(current))
+            current = []
+            current_length = 0
+        current.append(sentence)
+        current_length += len(sentence) + 1
+
+    # Add final chunk
+    if current:
+        chunks.append(" ".join(current))
+
+    return chunks
+
+
+class SegmentChunker:
+    """
+    Groups timestamped transcript segments into chunks of at most max_tokens,
+    repeating up to overlap_tokens of trailing segments at the start of the
+    next chunk. Segments can be fed incrementally (e.g. one window at a time).
+
+    Each segment is joined into at most 1 + overlap chunks, so the total work
+    is linear in the transcript length.
+    """
+
+    def __init__(self, max_tokens: int = TRANSCRIPT_CHUNK_TOKENS,
+                 overlap_tokens: int = TRANSCRIPT_OVERLAP_TOKENS):
+        """
+        Args:
+            max_tokens: Maximum tokens per chunk
+            overlap_tokens: Tokens of trailing segments repeated in the next chunk
+        """
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens - 1))
+        self._current: Deque[Tuple[Dict[str, Any], int]] = deque()
+        self._tokens = 0
+        self._fresh = False  # current holds segments not yet emitted
+
+    def _emit(self) -> Dict[str, Any]:
+        segments = [segment for segment, _ in self._current]
+        return {
+            "text": " ".join(segment["text"].strip() for segment in segments),
+            "start": segments[0]["start"],
+            "end": segments[-1]["end"]
+        }
+
+    def _keep_overlap(self):
+        while self._current and self._tokens > self.overlap_tokens:
+            _, tokens = self._current.popleft()
+            self._tokens -= tokens
+        self._fresh = False
+
+    def add(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Add segments ({"start", "end", "text"}).
+
+        Returns:
+            Chunks ({"text", "start", "end"}) completed by these segments
+        """
+        chunks = []
+        for segment in segments:
+            tokens = len(segment["text"].split())
+            if not tokens:
+                continue
+            if self._current and self._tokens + tokens > self.max_tokens:
+                if self._fresh:
+                    chunks.append(self._emit())
+                    self._keep_overlap()
+                # Overlap alone plus this segment still too long: drop the overlap
+                if self._tokens + tokens > self.max_tokens:
+                    self._current.clear()
+                    self._tokens = 0
+            self._current.append((segment, tokens))
+            self._tokens += tokens
+            self._fresh = True
+        return chunks
+
+    def flush(self) -> List[Dict[str, Any]]:
+        """
+        Emit the final partial chunk.
+        """
+        chunks = [self._emit()] if self._current and self._fresh else []
+        self._current.clear()
+        self._tokens = 0
+        self._fresh = False
+        return chunks
+
+
+def chunk_segments(segments: List[Dict[str, Any]],
+                   max_tokens: int = TRANSCRIPT_CHUNK_TOKENS,
+                   overlap_tokens: int = TRANSCRIPT_OVERLAP_TOKENS) -> List[Dict[str, Any]]:
+    """
+    Split transcript segments into timestamped chunks.
+
+    Args:
+        segments: Whisper segments ({"start", "end", "text"})
+        max_tokens: Maximum tokens per chunk
+        overlap_tokens: Tokens repeated between consecutive chunks
+
+    Returns:
+        List of {"text", "start", "end"} chunks
+    """
+    chunker = SegmentChunker(max_tokens, overlap_tokens)
+    return chunker.add(segments) + chunker.flush()
@@ -0,0 +1,145 @@
+"""
+Embedding Store - Content-addressed embedding persistence
+Maps hash(normalized text) + encoder model name to a float32 embedding so
+re-ingesting the same material never runs the encoder twice
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Store configuration (override with environment variables)
+CACHE_DIR = os.getenv("STUDYPAL_CACHE_DIR", "/tmp/studypal_cache")
+EMBEDDING_STORE_PATH = os.getenv("EMBEDDING_STORE_PATH", os.path.join(CACHE_DIR, "embeddings.sqlite3"))
+EMBEDDING_STORE_ENABLED = os.getenv("EMBEDDING_STORE_ENABLED", "1") == "1"
+
+# SQLite limits the number of bound parameters per statement
+SQL_BATCH_SIZE = 500
+
+
+def content_hash(text: str) -> str:
+    """
+    Hash of whitespace-normalized text.
+    Whitespace differences do not change tokenization, so they share a key.
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class EmbeddingStore:
+    """
+    SQLite-backed store of float32 embeddings keyed by (content hash, model).
+    """
+
+    def __init__(self, db_path: str = EMBEDDING_STORE_PATH):
+        """
+        Args:
+            db_path: SQLite database file
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "hash TEXT NOT NULL, model TEXT NOT NULL, dim INTEGER NOT NULL, vector BLOB NOT NULL, "
+            "PRIMARY KEY (hash, model))"
+        )
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"✓ Embedding store at {db_path}")
+
+
+    def get_many(self, hashes: Iterable[str], model: str) -> Dict[str, np.ndarray]:
+        """
+        Fetch stored embeddings.
+
+        Args:
+            hashes: Content hashes to look up
+            model: Encoder model name
+
+        Returns:
+            Mapping of hash to float32 vector for the hashes that were found
+        """
+        wanted = list(dict.fromkeys(hashes))
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            for start in range(0, len(wanted), SQL_BATCH_SIZE):
+                batch = wanted[start:start + SQL_BATCH_SIZE]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._db.execute(
+                    f"SELECT hash, vector FROM embeddings WHERE model = ? AND hash IN ({placeholders})",
+                    [model, *batch]
+                ).fetchall()
+                for row_hash, blob in rows:
+                    found[row_hash] = np.frombuffer(blob, dtype=np.float32)
+            self.hits += len(found)
+            self.misses += len(wanted) - len(found)
+        return found
+
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]], model: str):
+        """
+        Store embeddings.
+
+        Args:
+            items: (content hash, vector) pairs
+            model: Encoder model name
+        """
+        if not items:
+            return
+        rows = []
+        for item_hash, vector in items:
+            vector = np.asarray(vector, dtype=np.float32)
+            rows.append((item_hash, model, int(vector.shape[-1]), vector.tobytes()))
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO embeddings (hash, model, dim, vector) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            self._db.commit()
+
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get store statistics.
+
+        Returns:
+            Stored vector count and lookup hit/miss counters
+        """
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            return {
+                "stored_vectors": count,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Global instance
+embedding_store = None
+
+def get_embedding_store() -> Optional[EmbeddingStore]:
+    """
+    Get or create singleton EmbeddingStore instance.
+    Returns None when the store is disabled or cannot be opened.
+    """
+    global embedding_store
+    if embedding_store is None and EMBEDDING_STORE_ENABLED:
+        try:
+            embedding_store = EmbeddingStore()
+        except Exception as e:
+            logger.warning(f"⚠ Embedding store unavailable, encoding every chunk: {e}")
+            return None
+    return embedding_store
@@ -0,0 +1,198 @@
+"""
+Executor Service - Non-blocking execution for blocking AI workloads
+Runs embeddings, Whisper and Ollama calls on bounded thread pools so the
+FastAPI event loop stays free to serve other requests
+"""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pool names
+ENCODER_POOL = "encoder"  # sentence-transformers forward passes (CPU bound)
+WHISPER_POOL = "whisper"  # Whisper transcription (CPU bound, memory heavy)
+LLM_POOL = "llm"          # Ollama HTTP calls (I/O bound, long running)
+STORAGE_POOL = "storage"  # Qdrant reads/writes that are not tied to encoding
+
+# Pool sizes (override with environment variables)
+POOL_SIZES = {
+    ENCODER_POOL: int(os.getenv("STUDYPAL_ENCODER_WORKERS", "2")),
+    # With a Whisper process pool, one coordinating thread per worker process
+    WHISPER_POOL: int(os.getenv("STUDYPAL_WHISPER_WORKERS", os.getenv("WHISPER_PROCESSES", "1"))),
+    LLM_POOL: int(os.getenv("STUDYPAL_LLM_WORKERS", "8")),
+    STORAGE_POOL: int(os.getenv("STUDYPAL_STORAGE_WORKERS", "4")),
+}
+
+
+class BoundedPool:
+    """
+    Fixed-size thread pool that tracks queue depth and wait time.
+    """
+
+    def __init__(self, name: str, max_workers: int):
+        """
+        Args:
+            name: Pool name (used for thread names and stats)
+            max_workers: Maximum number of concurrently running tasks
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix=f"studypal-{name}"
+        )
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """
+        Submit a blocking callable to the pool.
+
+        Returns:
+            concurrent.futures.Future with the callable's result
+        """
+        enqueued_at = time.perf_counter()
+        with self._lock:
+            self._queued += 1
+
+        def _run():
+            waited = time.perf_counter() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._active += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+            failed = False
+            try:
+                return fn(*args, **kwargs)
+            except BaseException:
+                failed = True
+                raise
+            finally:
+                with self._lock:
+                    self._active -= 1
+                    self._completed += 1
+                    if failed:
+                        self._failed += 1
+
+        return self.executor.submit(_run)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the pool and await its result.
+        """
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get current pool statistics.
+
+        Returns:
+            Dictionary with workers, queue depth and wait times (ms)
+        """
+        with self._lock:
+            started = self._completed + self._active
+            return {
+                "max_workers": self.max_workers,
+                "active": self._active,
+                "queue_depth": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2),
+            }
+
+    def shutdown(self):
+        """Stop accepting work and wait for running tasks."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+class ExecutionService:
+    """
+    Holds the separately sized pools for encoders, Whisper and LLM I/O.
+    """
+
+    def __init__(self, pool_sizes: Dict[str, int] = None):
+        """
+        Args:
+            pool_sizes: Mapping of pool name to worker count
+        """
+        sizes = pool_sizes or POOL_SIZES
+        self.pools = {name: BoundedPool(name, size) for name, size in sizes.items()}
+        logger.info(
+            "✓ Execution pools ready: "
+            + ", ".join(f"{name}={pool.max_workers}" for name, pool in self.pools.items())
+        )
+
+    def get_pool(self, name: str) -> BoundedPool:
+        """Get pool by name."""
+        if name not in self.pools:
+            raise ValueError(f"Unknown execution pool: {name}")
+        return self.pools[name]
+
+    async def run(self, pool: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the named pool and await its result.
+        """
+        return await self.get_pool(pool).run(fn, *args, **kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get statistics for every pool."""
+        return {name: pool.stats() for name, pool in self.pools.items()}
+
+    def shutdown(self):
+        """Shut down all pools."""
+        for pool in self.pools.values():
+            pool.shutdown()
+        logger.info("✓ Execution pools shut down")
+
+
+# Global instance
+execution_service = None
+
+def get_execution_service() -> ExecutionService:
+    """
+    Get or create singleton ExecutionService instance.
+    """
+    global execution_service
+    if execution_service is None:
+        execution_service = ExecutionService()
+    return execution_service
+
+
+async def run_in_pool(pool: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Await a blocking callable on one of the shared execution pools.
+
+    Args:
+        pool: Pool name (ENCODER_POOL, WHISPER_POOL, LLM_POOL or STORAGE_POOL)
+        fn: Blocking callable
+        *args, **kwargs: Passed to the callable
+
+    Returns:
+        Result of the callable
+    """
+    return await get_execution_service().run(pool, fn, *args, **kwargs)
+
+
+def shutdown_execution_service():
+    """
+    Shut down the singleton ExecutionService if it was created.
+    """
+    global execution_service
+    if execution_service is not None:
+        execution_service.shutdown()
+        execution_service = None
@@ -375,7 +375,8 @@ Return ONLY the JSON array.'''
         topic: str,
         subtopics: List[str],
         exam_format: str = "multiple_choice",
-        num_cards: int = 10
+        num_cards: int = 10,
+        subtopic_notes: Optional[Dict[str, List[str]]] = None
     ) -> List[ExamGradeFlashcard]:
         """
         Generate cards that exactly simulate real exam questions.
@@ -385,19 +386,28 @@ Return ONLY the JSON array.'''
             subtopics: Specific subtopics to cover
             exam_format: Type of exam (multiple_choice, short_answer, essay)
             num_cards: Number of cards
+            subtopic_notes: Study material per subtopic to ground the questions in
         
         Returns:
             List of EXAM-type flashcards
         """
         subtopic_list = "\n".join([f"- {st}" for st in subtopics])
         
+        material = ""
+        if subtopic_notes:
+            notes = "\n\n".join(
+                f"[{subtopic}]\n" + "\n".join(chunk[:400] for chunk in chunks)
+                for subtopic, chunks in subtopic_notes.items()
+            )
+            material = f"\n📖 STUDY MATERIAL (base questions on this where it applies):\n{notes}\n"
+        
         prompt = f'''Generate {num_cards} EXAM-STYLE flashcards that could appear on a real {exam_format} exam.
 
 📚 TOPIC: {topic}
 
 📋 SUBTOPICS TO COVER:
 {subtopic_list}
-
+{material}
 Create exam-style questions that:
 1. Are phrased exactly like real exam questions
 2. Test understanding, not just memorization
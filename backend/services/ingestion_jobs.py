@@ -0,0 +1,314 @@
+"""
+Ingestion Jobs - Material and audio ingestion as queueable work
+Shared by the synchronous routes and the background job queue workers
+"""
+
+import logging
+import os
+from typing import Any, Dict, List, Optional
+
+from services.chunking import SegmentChunker, chunk_segments
+from services.executor_service import (
+    get_execution_service, run_in_pool, ENCODER_POOL, WHISPER_POOL, STORAGE_POOL
+)
+from services.job_queue import JobQueue, ProgressCallback
+from services.bulk_import import bulk_import_handler, BULK_IMPORT_JOB
+from services.memory_service import get_memory_service, PARALLEL_UPSERTS
+from services.transcript_cache import get_transcript_cache
+from services.whisper_models import get_whisper_models, audio_duration, AUTO_TIER
+from services.whisper_service import WHISPER_LANGUAGE
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Job types
+MATERIAL_INGEST_JOB = "material_ingest"
+AUDIO_TRANSCRIBE_JOB = "audio_transcribe"
+
+# Uploaded audio waiting for a worker (kept until the job finishes)
+AUDIO_SPOOL_DIR = os.getenv("STUDYPAL_AUDIO_SPOOL_DIR", "/tmp/studypal_audio/queued")
+os.makedirs(AUDIO_SPOOL_DIR, exist_ok=True)
+
+
+async def _no_progress(progress: Dict[str, Any]):
+    pass
+
+
+async def ingest_materials(items: List[Dict[str, Any]],
+                           progress: ProgressCallback = _no_progress) -> Dict[str, Any]:
+    """
+    Encode and store materials.
+
+    Args:
+        items: List of {"text", "metadata"} dictionaries
+        progress: Progress callback
+
+    Returns:
+        {"stored_count", "point_ids"}
+    """
+    await progress({"stage": "embedding", "items": len(items)})
+    memory = get_memory_service()
+    point_ids = await run_in_pool(
+        ENCODER_POOL,
+        memory.add_items_batch,
+        items,
+        wait=False,
+        parallel_upserts=PARALLEL_UPSERTS
+    )
+    await progress({"stage": "stored", "items": len(items), "stored": len(point_ids)})
+    return {"stored_count": len(point_ids), "point_ids": point_ids}
+
+
+def audio_metadata(filename: str, language: str, course: Optional[str], topic: Optional[str],
+                   audio_hash: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
+    """Metadata stored with transcript chunks."""
+    metadata = {
+        "source": "audio",
+        "filename": filename,
+        "language": language
+    }
+    if user_id:
+        metadata["user_id"] = user_id
+    if audio_hash:
+        metadata["audio_sha256"] = audio_hash
+    if course:
+        metadata["course"] = course
+    if topic:
+        metadata["topic"] = topic
+    return metadata
+
+
+async def store_transcript_chunks(chunks: List[Dict[str, Any]], metadata: Dict[str, Any]) -> int:
+    """
+    Store timestamped transcript chunks; start/end seconds go into each payload
+    so search hits can point at the moment in the recording.
+
+    Returns:
+        Number of chunks stored
+    """
+    memory = get_memory_service()
+    items = [
+        {"text": chunk["text"], "metadata": {**metadata, "start_time": chunk["start"], "end_time": chunk["end"]}}
+        for chunk in chunks
+    ]
+    point_ids = await run_in_pool(ENCODER_POOL, memory.add_items_batch, items)
+    return len(point_ids)
+
+
+async def choose_tier(path: str, tier: Optional[str]) -> str:
+    """
+    Resolve the Whisper tier for a recording ("auto" looks at its duration
+    and the transcription queue depth).
+    """
+    models = get_whisper_models()
+    if (tier or models.default_tier) != AUTO_TIER:
+        return models.resolve_tier(tier)
+    duration = await run_in_pool(STORAGE_POOL, audio_duration, path)
+    queue_depth = get_execution_service().get_pool(WHISPER_POOL).stats()["queue_depth"]
+    chosen = models.resolve_tier(AUTO_TIER, duration=duration, queue_depth=queue_depth)
+    logger.info(f"✓ Whisper tier '{chosen}' (duration={duration}, queue_depth={queue_depth})")
+    return chosen
+
+
+async def transcribe_and_store(path: str, filename: str, store_in_memory: bool = True,
+                               course: Optional[str] = None, topic: Optional[str] = None,
+                               progress: ProgressCallback = _no_progress,
+                               streaming: bool = False,
+                               audio_hash: Optional[str] = None,
+                               tier: Optional[str] = None,
+                               user_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Transcribe an audio file and optionally store its chunks in memory.
+
+    Args:
+        path: Audio file on disk
+        filename: Original filename (stored in metadata)
+        store_in_memory: Whether to store chunks in memory
+        course: Optional course name for metadata
+        topic: Optional topic for metadata
+        progress: Progress callback
+        streaming: Transcribe in windows and store chunks as each window finishes
+        audio_hash: sha256 of the uploaded bytes (stored in metadata and returned)
+        tier: Whisper model size, "auto", or None for the default tier
+        user_id: Tenant that owns the stored chunks (None = default tenant)
+
+    Returns:
+        Transcript, stored chunk count, language, model and (if not stored) chunks
+    """
+    models = get_whisper_models()
+
+    # A re-uploaded recording skips transcription; only storage runs again.
+    # "auto" accepts a cached transcript from any tier, most accurate first.
+    cache = get_transcript_cache() if audio_hash else None
+    result = None
+    if cache is not None:
+        if (tier or models.default_tier) == AUTO_TIER:
+            candidates = list(reversed(models.tiers))
+        else:
+            candidates = [models.resolve_tier(tier)]
+        result = await run_in_pool(STORAGE_POOL, cache.get_any, audio_hash, candidates, WHISPER_LANGUAGE)
+        if result is not None:
+            logger.info(f"✓ Transcript cache hit: {audio_hash[:12]} ({result['model']})")
+            await progress({"stage": "cached"})
+            # Re-chunk from segments so chunking settings always apply
+            result["chunks"] = chunk_segments(result["segments"])
+
+    if result is None:
+        model_name = await choose_tier(path, tier)
+        if streaming:
+            return await transcribe_and_store_streaming(
+                path, filename, store_in_memory, course, topic, progress, audio_hash, model_name, user_id
+            )
+
+        await progress({"stage": "transcribing", "model": model_name})
+        async with models.use_async(model_name) as whisper:
+            result = await run_in_pool(WHISPER_POOL, whisper.transcribe_and_chunk, path)
+        result["model"] = model_name
+        if cache is not None:
+            await run_in_pool(
+                STORAGE_POOL, cache.put, audio_hash, model_name, WHISPER_LANGUAGE,
+                result["transcript"], result["segments"], result["chunks"]
+            )
+
+    transcript = result["transcript"]
+    chunks = result["chunks"]
+    language = result["language"]
+
+    logger.info(f"✓ Transcription complete: {len(chunks)} chunks")
+
+    stored_count = 0
+    if store_in_memory and chunks:
+        await progress({"stage": "storing", "chunks": len(chunks)})
+        metadata = audio_metadata(filename, language, course, topic, audio_hash, user_id)
+        stored_count = await store_transcript_chunks(chunks, metadata)
+
+        logger.info(f"✓ Stored {stored_count} chunks in memory")
+
+    await progress({"stage": "done", "chunks": len(chunks), "stored": stored_count})
+    return {
+        "transcript": transcript,
+        "stored_chunks": stored_count,
+        "language": language,
+        "model": result["model"],
+        "chunks": chunks if not store_in_memory else None,
+        "audio_sha256": audio_hash
+    }
+
+
+async def transcribe_and_store_streaming(path: str, filename: str, store_in_memory: bool,
+                                         course: Optional[str], topic: Optional[str],
+                                         progress: ProgressCallback,
+                                         audio_hash: Optional[str], model_name: str,
+                                         user_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Streaming variant of transcribe_and_store.
+
+    Each finished window is chunked, embedded and upserted immediately, and the
+    partial transcript is reported through progress. The chunker keeps the
+    unfinished chunk across windows so chunks do not break at window edges.
+    Point IDs are content-derived, so a resumed job re-upserts without duplicates.
+    """
+    chunker = SegmentChunker()
+    segments: List[Dict[str, Any]] = []
+    chunks: List[Dict[str, Any]] = []
+    stored_count = 0
+    language = WHISPER_LANGUAGE
+
+    models = get_whisper_models()
+    async with models.use_async(model_name) as whisper:
+        windows = whisper.transcribe_stream(path)
+        try:
+            while True:
+                window = await run_in_pool(WHISPER_POOL, next, windows, None)
+                if window is None:
+                    break
+                language = window["language"]
+                segments.extend(window["segments"])
+
+                ready = chunker.add(window["segments"])
+                chunks.extend(ready)
+
+                if store_in_memory and ready:
+                    metadata = audio_metadata(filename, language, course, topic, audio_hash, user_id)
+                    stored_count += await store_transcript_chunks(ready, metadata)
+
+                await progress({
+                    "stage": "transcribing",
+                    "model": model_name,
+                    "processed_seconds": window["end"],
+                    "chunks": len(chunks),
+                    "stored": stored_count,
+                    "partial_transcript": " ".join(segment["text"] for segment in segments)
+                })
+        finally:
+            windows.close()
+
+    tail = chunker.flush()
+    chunks.extend(tail)
+    if store_in_memory and tail:
+        metadata = audio_metadata(filename, language, course, topic, audio_hash, user_id)
+        stored_count += await store_transcript_chunks(tail, metadata)
+
+    transcript = " ".join(segment["text"] for segment in segments)
+    cache = get_transcript_cache() if audio_hash else None
+    if cache is not None:
+        await run_in_pool(
+            STORAGE_POOL, cache.put, audio_hash, model_name, WHISPER_LANGUAGE,
+            transcript, segments, chunks
+        )
+    logger.info(f"✓ Streaming transcription complete: {len(chunks)} chunks, {stored_count} stored")
+
+    await progress({"stage": "done", "chunks": len(chunks), "stored": stored_count})
+    return {
+        "transcript": transcript,
+        "stored_chunks": stored_count,
+        "language": language,
+        "model": model_name,
+        "chunks": chunks if not store_in_memory else None,
+        "audio_sha256": audio_hash
+    }
+
+
+async def material_ingest_handler(payload: Dict[str, Any], progress: ProgressCallback) -> Dict[str, Any]:
+    """Job handler: payload {"items": [...]}."""
+    return await ingest_materials(payload["items"], progress)
+
+
+async def audio_transcribe_handler(payload: Dict[str, Any], progress: ProgressCallback) -> Dict[str, Any]:
+    """Job handler: payload {"path", "filename", "store_in_memory", "course", "topic", "streaming", "audio_hash", "model", "user_id"}."""
+    path = payload["path"]
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Queued audio file is missing: {path}")
+    # The spooled file is kept for retries and removed by remove_spooled_file
+    return await transcribe_and_store(
+        path,
+        payload["filename"],
+        store_in_memory=payload.get("store_in_memory", True),
+        course=payload.get("course"),
+        topic=payload.get("topic"),
+        progress=progress,
+        streaming=payload.get("streaming", False),
+        audio_hash=payload.get("audio_hash"),
+        tier=payload.get("model"),
+        user_id=payload.get("user_id")
+    )
+
+
+def remove_spooled_file(payload: Dict[str, Any]):
+    """Job cleanup: delete the spooled upload once the job will not run again."""
+    try:
+        os.remove(payload["path"])
+    except OSError:
+        pass
+
+
+def register_ingestion_jobs(queue: JobQueue):
+    """
+    Register ingestion job types.
+    Worker counts: JOB_WORKERS_MATERIAL_INGEST (default 2), JOB_WORKERS_AUDIO_TRANSCRIBE (default 1),
+    JOB_WORKERS_BULK_IMPORT (default 1).
+    """
+    queue.register(MATERIAL_INGEST_JOB, material_ingest_handler, concurrency=2)
+    queue.register(AUDIO_TRANSCRIBE_JOB, audio_transcribe_handler, concurrency=1, cleanup=remove_spooled_file)
+    queue.register(BULK_IMPORT_JOB, bulk_import_handler, concurrency=1, cleanup=remove_spooled_file)
@@ -0,0 +1,432 @@
+"""
+Job Queue - Persistent background jobs for ingestion and transcription
+SQLite-backed queue with in-process asyncio workers; queued and interrupted
+jobs are picked up again after a restart, and failed jobs are retried with
+exponential backoff. Running jobs hold a lease that their worker renews, so
+several processes can share one queue database: only jobs whose lease has
+expired (their process died) are requeued.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from services.executor_service import run_in_pool, STORAGE_POOL
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Queue configuration (override with environment variables)
+JOB_DB_PATH = os.getenv("JOB_DB_PATH", os.path.join(os.getenv("STUDYPAL_CACHE_DIR", "/tmp/studypal_cache"), "jobs.sqlite3"))
+JOB_POLL_INTERVAL = 1.0            # seconds between idle queue checks
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))                  # runs (failures or restarts) before a job is failed
+JOB_RETRY_BASE_SECONDS = float(os.getenv("JOB_RETRY_BASE_SECONDS", "5"))    # retry delay: base * 2^(attempt - 1)
+JOB_RETRY_MAX_SECONDS = 300
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", str(7 * 24 * 3600)))
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "120"))            # running jobs not renewed for this long are requeued
+JOB_HEARTBEAT_SECONDS = JOB_LEASE_SECONDS / 4                                # lease renewal interval while a job runs
+
+# Job statuses
+QUEUED = "queued"
+RUNNING = "running"
+COMPLETED = "completed"
+FAILED = "failed"
+
+# Errors caused by the job input itself; retrying cannot fix them
+NON_RETRYABLE_ERRORS = (FileNotFoundError, ValueError, KeyError, TypeError)
+
+# Handler signature: (payload, report_progress) -> result
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+JobHandler = Callable[[Dict[str, Any], ProgressCallback], Awaitable[Dict[str, Any]]]
+# Cleanup signature: (payload) -> None, called once a job has completed or finally failed
+JobCleanup = Callable[[Dict[str, Any]], None]
+
+
+@dataclass
+class JobType:
+    """Registered job type."""
+    name: str
+    handler: JobHandler
+    concurrency: int
+    cleanup: Optional[JobCleanup] = None
+
+
+class JobQueue:
+    """
+    Persistent job queue with per-type worker concurrency.
+
+    SQLite access from the workers and the async API runs on the storage pool,
+    never on the event loop.
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        """
+        Args:
+            db_path: SQLite database file
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, type TEXT NOT NULL, status TEXT NOT NULL, "
+            "payload TEXT NOT NULL, progress TEXT, result TEXT, error TEXT, "
+            "attempts INTEGER NOT NULL DEFAULT 0, "
+            "created_at REAL NOT NULL, started_at REAL, finished_at REAL)"
+        )
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "run_after" not in columns:
+            # Earliest time a retried job may run again
+            self._db.execute("ALTER TABLE jobs ADD COLUMN run_after REAL")
+        if "lease_expires" not in columns:
+            # Running jobs belong to their worker until this time (renewed by heartbeat)
+            self._db.execute("ALTER TABLE jobs ADD COLUMN lease_expires REAL")
+        self._db.execute("CREATE INDEX IF NOT EXISTS jobs_type_status ON jobs (type, status, created_at)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._types: Dict[str, JobType] = {}
+        self._wakeups: Dict[str, asyncio.Event] = {}
+        self._workers: List[asyncio.Task] = []
+        self._reaper: Optional[asyncio.Task] = None
+        self._running = False
+        logger.info(f"✓ Job queue at {db_path}")
+
+
+    def register(self, name: str, handler: JobHandler, concurrency: int = 1,
+                 cleanup: Optional[JobCleanup] = None):
+        """
+        Register a job type.
+
+        Args:
+            name: Job type name
+            handler: Async callable (payload, report_progress) -> result dict
+            concurrency: Number of workers for this type
+            cleanup: Optional callable (payload) run once the job will not run again
+                     (e.g. delete a spooled upload); retried jobs keep their input
+        """
+        concurrency = int(os.getenv(f"JOB_WORKERS_{name.upper()}", str(concurrency)))
+        self._types[name] = JobType(name=name, handler=handler, concurrency=max(1, concurrency), cleanup=cleanup)
+
+
+    async def enqueue(self, job_type: str, payload: Dict[str, Any]) -> str:
+        """
+        Add a job to the queue.
+
+        Args:
+            job_type: Registered job type
+            payload: JSON-serializable job input
+
+        Returns:
+            Job ID
+        """
+        if job_type not in self._types:
+            raise ValueError(f"Unknown job type: {job_type}")
+
+        job_id = await run_in_pool(STORAGE_POOL, self._insert, job_type, payload)
+
+        wakeup = self._wakeups.get(job_type)
+        if wakeup is not None:
+            wakeup.set()
+        logger.info(f"✓ Queued {job_type} job {job_id}")
+        return job_id
+
+
+    def _insert(self, job_type: str, payload: Dict[str, Any]) -> str:
+        """Insert a queued job and return its ID."""
+        job_id = str(uuid.uuid4())
+        with self._lock:
+            self._db.execute(
+                "INSERT INTO jobs (id, type, status, payload, created_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, job_type, QUEUED, json.dumps(payload), time.time())
+            )
+            self._db.commit()
+        return job_id
+
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get job status, progress and result.
+
+        Returns:
+            Job dictionary or None if not found
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT id, type, status, progress, result, error, attempts, created_at, started_at, finished_at, "
+                "run_after FROM jobs WHERE id = ?",
+                (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[2] == QUEUED:
+                position = self._db.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE type = ? AND status = ? AND created_at < ?",
+                    (row[1], QUEUED, row[7])
+                ).fetchone()[0]
+
+        return {
+            "id": row[0],
+            "type": row[1],
+            "status": row[2],
+            "queue_position": position,
+            "progress": json.loads(row[3]) if row[3] else None,
+            "result": json.loads(row[4]) if row[4] else None,
+            "error": row[5],
+            "attempts": row[6],
+            "created_at": row[7],
+            "started_at": row[8],
+            "finished_at": row[9],
+            "retry_at": row[10] if row[2] == QUEUED and row[6] else None
+        }
+
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Get per-type job counts by status and worker concurrency.
+        """
+        with self._lock:
+            rows = self._db.execute("SELECT type, status, COUNT(*) FROM jobs GROUP BY type, status").fetchall()
+        stats = {
+            name: {"workers": job_type.concurrency, QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0}
+            for name, job_type in self._types.items()
+        }
+        for job_type, status, count in rows:
+            stats.setdefault(job_type, {"workers": 0, QUEUED: 0, RUNNING: 0, COMPLETED: 0, FAILED: 0})[status] = count
+        return stats
+
+
+    def _claim(self, job_type: str) -> Optional[Dict[str, Any]]:
+        """
+        Atomically move the oldest runnable queued job of a type to running.
+        The update only applies while the job is still queued, so a worker in
+        another process sharing the database cannot claim the same job.
+        """
+        with self._lock:
+            while True:
+                now = time.time()
+                row = self._db.execute(
+                    "SELECT id, payload, attempts FROM jobs WHERE type = ? AND status = ? "
+                    "AND (run_after IS NULL OR run_after <= ?) ORDER BY created_at LIMIT 1",
+                    (job_type, QUEUED, now)
+                ).fetchone()
+                if row is None:
+                    return None
+                claimed = self._db.execute(
+                    "UPDATE jobs SET status = ?, started_at = ?, lease_expires = ?, attempts = attempts + 1 "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, now, now + JOB_LEASE_SECONDS, row[0], QUEUED)
+                ).rowcount
+                self._db.commit()
+                if claimed:
+                    return {"id": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1}
+                # Lost the race to another process; try the next job
+
+
+    def _renew(self, job_id: str) -> bool:
+        """Extend the lease of a running job; False if it is no longer ours to run."""
+        with self._lock:
+            renewed = self._db.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ?",
+                (time.time() + JOB_LEASE_SECONDS, job_id, RUNNING)
+            ).rowcount
+            self._db.commit()
+        return bool(renewed)
+
+
+    def _update(self, job_id: str, **fields):
+        """Update job columns (progress/result are JSON-encoded)."""
+        for key in ("progress", "result"):
+            if key in fields and fields[key] is not None:
+                fields[key] = json.dumps(fields[key])
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._lock:
+            self._db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+            self._db.commit()
+
+
+    def _recover(self) -> List[Dict[str, Any]]:
+        """
+        Requeue running jobs whose lease expired (their process stopped or
+        died) and purge expired finished jobs. Jobs another live process is
+        running keep renewing their lease and are left alone.
+
+        Returns:
+            Jobs failed for being interrupted too often ({"type", "payload"}), for cleanup
+        """
+        now = time.time()
+        expired = "status = ? AND (lease_expires IS NULL OR lease_expires < ?)"
+        with self._lock:
+            exhausted = self._db.execute(
+                f"SELECT type, payload FROM jobs WHERE {expired} AND attempts >= ?",
+                (RUNNING, now, JOB_MAX_ATTEMPTS)
+            ).fetchall()
+            failed = self._db.execute(
+                f"UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE {expired} AND attempts >= ?",
+                (FAILED, "Interrupted too many times", now, RUNNING, now, JOB_MAX_ATTEMPTS)
+            ).rowcount
+            requeued = self._db.execute(
+                f"UPDATE jobs SET status = ?, lease_expires = NULL WHERE {expired}", (QUEUED, RUNNING, now)
+            ).rowcount
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?",
+                (COMPLETED, FAILED, now - JOB_RETENTION_SECONDS)
+            )
+            self._db.commit()
+        if requeued or failed:
+            logger.info(f"✓ Recovered interrupted jobs: {requeued} requeued, {failed} failed")
+        return [{"type": job_type, "payload": json.loads(payload)} for job_type, payload in exhausted]
+
+
+    async def _recover_expired(self):
+        """Requeue expired leases and run cleanup for jobs failed by recovery."""
+        exhausted = await run_in_pool(STORAGE_POOL, self._recover)
+        for job in exhausted:
+            if job["type"] in self._types:
+                await self._cleanup(self._types[job["type"]], job["payload"])
+
+
+    async def _reap(self):
+        """Periodically recover jobs whose worker process went away."""
+        while self._running:
+            await asyncio.sleep(JOB_LEASE_SECONDS)
+            try:
+                await self._recover_expired()
+            except Exception as e:
+                logger.warning(f"Job lease recovery failed: {e}")
+
+
+    async def _heartbeat(self, job_id: str):
+        """Renew a running job's lease until cancelled."""
+        while True:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                if not await run_in_pool(STORAGE_POOL, self._renew, job_id):
+                    logger.warning(f"Job {job_id} lost its lease")
+                    return
+            except Exception as e:
+                logger.warning(f"Lease renewal of job {job_id} failed: {e}")
+
+
+    @staticmethod
+    def retry_delay(attempts: int) -> float:
+        """Backoff before the next run of a job that has failed `attempts` times."""
+        return min(JOB_RETRY_MAX_SECONDS, JOB_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+
+
+    async def _cleanup(self, job_type: JobType, payload: Dict[str, Any]):
+        """Run a job type's cleanup hook on the storage pool, logging failures."""
+        if job_type.cleanup is None:
+            return
+        try:
+            await run_in_pool(STORAGE_POOL, job_type.cleanup, payload)
+        except Exception as e:
+            logger.warning(f"Cleanup of {job_type.name} job failed: {e}")
+
+
+    async def _fail(self, job_type: JobType, job: Dict[str, Any], error: Exception):
+        """Requeue a failed job with backoff, or mark it failed once out of attempts."""
+        job_id, attempts = job["id"], job["attempts"]
+        if attempts < JOB_MAX_ATTEMPTS and not isinstance(error, NON_RETRYABLE_ERRORS):
+            delay = self.retry_delay(attempts)
+            logger.warning(
+                f"{job_type.name} job {job_id} failed (attempt {attempts}/{JOB_MAX_ATTEMPTS}), "
+                f"retrying in {delay:.0f}s: {error}"
+            )
+            await run_in_pool(
+                STORAGE_POOL, self._update, job_id,
+                status=QUEUED, error=str(error), run_after=time.time() + delay
+            )
+            return
+
+        logger.error(f"{job_type.name} job {job_id} failed: {error}")
+        await run_in_pool(STORAGE_POOL, self._update, job_id, status=FAILED, error=str(error), finished_at=time.time())
+        await self._cleanup(job_type, job["payload"])
+
+
+    async def _worker(self, job_type: JobType):
+        """Run jobs of one type until stopped."""
+        wakeup = self._wakeups[job_type.name]
+        while self._running:
+            job = await run_in_pool(STORAGE_POOL, self._claim, job_type.name)
+            if job is None:
+                try:
+                    await asyncio.wait_for(wakeup.wait(), timeout=JOB_POLL_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+                wakeup.clear()
+                continue
+
+            job_id = job["id"]
+
+            async def report_progress(progress: Dict[str, Any], job_id: str = job_id):
+                await run_in_pool(STORAGE_POOL, self._update, job_id, progress=progress)
+
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                result = await job_type.handler(job["payload"], report_progress)
+            except asyncio.CancelledError:
+                # Shutdown: leave the job as running; it is requeued once its lease expires
+                raise
+            except Exception as e:
+                await self._fail(job_type, job, e)
+                continue
+            finally:
+                heartbeat.cancel()
+
+            await run_in_pool(
+                STORAGE_POOL, self._update, job_id,
+                status=COMPLETED, result=result, error=None, finished_at=time.time()
+            )
+            logger.info(f"✓ {job_type.name} job {job_id} completed")
+            await self._cleanup(job_type, job["payload"])
+
+
+    async def start(self):
+        """Recover interrupted jobs and start workers for every registered type."""
+        if self._running:
+            return
+        await self._recover_expired()
+        self._running = True
+        self._reaper = asyncio.create_task(self._reap())
+        for job_type in self._types.values():
+            self._wakeups[job_type.name] = asyncio.Event()
+            for _ in range(job_type.concurrency):
+                self._workers.append(asyncio.create_task(self._worker(job_type)))
+        logger.info(
+            "✓ Job workers started: "
+            + ", ".join(f"{t.name}={t.concurrency}" for t in self._types.values())
+        )
+
+
+    async def stop(self):
+        """Stop workers. Jobs still running are resumed once their lease expires."""
+        self._running = False
+        tasks = self._workers + ([self._reaper] if self._reaper is not None else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._reaper = None
+        self._wakeups = {}
+
+
+# Global instance
+job_queue = None
+
+def get_job_queue() -> JobQueue:
+    """
+    Get or create singleton JobQueue instance.
+    """
+    global job_queue
+    if job_queue is None:
+        job_queue = JobQueue()
+    return job_queue
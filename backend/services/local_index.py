@@ -0,0 +1,569 @@
+"""
+Local Index - Embedded vector index (Qdrant fallback)
+In-process stand-in for the Qdrant calls MemoryService makes: float32
+vectors in a memory-mapped matrix, payloads in SQLite, exact search for
+small candidate sets and an IVF index for large ones
+"""
+
+import json
+import logging
+import math
+import os
+import shutil
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import numpy as np
+from qdrant_client.models import (
+    CollectionDescription, CollectionsResponse, CountResult, Distance,
+    FieldCondition, Filter, HasIdCondition, IsEmptyCondition, MatchAny, MatchValue,
+    PointIdsList, PointStruct, Record, ScoredPoint, SearchParams, SearchRequest,
+    UpdateResult, UpdateStatus, VectorParams
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Index configuration (override with environment variables)
+CACHE_DIR = os.getenv("STUDYPAL_CACHE_DIR", "/tmp/studypal_cache")
+LOCAL_INDEX_DIR = os.getenv("LOCAL_INDEX_DIR", os.path.join(CACHE_DIR, "local_index"))
+EXACT_SEARCH_LIMIT = int(os.getenv("LOCAL_INDEX_EXACT_LIMIT", "20000"))  # candidates scanned exhaustively
+IVF_NPROBE = int(os.getenv("LOCAL_INDEX_NPROBE", "16"))                   # clusters scanned per approximate search
+
+# IVF training
+IVF_SAMPLE_PER_LIST = 64     # training vectors per cluster
+IVF_ITERATIONS = 10          # k-means iterations
+IVF_RETRAIN_GROWTH = 2.0     # retrain once the collection has grown by this factor
+ASSIGN_BATCH = 65536         # rows assigned to clusters per matrix product
+
+INITIAL_CAPACITY = 1024      # rows; the vector file doubles when full
+DB_FILE = "points.sqlite3"
+VECTOR_FILE = "vectors.f32"
+
+
+def payload_values(payload: Dict[str, Any], key: str) -> List[Any]:
+    """Values at a dotted payload key ("metadata.course"); lists are flattened."""
+    value: Any = payload
+    for part in key.split("."):
+        if not isinstance(value, dict):
+            return []
+        value = value.get(part)
+        if value is None:
+            return []
+    return value if isinstance(value, list) else [value]
+
+
+def condition_matches(point_id: str, payload: Dict[str, Any], condition: Any) -> bool:
+    """Evaluate one Qdrant filter condition against a stored point."""
+    if isinstance(condition, Filter):
+        return filter_matches(point_id, payload, condition)
+    if isinstance(condition, FieldCondition):
+        values = payload_values(payload, condition.key)
+        if isinstance(condition.match, MatchValue):
+            return condition.match.value in values
+        if isinstance(condition.match, MatchAny):
+            return any(value in condition.match.any for value in values)
+    if isinstance(condition, IsEmptyCondition):
+        return not payload_values(payload, condition.is_empty.key)
+    if isinstance(condition, HasIdCondition):
+        return point_id in {str(has_id) for has_id in condition.has_id}
+    raise ValueError(f"Filter condition not supported by the local index: {condition!r}")
+
+
+def filter_matches(point_id: str, payload: Dict[str, Any], query_filter: Filter) -> bool:
+    """Evaluate a Qdrant Filter (must / should / must_not) against a stored point."""
+    return (
+        all(condition_matches(point_id, payload, c) for c in query_filter.must or [])
+        and (not query_filter.should or any(condition_matches(point_id, payload, c) for c in query_filter.should))
+        and not any(condition_matches(point_id, payload, c) for c in query_filter.must_not or [])
+    )
+
+
+class LocalCollection:
+    """
+    One collection: vectors in a growable memory-mapped float32 matrix
+    (row i = point i), payloads in SQLite and mirrored in memory.
+
+    Search scans the candidate rows (all points, or the posting lists of
+    indexed payload fields a filter names) with one matrix-vector product.
+    Candidate sets larger than EXACT_SEARCH_LIMIT are narrowed to the
+    IVF_NPROBE nearest clusters of a k-means (IVF) index trained in the
+    background.
+    """
+
+    def __init__(self, path: str, vector_size: Optional[int] = None, distance: Optional[Distance] = None):
+        """
+        Open an existing collection, or create one when vector_size is given.
+
+        Args:
+            path: Collection directory
+            vector_size: Vector dimension (new collections)
+            distance: Cosine or Dot (new collections)
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(os.path.join(path, DB_FILE), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS config (key TEXT PRIMARY KEY, value TEXT NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS points ("
+            "row INTEGER PRIMARY KEY, point_id TEXT UNIQUE NOT NULL, payload TEXT NOT NULL);"
+        )
+        if vector_size is not None:
+            if distance not in (Distance.COSINE, Distance.DOT):
+                raise ValueError(f"Local index supports Cosine and Dot distance, not {distance}")
+            self._db.executemany("INSERT OR REPLACE INTO config VALUES (?, ?)",
+                                 [("size", str(vector_size)), ("distance", distance.value)])
+            self._db.commit()
+        config = dict(self._db.execute("SELECT key, value FROM config"))
+        self.size = int(config["size"])
+        self.normalize = config["distance"] == Distance.COSINE.value
+        self._lock = threading.RLock()
+
+        # Row bookkeeping
+        self._rows: Dict[str, int] = {}
+        self._point_ids: List[Optional[str]] = []
+        self._payloads: List[Optional[Dict[str, Any]]] = []
+        self._free: List[int] = []
+        for row, point_id, payload in self._db.execute("SELECT row, point_id, payload FROM points ORDER BY row"):
+            while len(self._point_ids) < row:
+                self._free.append(len(self._point_ids))
+                self._point_ids.append(None)
+                self._payloads.append(None)
+            self._rows[point_id] = row
+            self._point_ids.append(point_id)
+            self._payloads.append(json.loads(payload))
+
+        # Vector matrix
+        self._vector_path = os.path.join(path, VECTOR_FILE)
+        capacity = INITIAL_CAPACITY
+        if os.path.exists(self._vector_path):
+            capacity = max(capacity, os.path.getsize(self._vector_path) // (self.size * 4))
+        self._vectors = self._map(capacity)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._alive[list(self._rows.values())] = True
+
+        # Keyword posting lists: field -> value -> rows
+        self._postings: Dict[str, Dict[Any, Set[int]]] = {}
+
+        # IVF index
+        self._centroids: Optional[np.ndarray] = None
+        self._assignment = np.full(capacity, -1, dtype=np.int32)
+        self._trained_points = 0
+        self._training = False
+        self.searches = 0
+        self.approximate_searches = 0
+
+
+    def _map(self, capacity: int) -> np.memmap:
+        """Memory-map the vector file with room for capacity rows."""
+        mode = "r+" if os.path.exists(self._vector_path) else "w+"
+        if mode == "r+" and os.path.getsize(self._vector_path) < capacity * self.size * 4:
+            with open(self._vector_path, "r+b") as f:
+                f.truncate(capacity * self.size * 4)
+        return np.memmap(self._vector_path, dtype=np.float32, mode=mode, shape=(capacity, self.size))
+
+
+    def _grow(self, rows: int):
+        """Double the vector file (and row arrays) until rows fit."""
+        capacity = len(self._vectors)
+        if rows <= capacity:
+            return
+        while capacity < rows:
+            capacity *= 2
+        self._vectors.flush()
+        self._vectors = self._map(capacity)
+        self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+        self._assignment = np.concatenate([self._assignment, np.full(capacity - len(self._assignment), -1, dtype=np.int32)])
+
+
+    def _prepare(self, vectors: Iterable[Iterable[float]]) -> np.ndarray:
+        """float32 matrix, L2-normalized for cosine distance."""
+        matrix = np.asarray(list(vectors), dtype=np.float32).reshape(-1, self.size)
+        if self.normalize:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms > 0, norms, 1)
+        return matrix
+
+
+    def _index_payload(self, row: int, payload: Dict[str, Any], add: bool):
+        """Add or remove a row from the posting lists of its indexed fields."""
+        for field, postings in self._postings.items():
+            for value in payload_values(payload, field):
+                if not isinstance(value, (str, int, bool)):
+                    continue
+                if add:
+                    postings.setdefault(value, set()).add(row)
+                else:
+                    postings.get(value, set()).discard(row)
+
+
+    def index_field(self, field: str):
+        """Keep posting lists for a payload field so filters on it skip the row scan."""
+        with self._lock:
+            if field in self._postings:
+                return
+            self._postings[field] = {}
+            for row, payload in enumerate(self._payloads):
+                if payload is not None:
+                    for value in payload_values(payload, field):
+                        if isinstance(value, (str, int, bool)):
+                            self._postings[field].setdefault(value, set()).add(row)
+
+
+    def upsert(self, points: List[PointStruct]):
+        """Insert or replace points (by ID)."""
+        if not points:
+            return
+        vectors = self._prepare(point.vector for point in points)
+        with self._lock:
+            rows = []
+            for point in points:
+                point_id = str(point.id)
+                row = self._rows.get(point_id)
+                if row is None:
+                    row = self._free.pop() if self._free else len(self._point_ids)
+                    if row == len(self._point_ids):
+                        self._point_ids.append(None)
+                        self._payloads.append(None)
+                    self._rows[point_id] = row
+                elif self._payloads[row] is not None:
+                    self._index_payload(row, self._payloads[row], add=False)
+                payload = point.payload or {}
+                self._point_ids[row] = point_id
+                self._payloads[row] = payload
+                self._index_payload(row, payload, add=True)
+                rows.append(row)
+
+            self._grow(len(self._point_ids))
+            self._vectors[rows] = vectors
+            self._vectors.flush()
+            self._alive[rows] = True
+            if self._centroids is not None:
+                self._assignment[rows] = np.argmax(vectors @ self._centroids.T, axis=1)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO points (row, point_id, payload) VALUES (?, ?, ?)",
+                [(row, self._point_ids[row], json.dumps(self._payloads[row])) for row in rows]
+            )
+            self._db.commit()
+        self._maybe_train()
+
+
+    def delete(self, point_ids: Iterable[Any]):
+        """Remove points by ID (unknown IDs are ignored)."""
+        with self._lock:
+            removed = []
+            for point_id in map(str, point_ids):
+                row = self._rows.pop(point_id, None)
+                if row is None:
+                    continue
+                self._index_payload(row, self._payloads[row], add=False)
+                self._point_ids[row] = None
+                self._payloads[row] = None
+                self._alive[row] = False
+                self._free.append(row)
+                removed.append((point_id,))
+            self._db.executemany("DELETE FROM points WHERE point_id = ?", removed)
+            self._db.commit()
+
+
+    def _candidates(self, query_filter: Optional[Filter]) -> np.ndarray:
+        """
+        Rows matching a filter, ascending. Keyword conditions on indexed
+        fields are answered from posting lists; anything else is checked
+        point by point on the remaining rows.
+        """
+        if query_filter is None:
+            return np.flatnonzero(self._alive[:len(self._point_ids)])
+
+        rows: Optional[Set[int]] = None
+        residual = []
+        for condition in query_filter.must or []:
+            postings = self._postings.get(getattr(condition, "key", None))
+            match = getattr(condition, "match", None)
+            if postings is None or not isinstance(match, (MatchValue, MatchAny)):
+                residual.append(condition)
+                continue
+            values = [match.value] if isinstance(match, MatchValue) else match.any
+            matched = set().union(*(postings.get(value, ()) for value in values))
+            rows = matched if rows is None else rows & matched
+
+        candidates = (np.fromiter(sorted(rows), dtype=np.int64, count=len(rows)) if rows is not None
+                      else np.flatnonzero(self._alive[:len(self._point_ids)]))
+        if residual or query_filter.should or query_filter.must_not:
+            rest = Filter(must=residual or None, should=query_filter.should, must_not=query_filter.must_not)
+            candidates = candidates[[
+                filter_matches(self._point_ids[row], self._payloads[row], rest) for row in candidates
+            ]].astype(np.int64)
+        return candidates
+
+
+    def search(self, vector: List[float], query_filter: Optional[Filter] = None, limit: int = 10,
+               score_threshold: Optional[float] = None, exact: bool = False) -> List[Tuple[int, float]]:
+        """
+        Nearest rows by dot product (cosine for normalized vectors).
+
+        Returns:
+            [(row, score)] best first
+        """
+        query = self._prepare([vector])[0]
+        with self._lock:
+            rows = self._candidates(query_filter)
+            self.searches += 1
+            if not exact and len(rows) > EXACT_SEARCH_LIMIT and self._centroids is not None:
+                nprobe = min(IVF_NPROBE, len(self._centroids))
+                probe = np.argpartition(-(self._centroids @ query), nprobe - 1)[:nprobe]
+                rows = rows[np.isin(self._assignment[rows], probe)]
+                self.approximate_searches += 1
+            if len(rows) == 0:
+                return []
+            scores = self._vectors[rows] @ query
+
+        if score_threshold is not None:
+            keep = scores >= score_threshold
+            rows, scores = rows[keep], scores[keep]
+        k = min(limit, len(rows))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(rows[i]), float(scores[i])) for i in top]
+
+
+    def _maybe_train(self):
+        """Start background IVF training once the collection outgrows exact search."""
+        points = len(self._rows)
+        if (self._training or points <= EXACT_SEARCH_LIMIT
+                or (self._centroids is not None and points < self._trained_points * IVF_RETRAIN_GROWTH)):
+            return
+        self._training = True
+        threading.Thread(target=self._train, name="studypal-local-ivf", daemon=True).start()
+
+
+    def _train(self):
+        """Spherical k-means over a sample, then assign every row to its nearest cluster."""
+        try:
+            with self._lock:
+                rows = np.flatnonzero(self._alive[:len(self._point_ids)])
+            lists = max(1, int(math.sqrt(len(rows))))
+            rng = np.random.default_rng(0)
+            sample = np.sort(rng.choice(rows, size=min(len(rows), lists * IVF_SAMPLE_PER_LIST), replace=False))
+            data = np.array(self._vectors[sample])
+            centroids = data[rng.choice(len(data), size=lists, replace=False)]
+            for _ in range(IVF_ITERATIONS):
+                assignment = np.argmax(data @ centroids.T, axis=1)
+                sums = np.zeros_like(centroids)
+                np.add.at(sums, assignment, data)
+                counts = np.bincount(assignment, minlength=lists)
+                centroids = np.where(counts[:, None] > 0, sums, centroids)
+                centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-12)
+
+            assignment = np.full(len(self._assignment), -1, dtype=np.int32)
+            for start in range(0, len(rows), ASSIGN_BATCH):
+                batch = rows[start:start + ASSIGN_BATCH]
+                assignment[batch] = np.argmax(np.asarray(self._vectors[batch]) @ centroids.T, axis=1)
+
+            with self._lock:
+                # Rows written while training get assigned now
+                if len(assignment) < len(self._assignment):
+                    assignment = np.concatenate([assignment, np.full(len(self._assignment) - len(assignment), -1, dtype=np.int32)])
+                written = np.flatnonzero(self._alive[:len(self._point_ids)])
+                written = written[~np.isin(written, rows)]
+                if len(written):
+                    assignment[written] = np.argmax(np.asarray(self._vectors[written]) @ centroids.T, axis=1)
+                self._centroids = centroids
+                self._assignment = assignment
+                self._trained_points = len(rows)
+            logger.info(f"✓ Local IVF index trained: {lists} clusters over {len(rows)} vectors")
+        except Exception as e:
+            logger.warning(f"⚠ Local IVF training failed, searches stay exact: {e}")
+        finally:
+            self._training = False
+
+
+    def record(self, row: int, with_payload: bool, with_vectors: bool) -> Dict[str, Any]:
+        """Point fields for a row."""
+        return {
+            "id": self._point_ids[row],
+            "payload": self._payloads[row] if with_payload else None,
+            "vector": self._vectors[row].tolist() if with_vectors else None
+        }
+
+
+    def records(self, rows: List[int], with_payload: bool,
+                with_vectors: bool) -> List[Tuple[int, Dict[str, Any]]]:
+        """
+        Point fields for rows, read under the lock.
+
+        Rows deleted since they were looked up (e.g. by a concurrent dedup
+        delete) are skipped rather than returned without a point ID.
+        """
+        with self._lock:
+            return [
+                (row, self.record(row, with_payload, with_vectors))
+                for row in rows if self._point_ids[row] is not None
+            ]
+
+
+    def row_of(self, point_id: Any) -> Optional[int]:
+        """Row of a stored point ID."""
+        return self._rows.get(str(point_id))
+
+
+    def count(self, query_filter: Optional[Filter] = None) -> int:
+        """Number of (matching) points."""
+        with self._lock:
+            return len(self._rows) if query_filter is None else len(self._candidates(query_filter))
+
+
+    def scroll(self, query_filter: Optional[Filter], limit: int, offset: Optional[int]) -> Tuple[List[int], Optional[int]]:
+        """Page of matching rows from row offset; returns (rows, next offset or None)."""
+        with self._lock:
+            rows = self._candidates(query_filter)
+        if offset is not None:
+            rows = rows[np.searchsorted(rows, offset):]
+        page = rows[:limit + 1]
+        return [int(row) for row in page[:limit]], (int(page[limit]) if len(page) > limit else None)
+
+
+    def stats(self) -> Dict[str, Any]:
+        """Point count, storage size and search counters."""
+        with self._lock:
+            return {
+                "points": len(self._rows),
+                "capacity": len(self._vectors),
+                "vector_bytes": os.path.getsize(self._vector_path),
+                "indexed_fields": sorted(self._postings),
+                "ivf_clusters": 0 if self._centroids is None else len(self._centroids),
+                "searches": self.searches,
+                "approximate_searches": self.approximate_searches
+            }
+
+
+    def close(self):
+        """Flush vectors and close the database."""
+        with self._lock:
+            self._vectors.flush()
+            self._db.close()
+
+
+class LocalVectorIndex:
+    """
+    Embedded stand-in for QdrantClient, covering the calls MemoryService
+    makes (collections, payload indexes, upsert/delete/retrieve/scroll,
+    filtered search, batch search and count) with the same argument names
+    and result types. Collection settings Qdrant-specific to storage
+    (HNSW, quantization, on-disk) are accepted and ignored.
+    """
+
+    def __init__(self, path: str = LOCAL_INDEX_DIR):
+        """
+        Args:
+            path: Directory holding one subdirectory per collection
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self._collections: Dict[str, LocalCollection] = {}
+        self._lock = threading.Lock()
+        logger.info(f"✓ Local vector index at {path}")
+
+
+    def _collection(self, collection_name: str) -> LocalCollection:
+        with self._lock:
+            collection = self._collections.get(collection_name)
+            if collection is None:
+                path = os.path.join(self.path, collection_name)
+                if not os.path.exists(os.path.join(path, DB_FILE)):
+                    raise ValueError(f"Collection '{collection_name}' not found")
+                collection = self._collections[collection_name] = LocalCollection(path)
+            return collection
+
+
+    def get_collections(self) -> CollectionsResponse:
+        names = sorted(name for name in os.listdir(self.path) if os.path.exists(os.path.join(self.path, name, DB_FILE)))
+        return CollectionsResponse(collections=[CollectionDescription(name=name) for name in names])
+
+
+    def create_collection(self, collection_name: str, vectors_config: VectorParams, **kwargs) -> bool:
+        with self._lock:
+            self._collections[collection_name] = LocalCollection(
+                os.path.join(self.path, collection_name), vectors_config.size, vectors_config.distance
+            )
+        return True
+
+
+    def delete_collection(self, collection_name: str, **kwargs) -> bool:
+        with self._lock:
+            collection = self._collections.pop(collection_name, None)
+            if collection is not None:
+                collection.close()
+            shutil.rmtree(os.path.join(self.path, collection_name), ignore_errors=True)
+        return True
+
+
+    def create_payload_index(self, collection_name: str, field_name: str, field_schema: Any = None, **kwargs) -> UpdateResult:
+        self._collection(collection_name).index_field(field_name)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+
+    def upsert(self, collection_name: str, points: List[PointStruct], **kwargs) -> UpdateResult:
+        self._collection(collection_name).upsert(points)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+
+    def delete(self, collection_name: str, points_selector: PointIdsList, **kwargs) -> UpdateResult:
+        if not isinstance(points_selector, PointIdsList):
+            raise ValueError("Local index deletes by PointIdsList only")
+        self._collection(collection_name).delete(points_selector.points)
+        return UpdateResult(operation_id=0, status=UpdateStatus.COMPLETED)
+
+
+    def retrieve(self, collection_name: str, ids: List[Any], with_payload: bool = True,
+                 with_vectors: bool = False, **kwargs) -> List[Record]:
+        collection = self._collection(collection_name)
+        rows = [row for row in map(collection.row_of, ids) if row is not None]
+        return [Record(**fields) for _, fields in collection.records(rows, with_payload, with_vectors)]
+
+
+    def scroll(self, collection_name: str, scroll_filter: Optional[Filter] = None, limit: int = 10,
+               offset: Optional[int] = None, with_payload: bool = True, with_vectors: bool = False,
+               **kwargs) -> Tuple[List[Record], Optional[int]]:
+        collection = self._collection(collection_name)
+        rows, next_offset = collection.scroll(scroll_filter, limit, offset)
+        return [Record(**fields) for _, fields in collection.records(rows, with_payload, with_vectors)], next_offset
+
+
+    def search(self, collection_name: str, query_vector: List[float], query_filter: Optional[Filter] = None,
+               search_params: Optional[SearchParams] = None, limit: int = 10, score_threshold: Optional[float] = None,
+               with_payload: bool = True, with_vectors: bool = False, **kwargs) -> List[ScoredPoint]:
+        collection = self._collection(collection_name)
+        hits = collection.search(query_vector, query_filter, limit, score_threshold,
+                                 exact=bool(search_params and search_params.exact))
+        scores = dict(hits)
+        return [
+            ScoredPoint(version=0, score=scores[row], **fields)
+            for row, fields in collection.records([row for row, _ in hits], with_payload, with_vectors)
+        ]
+
+
+    def search_batch(self, collection_name: str, requests: List[SearchRequest], **kwargs) -> List[List[ScoredPoint]]:
+        return [
+            self.search(
+                collection_name, request.vector, query_filter=request.filter, search_params=request.params,
+                limit=request.limit, score_threshold=request.score_threshold,
+                with_payload=bool(request.with_payload), with_vectors=bool(request.with_vector)
+            )
+            for request in requests
+        ]
+
+
+    def count(self, collection_name: str, count_filter: Optional[Filter] = None, exact: bool = True, **kwargs) -> CountResult:
+        return CountResult(count=self._collection(collection_name).count(count_filter))
+
+
+    def stats(self, collection_name: str) -> Dict[str, Any]:
+        """Local collection statistics."""
+        return self._collection(collection_name).stats()
@@ -4,118 +4,544 @@ Handles long-term AI memory storage and semantic search
 """
 
 import logging
-from typing import List, Dict, Any, Optional
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, PointIdsList, SearchRequest,
+    Filter, FieldCondition, MatchValue, MatchAny, PayloadSchemaType,
+    HnswConfigDiff, IsEmptyCondition, PayloadField, SearchParams,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType,
+    BinaryQuantization, BinaryQuantizationConfig, QuantizationSearchParams,
+    VectorParamsDiff, CollectionParamsDiff, Disabled
+)
 import uuid
 
+from services.embedding_store import get_embedding_store, content_hash
+from services.sparse_index import get_sparse_index
+from services.local_index import LocalVectorIndex
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 # Constants
 COLLECTION_NAME = "studypal"
+EMBEDDING_MODEL = "all-MiniLM-L6-v2"
 VECTOR_SIZE = 384  # all-MiniLM-L6-v2 embedding size
 DISTANCE_METRIC = Distance.COSINE
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", "4096"))
+
+# Vector backend: Qdrant, or the embedded local index (services/local_index.py).
+# "qdrant" fails when Qdrant is unreachable (the next request retries).
+# "auto" (opt-in) falls back to the local index for the process lifetime;
+# points written locally stay local and are not visible once on Qdrant again.
+QDRANT_BACKEND = "qdrant"
+LOCAL_BACKEND = "local"
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", QDRANT_BACKEND)
+
+# Deterministic point IDs: uuid5(namespace, scope|content hash)
+POINT_ID_NAMESPACE = uuid.uuid5(uuid.NAMESPACE_URL, "studypal/points")
+SCOPE_FIELDS = ("user_id", "course", "topic")
+RETRIEVE_BATCH_SIZE = 256
+
+# Filterable metadata fields (keyword payload indexes on metadata.<field>)
+FILTER_FIELDS = ("course", "topic", "source")
+
+# Multi-tenancy: every point carries metadata.user_id and every search is
+# restricted to one tenant. Partitioned collections build HNSW links per
+# tenant only (payload_m) instead of one global graph (m=0), so a tenant's
+# search cost follows its own data.
+TENANT_FIELD = "user_id"
+DEFAULT_TENANT = os.getenv("STUDYPAL_DEFAULT_TENANT", "default")
+TENANT_PARTITIONED = os.getenv("QDRANT_TENANT_PARTITIONED", "1") == "1"
+TENANT_PAYLOAD_M = int(os.getenv("QDRANT_TENANT_PAYLOAD_M", "16"))
+TENANT_PATTERN = re.compile(r"^[A-Za-z0-9_.@:-]{1,128}$")
+
+# Vector storage (applied to new collections; migrated onto existing ones only
+# with QDRANT_APPLY_STORAGE_CONFIG=1, so re-quantizing is always opt-in).
+# Quantized vectors stay in RAM for the HNSW walk; with rescoring the top
+# oversampling * limit candidates are re-scored with the original float32
+# vectors, which can then live on disk.
+QUANTIZATION_MODES = ("none", "scalar", "binary")
+QUANTIZATION = os.getenv("QDRANT_QUANTIZATION", "none")
+QUANTIZATION_QUANTILE = float(os.getenv("QDRANT_QUANTIZATION_QUANTILE", "0.99"))
+QUANTIZATION_RESCORE = os.getenv("QDRANT_QUANTIZATION_RESCORE", "1") == "1"
+QUANTIZATION_OVERSAMPLING = float(os.getenv("QDRANT_QUANTIZATION_OVERSAMPLING", "2.0"))
+VECTORS_ON_DISK = os.getenv("QDRANT_VECTORS_ON_DISK", "0") == "1"
+PAYLOAD_ON_DISK = os.getenv("QDRANT_PAYLOAD_ON_DISK", "0") == "1"
+HNSW_M = int(os.getenv("QDRANT_HNSW_M", "16"))          # global graph degree (unpartitioned collections)
+HNSW_EF_CONSTRUCT = int(os.getenv("QDRANT_HNSW_EF_CONSTRUCT", "100"))
+HNSW_EF = int(os.getenv("QDRANT_HNSW_EF", "0")) or None  # search beam width (0: Qdrant default)
+APPLY_STORAGE_CONFIG = os.getenv("QDRANT_APPLY_STORAGE_CONFIG", "0") == "1"
+
+# Batch ingestion tuning
+ENCODE_BATCH_SIZE = int(os.getenv("INGEST_ENCODE_BATCH_SIZE", "64"))
+UPSERT_BATCH_SIZE = int(os.getenv("INGEST_UPSERT_BATCH_SIZE", "256"))
+PARALLEL_UPSERTS = int(os.getenv("INGEST_PARALLEL_UPSERTS", "2"))
+
+# Hybrid retrieval: dense and BM25 candidates fused by reciprocal rank
+HYBRID_FETCH_FACTOR = 4     # candidates per list = top_k * factor
+RRF_K = 60                  # rank damping constant from the RRF paper
+
+# Near-duplicate collapse
+DEDUP_SIMILARITY_THRESHOLD = 0.98
+DEDUP_MIN_SIMILARITY = 0.9  # lower thresholds would collapse distinct material
+DEDUP_PAGE_SIZE = 128
+DEDUP_NEIGHBORS = 10
+
+
+def scope_key(metadata: Optional[Dict[str, Any]]) -> str:
+    """Metadata scope that separates otherwise identical content."""
+    metadata = metadata or {}
+    return "|".join(f"{field}={metadata.get(field) or ''}" for field in SCOPE_FIELDS)
+
+
+def resolve_tenant(user_id: Optional[str]) -> str:
+    """
+    Validate a tenant identifier (None or blank = DEFAULT_TENANT).
+    
+    Raises:
+        ValueError if the identifier is malformed
+    """
+    user_id = (user_id or "").strip() or DEFAULT_TENANT
+    if not TENANT_PATTERN.match(user_id):
+        raise ValueError("Invalid user id (1-128 letters, digits or _.@:-)")
+    return user_id
+
+
+def metadata_filter(filters: Optional[Dict[str, Any]], tenant: Optional[str] = None) -> Optional[Filter]:
+    """
+    Qdrant filter requiring every given metadata field to match.
+    
+    Args:
+        filters: {field: value or list of values}; None values are ignored
+        tenant: Restrict to this tenant's points
+    
+    Returns:
+        Filter, or None when nothing is filtered
+    
+    Raises:
+        ValueError for fields outside FILTER_FIELDS
+    """
+    conditions = []
+    if tenant is not None:
+        conditions.append(FieldCondition(key=f"metadata.{TENANT_FIELD}", match=MatchValue(value=tenant)))
+    for field, value in (filters or {}).items():
+        if value is None or value == []:
+            continue
+        if field not in FILTER_FIELDS:
+            raise ValueError(f"Cannot filter on '{field}' (filterable: {', '.join(FILTER_FIELDS)})")
+        match = MatchAny(any=list(value)) if isinstance(value, (list, tuple, set)) else MatchValue(value=value)
+        conditions.append(FieldCondition(key=f"metadata.{field}", match=match))
+    return Filter(must=conditions) if conditions else None
+
+
+def quantization_config(mode: str = QUANTIZATION):
+    """
+    Qdrant quantization config for a QUANTIZATION_MODES entry (None for "none").
+    Scalar stores each dimension as int8 (4x smaller); binary stores one bit
+    per dimension (32x smaller) and relies on rescoring for accuracy.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization '{mode}' (expected one of {', '.join(QUANTIZATION_MODES)})")
+    if mode == "scalar":
+        return ScalarQuantization(scalar=ScalarQuantizationConfig(
+            type=ScalarType.INT8, quantile=QUANTIZATION_QUANTILE, always_ram=True
+        ))
+    if mode == "binary":
+        return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def hnsw_config(m: Optional[int] = None, ef_construct: int = HNSW_EF_CONSTRUCT) -> HnswConfigDiff:
+    """
+    HNSW graph parameters; m is the per-tenant degree (payload_m) when
+    TENANT_PARTITIONED, else the global one.
+    """
+    if TENANT_PARTITIONED:
+        return HnswConfigDiff(m=0, payload_m=m or TENANT_PAYLOAD_M, ef_construct=ef_construct)
+    return HnswConfigDiff(m=m or HNSW_M, ef_construct=ef_construct)
+
+
+def search_params(mode: str = QUANTIZATION, hnsw_ef: Optional[int] = HNSW_EF) -> Optional[SearchParams]:
+    """
+    Per-search parameters: beam width and quantized-search rescoring.
+    """
+    if mode == "none":
+        return SearchParams(hnsw_ef=hnsw_ef) if hnsw_ef else None
+    return SearchParams(
+        hnsw_ef=hnsw_ef,
+        quantization=QuantizationSearchParams(
+            rescore=QUANTIZATION_RESCORE,
+            oversampling=QUANTIZATION_OVERSAMPLING if QUANTIZATION_RESCORE else None
+        )
+    )
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = RRF_K) -> List[Tuple[str, float]]:
+    """
+    Fuse ranked ID lists: score(id) = sum over lists of 1 / (k + rank).
+    
+    Returns:
+        [(id, fused score)] best first
+    """
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, item_id in enumerate(ranking, 1):
+            scores[item_id] = scores.get(item_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings keyed on normalized query text.
+    Stores compact read-only float32 arrays.
+    """
+    
+    def __init__(self, max_entries: int = QUERY_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def normalize(text: str) -> str:
+        """Collapse whitespace and case (the MiniLM tokenizer is uncased)."""
+        return " ".join(text.split()).lower()
+    
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Look up a cached vector by normalized key."""
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+    
+    def put(self, key: str, vector: np.ndarray) -> np.ndarray:
+        """Store a vector and return the cached read-only copy."""
+        vector = np.array(vector, dtype=np.float32)
+        vector.setflags(write=False)
+        if self.max_entries <= 0:
+            return vector
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous.nbytes
+            self._entries[key] = vector
+            self._bytes += vector.nbytes
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.nbytes
+        return vector
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and memory usage."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_bytes": self._bytes
+            }
 
 
 class MemoryService:
     """
-    Manages vector embeddings and semantic search using Qdrant.
+    Manages vector embeddings and semantic search using Qdrant (or the
+    embedded local index when Qdrant is unavailable).
     Uses sentence-transformers for local embedding generation.
     """
     
-    def __init__(self, qdrant_url: str = "http://localhost:6333"):
+    def __init__(self, qdrant_url: str = "http://localhost:6333", collection_name: str = COLLECTION_NAME):
         """
         Initialize memory service with Qdrant client and embedding model.
         
         Args:
             qdrant_url: Qdrant server URL (default: localhost:6333)
+            collection_name: Qdrant collection to use (default: studypal)
         """
         try:
-            self.client = QdrantClient(url=qdrant_url)
-            logger.info(f"✓ Connected to Qdrant at {qdrant_url}")
+            self.collection_name = collection_name
+            self.client, self.backend = self.connect(qdrant_url)
             
             # Load embedding model (runs locally)
             logger.info("Loading sentence-transformers model...")
-            self.encoder = SentenceTransformer('all-MiniLM-L6-v2')
+            self.encoder = SentenceTransformer(EMBEDDING_MODEL)
             logger.info("✓ Embedding model loaded")
             
+            # Repeat queries skip the encoder forward pass
+            self.query_cache = QueryEmbeddingCache()
+            
+            # Previously ingested content skips re-encoding
+            self.embedding_store = get_embedding_store()
+            
+            # Keyword (BM25) index fused with dense search
+            self.sparse_index = get_sparse_index(self.collection_name, self.backend)
+            
+            # Background upserts overlap with encoding the next batch (shared across calls)
+            self.upserter = ThreadPoolExecutor(
+                max_workers=max(1, PARALLEL_UPSERTS), thread_name_prefix="studypal-upsert"
+            )
+            
             # Ensure collection exists
             self.ensure_collection()
             
+            # Tenant migration and sparse index sync scroll the whole collection; keep them off the request path
+            threading.Thread(target=self.background_maintenance, name="studypal-maintenance", daemon=True).start()
+            
         except Exception as e:
             logger.error(f"Failed to initialize MemoryService: {e}")
             raise
     
     
+    @staticmethod
+    def connect(qdrant_url: str) -> Tuple[Any, str]:
+        """
+        Open the vector backend selected by VECTOR_BACKEND.
+        
+        Returns:
+            (client, backend name); the local index mirrors the Qdrant client calls used here
+        """
+        if VECTOR_BACKEND == LOCAL_BACKEND:
+            return LocalVectorIndex(), LOCAL_BACKEND
+        
+        client = QdrantClient(url=qdrant_url)
+        try:
+            client.get_collections()
+            logger.info(f"✓ Connected to Qdrant at {qdrant_url}")
+            return client, QDRANT_BACKEND
+        except Exception as e:
+            if VECTOR_BACKEND == QDRANT_BACKEND:
+                raise
+            logger.warning(f"⚠ Qdrant unavailable at {qdrant_url} ({e}), using the embedded local index")
+            return LocalVectorIndex(), LOCAL_BACKEND
+    
+    
     def ensure_collection(self):
         """
-        Create 'studypal' collection if it doesn't exist.
+        Create the collection ('studypal' by default) if it doesn't exist.
         Auto-creates with proper vector configuration.
         """
         try:
             collections = self.client.get_collections().collections
             collection_names = [col.name for col in collections]
             
-            if COLLECTION_NAME not in collection_names:
-                logger.info(f"Creating collection '{COLLECTION_NAME}'...")
+            if self.collection_name not in collection_names:
+                logger.info(f"Creating collection '{self.collection_name}'...")
                 self.client.create_collection(
-                    collection_name=COLLECTION_NAME,
+                    collection_name=self.collection_name,
                     vectors_config=VectorParams(
                         size=VECTOR_SIZE,
-                        distance=DISTANCE_METRIC
-                    )
+                        distance=DISTANCE_METRIC,
+                        on_disk=VECTORS_ON_DISK
+                    ),
+                    on_disk_payload=PAYLOAD_ON_DISK,
+                    hnsw_config=hnsw_config(),
+                    quantization_config=quantization_config()
                 )
-                logger.info(f"✓ Collection '{COLLECTION_NAME}' created")
+                logger.info(f"✓ Collection '{self.collection_name}' created " + (
+                    f"(quantization: {QUANTIZATION}, vectors on disk: {VECTORS_ON_DISK})"
+                    if self.backend == QDRANT_BACKEND else "in the local index"
+                ))
             else:
-                logger.info(f"✓ Collection '{COLLECTION_NAME}' already exists")
+                logger.info(f"✓ Collection '{self.collection_name}' already exists")
+                if APPLY_STORAGE_CONFIG and self.backend == QDRANT_BACKEND:
+                    self.apply_storage_config()
+            
+            self.ensure_payload_indexes()
                 
         except Exception as e:
             logger.error(f"Failed to ensure collection: {e}")
             raise
     
     
+    def apply_storage_config(self) -> List[str]:
+        """
+        Migrate an existing collection to the configured quantization,
+        on-disk and HNSW settings. Only settings that differ are updated;
+        Qdrant rebuilds the affected segments in the background while the
+        collection keeps serving searches.
+        
+        Returns:
+            Names of the settings that were changed
+        """
+        try:
+            config = self.client.get_collection(collection_name=self.collection_name).config
+        except Exception as e:
+            logger.warning(f"⚠ Could not read collection config, storage settings not applied: {e}")
+            return []
+        
+        updates = {}
+        desired_hnsw = hnsw_config()
+        if any(getattr(config.hnsw_config, field) != getattr(desired_hnsw, field)
+               for field in ("m", "payload_m", "ef_construct") if getattr(desired_hnsw, field) is not None):
+            updates["hnsw_config"] = desired_hnsw
+        
+        desired_quantization = quantization_config()
+        if config.quantization_config != desired_quantization:
+            updates["quantization_config"] = desired_quantization or Disabled.DISABLED
+        
+        vectors = config.params.vectors
+        if isinstance(vectors, VectorParams) and bool(vectors.on_disk) != VECTORS_ON_DISK:
+            updates["vectors_config"] = {"": VectorParamsDiff(on_disk=VECTORS_ON_DISK)}  # "" = unnamed vector
+        
+        if bool(config.params.on_disk_payload) != PAYLOAD_ON_DISK:
+            updates["collection_params"] = CollectionParamsDiff(on_disk_payload=PAYLOAD_ON_DISK)
+        
+        if updates:
+            self.client.update_collection(collection_name=self.collection_name, **updates)
+            logger.info(f"✓ Storage settings migrated on '{self.collection_name}': {', '.join(updates)} "
+                        f"(segments rebuild in the background)")
+        return list(updates)
+    
+    
+    def ensure_payload_indexes(self):
+        """
+        Create keyword payload indexes on the filterable metadata fields.
+        Filtered searches then use the index (and filter-aware HNSW links)
+        instead of checking every candidate's payload.
+        Creating an index that already exists is a no-op in Qdrant.
+        """
+        for field in (TENANT_FIELD,) + FILTER_FIELDS:
+            try:
+                self.client.create_payload_index(
+                    collection_name=self.collection_name,
+                    field_name=f"metadata.{field}",
+                    field_schema=PayloadSchemaType.KEYWORD,
+                    wait=False  # large collections index in the background
+                )
+            except Exception as e:
+                logger.warning(f"⚠ Could not create payload index on metadata.{field}: {e}")
+        logger.info(f"✓ Payload indexes: {', '.join(f'metadata.{f}' for f in (TENANT_FIELD,) + FILTER_FIELDS)}")
+    
+    
+    def background_maintenance(self):
+        """
+        One-off startup work over the whole collection, run in a background
+        thread: move pre-tenancy points to DEFAULT_TENANT, then index points
+        missing from the sparse index (in that order, so the sparse index
+        sees the migrated point IDs).
+        """
+        try:
+            self.assign_default_tenant()
+        except Exception as e:
+            logger.warning(f"⚠ Pre-tenancy point migration failed: {e}")
+        if self.sparse_index is not None:
+            self.sync_sparse_index()
+    
+    
+    def assign_default_tenant(self) -> int:
+        """
+        Move points stored before multi-tenancy (no metadata.user_id) to
+        DEFAULT_TENANT. Point IDs are re-derived for the new scope; vectors
+        are copied, not re-encoded. A no-op once every point has a tenant.
+        Runs from background_maintenance; until it finishes, pre-tenancy
+        points are not visible to tenant-filtered searches.
+        
+        Returns:
+            Number of points migrated
+        """
+        untenanted = Filter(must=[IsEmptyCondition(is_empty=PayloadField(key=f"metadata.{TENANT_FIELD}"))])
+        migrated = 0
+        while True:
+            # Migrated points leave the filter, so always read the first page
+            page, _ = self.client.scroll(
+                collection_name=self.collection_name,
+                scroll_filter=untenanted,
+                limit=UPSERT_BATCH_SIZE,
+                with_payload=True,
+                with_vectors=True
+            )
+            if not page:
+                break
+            
+            points = []
+            for point in page:
+                text = point.payload.get("text", "")
+                metadata = {**(point.payload.get("metadata") or {}), TENANT_FIELD: DEFAULT_TENANT}
+                points.append(PointStruct(
+                    id=self.point_id_for(text, metadata),
+                    vector=point.vector,
+                    payload={"text": text, "metadata": metadata}
+                ))
+            self.client.upsert(collection_name=self.collection_name, points=points, wait=True)
+            self.client.delete(
+                collection_name=self.collection_name,
+                points_selector=PointIdsList(points=[point.id for point in page])
+            )
+            if self.sparse_index is not None:
+                self.sparse_index.remove([str(point.id) for point in page])
+                self.sparse_index.add((str(p.id), p.payload["text"], p.payload["metadata"]) for p in points)
+            migrated += len(page)
+        
+        if migrated:
+            logger.info(f"✓ Assigned {migrated} pre-tenancy points to tenant '{DEFAULT_TENANT}'")
+        return migrated
+    
+    
+    @staticmethod
+    def point_id_for(text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Deterministic point ID from content and metadata scope.
+        The same text stored for the same user/course/topic always maps to
+        the same point, so repeated ingestion is an idempotent upsert.
+        
+        Args:
+            text: Chunk text
+            metadata: Chunk metadata (only SCOPE_FIELDS are used)
+        
+        Returns:
+            UUID string
+        """
+        return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{scope_key(metadata)}|{content_hash(text)}"))
+    
+    
+    def _existing_point_ids(self, point_ids: List[str]) -> set:
+        """Return the subset of point IDs already stored in the collection."""
+        existing = set()
+        for start in range(0, len(point_ids), RETRIEVE_BATCH_SIZE):
+            records = self.client.retrieve(
+                collection_name=self.collection_name,
+                ids=point_ids[start:start + RETRIEVE_BATCH_SIZE],
+                with_payload=False,
+                with_vectors=False
+            )
+            existing.update(str(r.id) for r in records)
+        return existing
+    
+    
     def add_text(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> str:
         """
         Add text to memory with semantic embeddings.
+        Re-adding the same text in the same scope is a no-op.
         
         Args:
             text: Text content to store
             metadata: Optional metadata (course, topic, source, etc.)
         
         Returns:
-            point_id: UUID of stored vector
+            point_id: Deterministic UUID of stored vector
         """
         try:
             if not text or not text.strip():
                 raise ValueError("Text cannot be empty")
             
-            # Generate embedding
-            embedding = self.encoder.encode(text).tolist()
-            
-            # Create unique ID
-            point_id = str(uuid.uuid4())
-            
-            # Prepare payload
-            payload = {
-                "text": text,
-                "metadata": metadata or {}
-            }
-            
-            # Store in Qdrant
-            self.client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=[
-                    PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload=payload
-                    )
-                ]
-            )
-            
+            point_id = self.add_texts_batch([text], metadata=metadata)[0]
             logger.info(f"✓ Stored text chunk: {point_id}")
             return point_id
             
@@ -127,66 +553,261 @@ class MemoryService:
     def add_texts_batch(self, texts: List[str], metadata: Optional[Dict[str, Any]] = None) -> List[str]:
         """
         Add multiple text chunks in batch for efficiency.
+        Chunks already stored in the same scope are skipped (no encode, no upsert).
         
         Args:
             texts: List of text chunks
             metadata: Shared metadata for all chunks
         
         Returns:
-            List of point IDs
+            List of point IDs (one per non-empty text)
         """
         try:
             if not texts:
                 return []
             
-            # Filter empty texts
-            valid_texts = [t for t in texts if t and t.strip()]
-            if not valid_texts:
-                return []
+            return self.add_items_batch([{"text": t, "metadata": metadata} for t in texts])
             
-            # Generate embeddings in batch
-            embeddings = self.encoder.encode(valid_texts).tolist()
-            
-            # Create points
-            points = []
-            point_ids = []
+        except Exception as e:
+            logger.error(f"Failed to add texts in batch: {e}")
+            raise
+    
+    
+    def add_items_batch(
+        self,
+        items: List[Dict[str, Any]],
+        encode_batch_size: int = ENCODE_BATCH_SIZE,
+        upsert_batch_size: int = UPSERT_BATCH_SIZE,
+        wait: bool = True,
+        parallel_upserts: int = 1
+    ) -> List[str]:
+        """
+        Batch ingestion with per-item metadata.
+        
+        New items are encoded in mini-batches and upserted in size-bounded
+        Qdrant batches. Each upsert is sent in the background while the next
+        batch is encoded, and up to parallel_upserts upserts run at once
+        (capped by the shared INGEST_PARALLEL_UPSERTS executor). A single
+        batch is encoded and upserted inline.
+        
+        Args:
+            items: Dicts with "text" and optional "metadata"
+            encode_batch_size: Encoder forward-pass batch size
+            upsert_batch_size: Points per Qdrant upsert request
+            wait: Wait for Qdrant to apply each upsert (False = acknowledge on receipt)
+            parallel_upserts: Maximum concurrent upsert requests
+        
+        Returns:
+            List of point IDs (one per item with non-empty text)
+        """
+        try:
+            point_ids, pending = self.new_items(items)
+            if not point_ids:
+                return []
             
-            for text, embedding in zip(valid_texts, embeddings):
-                point_id = str(uuid.uuid4())
-                point_ids.append(point_id)
-                
-                points.append(
-                    PointStruct(
-                        id=point_id,
-                        vector=embedding,
-                        payload={
-                            "text": text,
-                            "metadata": metadata or {}
-                        }
-                    )
-                )
+            if len(pending) <= upsert_batch_size:
+                # Nothing to overlap with (e.g. add_text)
+                vectors = self.encode_texts([text for _, (text, _) in pending], batch_size=encode_batch_size)
+                self.upsert_encoded(pending, vectors, wait=wait)
+            else:
+                parallel_upserts = max(1, parallel_upserts)
+                in_flight = []
+                try:
+                    for start in range(0, len(pending), upsert_batch_size):
+                        batch = pending[start:start + upsert_batch_size]
+                        
+                        # Generate embeddings (reused for previously stored content)
+                        vectors = self.encode_texts([text for _, (text, _) in batch], batch_size=encode_batch_size)
+                        in_flight.append(self.upserter.submit(self.upsert_encoded, batch, vectors, wait=wait))
+                        
+                        # Bound memory held by queued upserts
+                        while len(in_flight) > parallel_upserts:
+                            in_flight.pop(0).result()
+                    
+                    for future in in_flight:
+                        future.result()
+                finally:
+                    # Don't leave this call's upserts queued on the shared executor after a failure
+                    for future in in_flight:
+                        future.cancel()
             
-            # Batch upsert
-            self.client.upsert(
-                collection_name=COLLECTION_NAME,
-                points=points
+            logger.info(
+                f"✓ Stored {len(pending)} text chunks in batch "
+                f"({len(point_ids) - len(pending)} already in memory)"
             )
-            
-            logger.info(f"✓ Stored {len(point_ids)} text chunks in batch")
             return point_ids
             
         except Exception as e:
-            logger.error(f"Failed to add texts in batch: {e}")
+            logger.error(f"Failed to add items in batch: {e}")
             raise
     
     
-    def search(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    def new_items(self, items: List[Dict[str, Any]]) -> Tuple[List[str], List[Tuple[str, Tuple[str, Dict[str, Any]]]]]:
+        """
+        Assign deterministic point IDs and drop items that are already stored.
+        
+        Args:
+            items: Dicts with "text" and optional "metadata"
+        
+        Returns:
+            (point ID for every non-empty item, [(point_id, (text, metadata))] still to store)
+        """
+        valid_items = [
+            (item["text"], {**(item.get("metadata") or {})})
+            for item in items
+            if item.get("text") and item["text"].strip()
+        ]
+        for _, metadata in valid_items:
+            if not metadata.get(TENANT_FIELD):
+                metadata[TENANT_FIELD] = DEFAULT_TENANT
+        if not valid_items:
+            return [], []
+        
+        point_ids = [self.point_id_for(text, metadata) for text, metadata in valid_items]
+        
+        # Only new, unique points need encoding and upserting
+        existing = self._existing_point_ids(list(dict.fromkeys(point_ids)))
+        new_points = OrderedDict()
+        for point_id, item in zip(point_ids, valid_items):
+            if point_id not in existing and point_id not in new_points:
+                new_points[point_id] = item
+        
+        return point_ids, list(new_points.items())
+    
+    
+    def upsert_encoded(self, batch: List[Tuple[str, Tuple[str, Dict[str, Any]]]],
+                       vectors: np.ndarray, wait: bool = True):
+        """
+        Upsert items whose embeddings were already computed.
+        
+        Args:
+            batch: [(point_id, (text, metadata))] as returned by new_items
+            vectors: Matching float32 embeddings
+            wait: Wait for Qdrant to apply the upsert
+        """
+        if not batch:
+            return
+        self.client.upsert(
+            collection_name=self.collection_name,
+            points=[
+                PointStruct(
+                    id=point_id,
+                    vector=vector.tolist(),
+                    payload={
+                        "text": text,
+                        "metadata": metadata
+                    }
+                )
+                for (point_id, (text, metadata)), vector in zip(batch, vectors)
+            ],
+            wait=wait
+        )
+        if self.sparse_index is not None:
+            self.sparse_index.add((point_id, text, metadata) for point_id, (text, metadata) in batch)
+    
+    
+    def encode_texts(self, texts: List[str], batch_size: int = ENCODE_BATCH_SIZE) -> np.ndarray:
         """
-        Semantic search for relevant content.
+        Embed content for storage, reusing stored embeddings for known content.
+        Only texts missing from the embedding store go through the encoder.
+        
+        Args:
+            texts: Non-empty text chunks
+            batch_size: Encoder forward-pass batch size
+        
+        Returns:
+            float32 matrix of shape (len(texts), VECTOR_SIZE)
+        """
+        if not texts:
+            return np.zeros((0, VECTOR_SIZE), dtype=np.float32)
+        
+        if self.embedding_store is None:
+            return np.asarray(self.encoder.encode(texts, batch_size=batch_size), dtype=np.float32)
+        
+        hashes = [content_hash(t) for t in texts]
+        stored = self.embedding_store.get_many(hashes, EMBEDDING_MODEL)
+        
+        # Encode each missing content hash once
+        missing = {}
+        for text, text_hash in zip(texts, hashes):
+            if text_hash not in stored and text_hash not in missing:
+                missing[text_hash] = text
+        
+        if missing:
+            encoded = np.asarray(
+                self.encoder.encode(list(missing.values()), batch_size=batch_size),
+                dtype=np.float32
+            )
+            new_items = list(zip(missing.keys(), encoded))
+            self.embedding_store.put_many(new_items, EMBEDDING_MODEL)
+            stored.update(new_items)
+        
+        logger.info(f"✓ Embeddings: {len(texts) - len(missing)} reused, {len(missing)} encoded")
+        return np.stack([stored[h] for h in hashes])
+    
+    
+    def encode_query(self, query: str) -> np.ndarray:
+        """
+        Generate the embedding for a search query (LRU cached).
+        
+        Args:
+            query: Query text
+        
+        Returns:
+            Read-only float32 embedding vector
+        """
+        key = QueryEmbeddingCache.normalize(query)
+        vector = self.query_cache.get(key)
+        if vector is None:
+            vector = self.query_cache.put(key, self.encoder.encode(key))
+        return vector
+    
+    
+    def encode_queries(self, queries: List[str]) -> List[np.ndarray]:
+        """
+        Embed several search queries; cache misses share one encoder call.
+        
+        Args:
+            queries: Query texts
+        
+        Returns:
+            Read-only float32 embedding per query
+        """
+        keys = [QueryEmbeddingCache.normalize(query) for query in queries]
+        vectors = {key: self.query_cache.get(key) for key in dict.fromkeys(keys)}
+        missing = [key for key, vector in vectors.items() if vector is None]
+        if missing:
+            encoded = self.encoder.encode(missing, batch_size=ENCODE_BATCH_SIZE)
+            for key, vector in zip(missing, encoded):
+                vectors[key] = self.query_cache.put(key, vector)
+        return [vectors[key] for key in keys]
+    
+    
+    @staticmethod
+    def _format_hits(hits) -> List[Dict[str, Any]]:
+        """Search hits as result dicts (text, metadata, score, id)."""
+        return [
+            {
+                "text": hit.payload.get("text", ""),
+                "metadata": hit.payload.get("metadata", {}),
+                "score": hit.score,
+                "id": hit.id
+            }
+            for hit in hits
+        ]
+    
+    
+    def search(self, query: str, top_k: int = 5,
+               filters: Optional[Dict[str, Any]] = None,
+               tenant: str = DEFAULT_TENANT) -> List[Dict[str, Any]]:
+        """
+        Semantic search for relevant content within one tenant.
         
         Args:
             query: Search query text
             top_k: Number of results to return (default: 5)
+            filters: Restrict to matching metadata, e.g. {"course": "CS101", "source": ["lecture", "textbook"]}
+            tenant: User whose materials are searched
         
         Returns:
             List of matching results with text and metadata
@@ -195,25 +816,25 @@ class MemoryService:
             if not query or not query.strip():
                 raise ValueError("Query cannot be empty")
             
+            query_filter = metadata_filter(filters, tenant=tenant)
+            hybrid = self.sparse_index is not None
+            
             # Generate query embedding
-            query_embedding = self.encoder.encode(query).tolist()
+            query_vector = self.encode_query(query)
             
-            # Search Qdrant
+            # Search Qdrant (over-fetch when the list is fused with BM25)
             search_results = self.client.search(
-                collection_name=COLLECTION_NAME,
-                query_vector=query_embedding,
-                limit=top_k
+                collection_name=self.collection_name,
+                query_vector=query_vector.tolist(),
+                query_filter=query_filter,
+                search_params=search_params(),
+                limit=top_k * HYBRID_FETCH_FACTOR if hybrid else top_k
             )
             
-            # Format results
-            results = []
-            for hit in search_results:
-                results.append({
-                    "text": hit.payload.get("text", ""),
-                    "metadata": hit.payload.get("metadata", {}),
-                    "score": hit.score,
-                    "id": hit.id
-                })
+            results = self._format_hits(search_results)
+            
+            if hybrid:
+                results = self._fuse_sparse(query, query_vector, results, top_k, filters, tenant)
             
             logger.info(f"✓ Found {len(results)} relevant chunks for query")
             return results
@@ -223,26 +844,350 @@ class MemoryService:
             raise
     
     
-    def get_collection_stats(self) -> Dict[str, Any]:
+    def search_many(self, queries: List[str], top_k: int = 5,
+                    filters: Optional[Dict[str, Any]] = None,
+                    tenant: str = DEFAULT_TENANT) -> List[List[Dict[str, Any]]]:
+        """
+        Semantic search for several queries at once (fan-out retrieval).
+        All queries are embedded in one encoder forward pass and searched
+        in a single Qdrant batch request; with hybrid search the BM25 queries
+        share one sparse index pass and keyword-only hits of every query are
+        fetched in one retrieve. Results match search() per query.
+        
+        Args:
+            queries: Search query texts
+            top_k: Number of results per query (default: 5)
+            filters: Metadata filter applied to every query
+            tenant: User whose materials are searched
+        
+        Returns:
+            One result list per query, in query order
+        """
+        try:
+            if not queries:
+                return []
+            if any(not query or not query.strip() for query in queries):
+                raise ValueError("Query cannot be empty")
+            
+            query_filter = metadata_filter(filters, tenant=tenant)
+            hybrid = self.sparse_index is not None
+            query_vectors = self.encode_queries(queries)
+            
+            batch_results = self.client.search_batch(
+                collection_name=self.collection_name,
+                requests=[
+                    SearchRequest(
+                        vector=query_vector.tolist(),
+                        filter=query_filter,
+                        params=search_params(),
+                        limit=top_k * HYBRID_FETCH_FACTOR if hybrid else top_k,
+                        with_payload=True
+                    )
+                    for query_vector in query_vectors
+                ]
+            )
+            
+            results = [self._format_hits(hits) for hits in batch_results]
+            if hybrid:
+                sparse = self.sparse_index.search_many(queries, tenant, filters, limit=top_k * HYBRID_FETCH_FACTOR)
+                results = self._fuse_many(query_vectors, results, sparse, top_k)
+            
+            logger.info(f"✓ Batch search: {len(queries)} queries, {sum(map(len, results))} chunks")
+            return results
+            
+        except Exception as e:
+            logger.error(f"Failed to batch search memory: {e}")
+            raise
+    
+    
+    def _fuse_sparse(self, query: str, query_vector: np.ndarray, dense: List[Dict[str, Any]],
+                     top_k: int, filters: Optional[Dict[str, Any]], tenant: str) -> List[Dict[str, Any]]:
+        """
+        Fuse dense results with BM25 results by reciprocal rank.
+        
+        "score" stays the cosine similarity (computed from the stored vector
+        for keyword-only hits) so relevance thresholds keep their meaning;
+        the order follows the fused rank.
+        """
+        sparse = self.sparse_index.search(query, tenant, filters, limit=top_k * HYBRID_FETCH_FACTOR)
+        return self._fuse_many([query_vector], [dense], [sparse], top_k)[0]
+    
+    
+    def _fuse_many(self, query_vectors: List[np.ndarray], dense_lists: List[List[Dict[str, Any]]],
+                   sparse_lists: List[List[Tuple[str, float]]], top_k: int) -> List[List[Dict[str, Any]]]:
+        """
+        Fuse dense and BM25 results per query. Keyword-only hits of all
+        queries are fetched in a single retrieve.
+        """
+        fused_lists = [
+            reciprocal_rank_fusion([[str(result["id"]) for result in dense], [p for p, _ in sparse]])
+            if sparse else None
+            for dense, sparse in zip(dense_lists, sparse_lists)
+        ]
+        missing = {}
+        for dense, fused in zip(dense_lists, fused_lists):
+            if fused is not None:
+                dense_ids = {str(result["id"]) for result in dense}
+                missing.update(dict.fromkeys(p for p, _ in fused if p not in dense_ids))
+        records = self._retrieve_vectors(list(missing))
+        return [
+            dense[:top_k] if fused is None
+            else self._fused_results(fused, dense, sparse, records, query_vector, top_k)
+            for query_vector, dense, sparse, fused in zip(query_vectors, dense_lists, sparse_lists, fused_lists)
+        ]
+    
+    
+    def _retrieve_vectors(self, point_ids: List[str]) -> Dict[str, Any]:
+        """
+        Fetch payloads and vectors of keyword-only hits in one request.
+        IDs the vector store no longer has (stale sparse entries) are
+        dropped from the sparse index.
+        
+        Returns:
+            {point_id: record}
+        """
+        if not point_ids:
+            return {}
+        records = self.client.retrieve(
+            collection_name=self.collection_name,
+            ids=point_ids,
+            with_payload=True,
+            with_vectors=True
+        )
+        by_id = {str(record.id): record for record in records}
+        stale = [point_id for point_id in point_ids if point_id not in by_id]
+        if stale:
+            self.sparse_index.remove(stale)
+            logger.info(f"✓ Dropped {len(stale)} stale entries from the sparse index")
+        return by_id
+    
+    
+    @staticmethod
+    def _fused_results(fused: List[Tuple[str, float]], dense: List[Dict[str, Any]],
+                       sparse: List[Tuple[str, float]], records: Dict[str, Any],
+                       query_vector: np.ndarray, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Build up to top_k results in fused order. Hits missing from both the
+        dense results and the retrieved records (no longer stored) are skipped
+        before truncating, so they never take a result slot.
+        """
+        by_id = {str(result["id"]): result for result in dense}
+        bm25 = dict(sparse)
+        norm = float(np.linalg.norm(query_vector)) or 1.0
+        results = []
+        for point_id, fused_score in fused:
+            result = by_id.get(point_id)
+            if result is None:
+                record = records.get(point_id)
+                if record is None:
+                    continue  # indexed but no longer stored
+                result = {
+                    "text": record.payload.get("text", ""),
+                    "metadata": record.payload.get("metadata", {}),
+                    "score": float(np.dot(query_vector, record.vector)) / norm,
+                    "id": record.id
+                }
+            results.append({**result, "bm25_score": bm25.get(point_id), "fused_score": round(fused_score, 6)})
+            if len(results) == top_k:
+                break
+        return results
+    
+    
+    def sync_sparse_index(self) -> int:
+        """
+        Index stored points missing from the sparse index (e.g. ingested
+        before hybrid search was enabled). Skipped when the counts match.
+        
+        Returns:
+            Number of points added
+        """
+        try:
+            stored = self.client.count(collection_name=self.collection_name, exact=True).count
+            if self.sparse_index.count() >= stored:
+                return 0
+            
+            logger.info(f"Building sparse index for {stored} stored points...")
+            added = 0
+            offset = None
+            while True:
+                page, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    limit=UPSERT_BATCH_SIZE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=False
+                )
+                added += self.sparse_index.add(
+                    (str(point.id), point.payload.get("text", ""), point.payload.get("metadata") or {})
+                    for point in page
+                )
+                if offset is None:
+                    break
+            logger.info(f"✓ Sparse index synced: {added} points added")
+            return added
+        except Exception as e:
+            logger.warning(f"⚠ Sparse index sync failed: {e}")
+            return 0
+    
+    
+    def collapse_duplicates(self, similarity_threshold: float = DEDUP_SIMILARITY_THRESHOLD,
+                            dry_run: bool = False, tenant: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Find and remove near-duplicate vectors within the same metadata scope.
+        Scans the collection page by page, batch-searches each page's vectors
+        for close neighbours, keeps the first point seen and deletes the rest.
+        
+        Args:
+            similarity_threshold: Cosine similarity at or above which points are
+                                  duplicates (at least DEDUP_MIN_SIMILARITY)
+            dry_run: Only report what would be removed
+            tenant: Only scan this user's points (None: every tenant)
+        
+        Returns:
+            Dictionary with scanned and removed counts
+        
+        Raises:
+            ValueError if the threshold is below DEDUP_MIN_SIMILARITY or above 1
+        """
+        if not DEDUP_MIN_SIMILARITY <= similarity_threshold <= 1.0:
+            raise ValueError(f"similarity_threshold must be in [{DEDUP_MIN_SIMILARITY}, 1]")
+        
+        scanned = 0
+        removed = set()
+        offset = None
+        
+        try:
+            while True:
+                page, offset = self.client.scroll(
+                    collection_name=self.collection_name,
+                    scroll_filter=metadata_filter(None, tenant=tenant) if tenant is not None else None,
+                    limit=DEDUP_PAGE_SIZE,
+                    offset=offset,
+                    with_payload=True,
+                    with_vectors=True
+                )
+                candidates = [p for p in page if p.id not in removed]
+                
+                if candidates:
+                    neighbours = self.client.search_batch(
+                        collection_name=self.collection_name,
+                        requests=[
+                            SearchRequest(
+                                vector=p.vector,
+                                filter=metadata_filter(None, tenant=(p.payload.get("metadata") or {}).get(TENANT_FIELD)),
+                                limit=DEDUP_NEIGHBORS,
+                                score_threshold=similarity_threshold,
+                                params=search_params(),
+                                with_payload=True
+                            )
+                            for p in candidates
+                        ]
+                    )
+                    
+                    page_removed = []
+                    for point, hits in zip(candidates, neighbours):
+                        scanned += 1
+                        if point.id in removed:
+                            continue
+                        scope = scope_key(point.payload.get("metadata"))
+                        for hit in hits:
+                            if hit.id == point.id or hit.id in removed:
+                                continue
+                            if scope_key(hit.payload.get("metadata")) != scope:
+                                continue
+                            removed.add(hit.id)
+                            page_removed.append(hit.id)
+                    
+                    if page_removed and not dry_run:
+                        self.client.delete(
+                            collection_name=self.collection_name,
+                            points_selector=PointIdsList(points=page_removed)
+                        )
+                        if self.sparse_index is not None:
+                            self.sparse_index.remove([str(point_id) for point_id in page_removed])
+                
+                if offset is None:
+                    break
+            
+            logger.info(f"✓ Duplicate scan: {scanned} points scanned, {len(removed)} duplicates "
+                        f"{'found' if dry_run else 'removed'}")
+            return {
+                "scanned": scanned,
+                "duplicates": len(removed),
+                "removed": 0 if dry_run else len(removed),
+                "similarity_threshold": similarity_threshold,
+                "dry_run": dry_run,
+                "tenant": tenant
+            }
+            
+        except Exception as e:
+            logger.error(f"Failed to collapse duplicates: {e}")
+            raise
+    
+    
+    def storage_stats(self) -> Dict[str, Any]:
+        """
+        Storage settings in effect on the Qdrant collection, read from its
+        config. They differ from the configured ones until
+        QDRANT_APPLY_STORAGE_CONFIG has migrated an existing collection.
+        """
+        configured = {
+            "quantization": QUANTIZATION,
+            "vectors_on_disk": VECTORS_ON_DISK,
+            "payload_on_disk": PAYLOAD_ON_DISK,
+            "hnsw": hnsw_config().model_dump(exclude_none=True)
+        }
+        try:
+            config = self.client.get_collection(collection_name=self.collection_name).config
+        except Exception as e:
+            logger.warning(f"⚠ Could not read collection config: {e}")
+            return {"error": "Could not read collection config", "configured": configured}
+        
+        quantization = config.quantization_config
+        vectors = config.params.vectors
+        applied = {
+            "quantization": "scalar" if isinstance(quantization, ScalarQuantization)
+                            else "binary" if isinstance(quantization, BinaryQuantization) else "none",
+            "vectors_on_disk": bool(vectors.on_disk) if isinstance(vectors, VectorParams) else None,
+            "payload_on_disk": bool(config.params.on_disk_payload),
+            "hnsw": config.hnsw_config.model_dump(include={"m", "payload_m", "ef_construct"}, exclude_none=True)
+        }
+        return {**applied, "configured": configured, "matches_config": applied == configured}
+    
+    
+    def get_collection_stats(self, tenant: Optional[str] = None) -> Dict[str, Any]:
         """
         Get statistics about the memory collection.
         
+        Args:
+            tenant: Also count this tenant's points
+        
         Returns:
             Dictionary with collection info
         """
         try:
             # Use count endpoint instead of get_collection to avoid Pydantic issues
-            collection_info = self.client.count(collection_name=COLLECTION_NAME)
-            return {
-                "collection_name": COLLECTION_NAME,
+            collection_info = self.client.count(collection_name=self.collection_name)
+            stats = {
+                "collection_name": self.collection_name,
+                "backend": self.backend,
                 "vectors_count": collection_info.count if hasattr(collection_info, 'count') else 0,
                 "points_count": collection_info.count if hasattr(collection_info, 'count') else 0,
-                "status": "active"
+                "status": "active",
+                "storage": self.client.stats(self.collection_name) if self.backend == LOCAL_BACKEND
+                           else self.storage_stats()
             }
+            if tenant is not None:
+                stats["tenant"] = tenant
+                stats["tenant_points_count"] = self.client.count(
+                    collection_name=self.collection_name,
+                    count_filter=metadata_filter(None, tenant=tenant)
+                ).count
+            return stats
         except Exception as e:
             logger.error(f"Failed to get collection stats: {e}")
             return {
-                "collection_name": COLLECTION_NAME,
+                "collection_name": self.collection_name,
                 "error": "Could not retrieve stats",
                 "status": "unknown"
             }
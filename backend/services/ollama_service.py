@@ -3,10 +3,18 @@ Ollama Service - Local AI Brain
 Handles communication with Ollama for Mixtral (reasoning) and Qwen (explanations)
 """
 
+import asyncio
+import functools
 import logging
+import os
+import threading
+import httpx
 import requests
 import json
-from typing import Optional, Dict, Any
+from concurrent.futures import Future
+from typing import Optional, Dict, Any, AsyncIterator, Callable, Coroutine, Union
+
+from services.response_cache import get_response_cache, SemanticKey
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,15 +29,88 @@ OLLAMA_CHAT_URL = f"{OLLAMA_BASE_URL}/api/chat"
 MIXTRAL_MODEL = "mixtral"  # Deep reasoning, complex analysis
 QWEN_MODEL = "qwen2.5:14b"  # Clean explanations, flashcard generation
 
+# Connection pool and concurrency limits (override with environment variables)
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", "32"))
+OLLAMA_REQUEST_TIMEOUT = 300  # 5 minutes for complex queries
+MODEL_CONCURRENCY = {
+    MIXTRAL_MODEL: int(os.getenv("OLLAMA_MIXTRAL_CONCURRENCY", "2")),
+    QWEN_MODEL: int(os.getenv("OLLAMA_QWEN_CONCURRENCY", "4")),
+}
+DEFAULT_MODEL_CONCURRENCY = int(os.getenv("OLLAMA_DEFAULT_CONCURRENCY", "2"))
+MAX_WAITING_PER_MODEL = int(os.getenv("OLLAMA_MAX_WAITING_PER_MODEL", "256"))
+
+
+class OllamaStreamError(RuntimeError):
+    """Generation failed after a stream was opened (busy, timeout, HTTP error)."""
+
+
+class ModelLimiter:
+    """
+    Per-model concurrency limit with a bounded wait queue (backpressure).
+    Only used from the Ollama service event loop.
+    """
+    
+    def __init__(self, model: str, max_concurrent: int, max_waiting: int):
+        self.model = model
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max_waiting
+        self.semaphore = asyncio.Semaphore(self.max_concurrent)
+        self.in_flight = 0
+        self.waiting = 0
+        self.rejected = 0
+    
+    def is_full(self) -> bool:
+        """Whether the wait queue has reached its limit."""
+        return self.waiting >= self.max_waiting
+    
+    async def acquire(self):
+        """Wait for a free generation slot."""
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+    
+    def release(self):
+        """Release a generation slot."""
+        self.in_flight -= 1
+        self.semaphore.release()
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "rejected": self.rejected
+        }
+
 
 class OllamaService:
     """
     Service for interacting with local Ollama models.
     Provides structured AI responses for study assistance.
+    
+    All HTTP traffic runs on a dedicated event loop thread that owns a
+    keep-alive connection pool, so in-flight generations do not hold a
+    worker thread each. Use the *_async methods from async code; the
+    synchronous methods are thin wrappers for existing callers.
     """
     
     def __init__(self):
         """Initialize Ollama service and verify connectivity."""
+        self._loop = asyncio.new_event_loop()
+        self._loop_thread = threading.Thread(
+            target=self._loop.run_forever,
+            name="studypal-ollama-loop",
+            daemon=True
+        )
+        self._loop_thread.start()
+        self._client: Optional[httpx.AsyncClient] = None
+        self._limiters: Dict[str, ModelLimiter] = {}
+        self.cache = get_response_cache()
+        self._submit(self._init_client()).result()
+        
         try:
             # Test connection
             response = requests.get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
@@ -44,10 +125,107 @@ class OllamaService:
             logger.info("Make sure Ollama is running: ollama serve")
     
     
-    def _generate(self, model: str, prompt: str, system: Optional[str] = None, 
-                  temperature: float = 0.7, max_tokens: int = 2000) -> str:
+    async def _init_client(self):
+        """Create the pooled HTTP client on the service loop."""
+        self._client = httpx.AsyncClient(
+            base_url=OLLAMA_BASE_URL,
+            timeout=httpx.Timeout(OLLAMA_REQUEST_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=OLLAMA_MAX_CONNECTIONS,
+                max_keepalive_connections=OLLAMA_MAX_CONNECTIONS
+            )
+        )
+    
+    
+    def _submit(self, coro: Coroutine) -> Future:
+        """Schedule a coroutine on the service loop."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+    
+    
+    async def _on_loop(self, coro: Coroutine) -> Any:
+        """Await a coroutine that runs on the service loop from any other loop."""
+        return await asyncio.wrap_future(self._submit(coro))
+    
+    
+    def _run_sync(self, coro: Coroutine) -> Any:
+        """Block until a coroutine on the service loop completes."""
+        return self._submit(coro).result()
+    
+    
+    def _get_limiter(self, model: str) -> ModelLimiter:
+        """Get or create the concurrency limiter for a model."""
+        limiter = self._limiters.get(model)
+        if limiter is None:
+            limiter = ModelLimiter(
+                model,
+                MODEL_CONCURRENCY.get(model, DEFAULT_MODEL_CONCURRENCY),
+                MAX_WAITING_PER_MODEL
+            )
+            self._limiters[model] = limiter
+        return limiter
+    
+    
+    @staticmethod
+    def _build_payload(model: str, prompt: str, system: Optional[str], temperature: float,
+                       max_tokens: int, stream: bool) -> Dict[str, Any]:
+        """Build an /api/generate request body."""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": {
+                "temperature": temperature,
+                "num_predict": max_tokens
+            }
+        }
+        if system:
+            payload["system"] = system
+        return payload
+    
+    
+    @staticmethod
+    def _reject(limiter: ModelLimiter) -> str:
+        """Record a rejected request and return the busy message."""
+        limiter.rejected += 1
+        logger.warning(f"Ollama queue for '{limiter.model}' is full ({limiter.waiting} waiting)")
+        return f"Model '{limiter.model}' is busy. Please try again shortly."
+    
+    
+    async def _cache_lookup(self, model: str, prompt: str, system: Optional[str], temperature: float,
+                            max_tokens: int, semantic: Optional[SemanticKey]):
         """
-        Internal method to generate text from Ollama.
+        Check the response cache for a generation call.
+        The lookup may read the SQLite tier, so it runs in the loop's executor.
+        
+        Returns:
+            (cache key or None if the call is not cacheable, cached response or None)
+        """
+        if not self.cache.is_cacheable(temperature):
+            self.cache.record_skip()
+            return None, None
+        
+        key = self.cache.make_key(model, system, prompt, temperature, {"num_predict": max_tokens})
+        cached = await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.cache.get, key, model=model, system=system, semantic=semantic)
+        )
+        if cached is not None:
+            logger.info(f"✓ Response cache hit for model '{model}'")
+        return key, cached
+    
+    
+    async def _cache_store(self, key: str, response: str, model: str, system: Optional[str],
+                           semantic: Optional[SemanticKey]):
+        """Store a generated response; the SQLite write runs in the loop's executor."""
+        await asyncio.get_running_loop().run_in_executor(
+            None, functools.partial(self.cache.put, key, response, model=model, system=system, semantic=semantic)
+        )
+    
+    
+    async def _generate_on_loop(self, model: str, prompt: str, system: Optional[str] = None,
+                                temperature: float = 0.7, max_tokens: int = 2000,
+                                semantic: Optional[SemanticKey] = None) -> str:
+        """
+        Generate text from Ollama. Must run on the service loop.
         
         Args:
             model: Model name (mixtral, qwen, etc.)
@@ -55,42 +233,42 @@ class OllamaService:
             system: Optional system prompt
             temperature: Sampling temperature (0.0 - 1.0)
             max_tokens: Maximum tokens to generate
+            semantic: Optional question-level key for near-duplicate cache hits
         
         Returns:
             Generated text response
         """
+        cache_key, cached = await self._cache_lookup(model, prompt, system, temperature, max_tokens, semantic)
+        if cached is not None:
+            return cached
+        
+        limiter = self._get_limiter(model)
+        if limiter.is_full():
+            return f"Error: {self._reject(limiter)}"
+        
         try:
-            payload = {
-                "model": model,
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": temperature,
-                    "num_predict": max_tokens
-                }
-            }
-            
-            if system:
-                payload["system"] = system
+            payload = self._build_payload(model, prompt, system, temperature, max_tokens, stream=False)
             
-            logger.info(f"Calling Ollama with model '{model}'...")
-            response = requests.post(
-                OLLAMA_GENERATE_URL,
-                json=payload,
-                timeout=300  # 5 minutes for complex queries
-            )
+            await limiter.acquire()
+            try:
+                logger.info(f"Calling Ollama with model '{model}'...")
+                response = await self._client.post("/api/generate", json=payload)
+            finally:
+                limiter.release()
             
             if response.status_code == 200:
                 result = response.json()
                 generated_text = result.get("response", "").strip()
                 logger.info(f"✓ Generated {len(generated_text)} characters")
+                if cache_key:
+                    await self._cache_store(cache_key, generated_text, model, system, semantic)
                 return generated_text
             else:
                 error_msg = f"Ollama returned status {response.status_code}"
                 logger.error(error_msg)
                 return f"Error: {error_msg}"
                 
-        except requests.exceptions.Timeout:
+        except httpx.TimeoutException:
             logger.error("Ollama request timed out")
             return "Error: Request timed out. The model may be processing a complex query."
         except Exception as e:
@@ -98,18 +276,139 @@ class OllamaService:
             return f"Error: {str(e)}"
     
     
-    def ask_mixtral(self, prompt: str, context: Optional[str] = None) -> str:
+    async def _generate_async(self, model: str, prompt: str, system: Optional[str] = None,
+                              temperature: float = 0.7, max_tokens: int = 2000,
+                              semantic: Optional[SemanticKey] = None) -> str:
         """
-        Ask Mixtral for deep reasoning and complex analysis.
-        Best for: detailed explanations, problem-solving, research.
+        Async entry point for generation, callable from any event loop.
+        """
+        return await self._on_loop(
+            self._generate_on_loop(model, prompt, system, temperature, max_tokens, semantic)
+        )
+    
+    
+    async def _stream_on_loop(self, model: str, prompt: str, system: Optional[str],
+                              temperature: float, max_tokens: int,
+                              emit: Callable[[Union[str, Exception, None]], None],
+                              semantic: Optional[SemanticKey] = None):
+        """
+        Stream tokens from Ollama's NDJSON response. Must run on the service loop.
         
         Args:
-            prompt: User question or task
-            context: Optional context from memory retrieval
+            emit: Called with each text fragment, an OllamaStreamError on failure,
+                  then with None when finished
+            semantic: Optional question-level key for near-duplicate cache hits
+        """
+        limiter = self._get_limiter(model)
+        try:
+            cache_key, cached = await self._cache_lookup(model, prompt, system, temperature, max_tokens, semantic)
+            if cached is not None:
+                emit(cached)
+                return
+            
+            if limiter.is_full():
+                emit(OllamaStreamError(self._reject(limiter)))
+                return
+            
+            payload = self._build_payload(model, prompt, system, temperature, max_tokens, stream=True)
+            
+            await limiter.acquire()
+            try:
+                logger.info(f"Streaming from Ollama with model '{model}'...")
+                async with self._client.stream("POST", "/api/generate", json=payload) as response:
+                    if response.status_code != 200:
+                        error_msg = f"Ollama returned status {response.status_code}"
+                        logger.error(error_msg)
+                        emit(OllamaStreamError(error_msg))
+                        return
+                    
+                    parts = []
+                    async for line in response.aiter_lines():
+                        if not line:
+                            continue
+                        chunk = json.loads(line)
+                        if chunk.get("error"):
+                            # Mid-stream failure (e.g. model unloaded or out of memory)
+                            raise OllamaStreamError(chunk["error"])
+                        if chunk.get("response"):
+                            parts.append(chunk["response"])
+                            emit(chunk["response"])
+                        if chunk.get("done"):
+                            if cache_key:
+                                await self._cache_store(cache_key, "".join(parts).strip(),
+                                                        model, system, semantic)
+                            break
+            finally:
+                limiter.release()
+                
+        except httpx.TimeoutException:
+            logger.error("Ollama stream timed out")
+            emit(OllamaStreamError("Request timed out. The model may be processing a complex query."))
+        except OllamaStreamError as e:
+            logger.error(f"Ollama stream failed: {e}")
+            emit(e)
+        except Exception as e:
+            logger.error(f"Failed to stream from Ollama: {e}")
+            emit(OllamaStreamError(str(e)))
+        finally:
+            emit(None)
+    
+    
+    async def _stream_async(self, model: str, prompt: str, system: Optional[str] = None,
+                            temperature: float = 0.7, max_tokens: int = 2000,
+                            semantic: Optional[SemanticKey] = None) -> AsyncIterator[str]:
+        """
+        Stream generated text fragments into the calling event loop.
+        Closing the iterator early cancels the upstream request.
+        
+        Raises:
+            OllamaStreamError: If generation fails before or during the stream
+        """
+        caller_loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        
+        def emit(fragment: Union[str, Exception, None]):
+            caller_loop.call_soon_threadsafe(queue.put_nowait, fragment)
+        
+        future = self._submit(
+            self._stream_on_loop(model, prompt, system, temperature, max_tokens, emit, semantic)
+        )
+        try:
+            while True:
+                fragment = await queue.get()
+                if fragment is None:
+                    break
+                if isinstance(fragment, Exception):
+                    raise fragment
+                yield fragment
+        finally:
+            if not future.done():
+                future.cancel()
+    
+    
+    def _generate(self, model: str, prompt: str, system: Optional[str] = None, 
+                  temperature: float = 0.7, max_tokens: int = 2000) -> str:
+        """
+        Internal method to generate text from Ollama (blocking wrapper).
+        
+        Args:
+            model: Model name (mixtral, qwen, etc.)
+            prompt: User prompt
+            system: Optional system prompt
+            temperature: Sampling temperature (0.0 - 1.0)
+            max_tokens: Maximum tokens to generate
         
         Returns:
-            Detailed, well-reasoned response
+            Generated text response
         """
+        return self._run_sync(
+            self._generate_on_loop(model, prompt, system, temperature, max_tokens)
+        )
+    
+    
+    @staticmethod
+    def _mixtral_request(prompt: str, context: Optional[str] = None) -> Dict[str, Any]:
+        """Build Mixtral generation arguments (system prompt + context framing)."""
         system_prompt = """You are a highly intelligent study assistant with deep expertise across all academic subjects.
 Your role is to provide thorough, accurate, and insightful explanations.
 Break down complex topics step-by-step.
@@ -127,16 +426,72 @@ Please provide a comprehensive, well-structured answer using the context above."
         else:
             full_prompt = prompt
         
-        return self._generate(
-            model=MIXTRAL_MODEL,
-            prompt=full_prompt,
-            system=system_prompt,
-            temperature=0.7,
-            max_tokens=2000
-        )
+        return {
+            "model": MIXTRAL_MODEL,
+            "prompt": full_prompt,
+            "system": system_prompt,
+            "temperature": 0.7,
+            "max_tokens": 2000
+        }
     
     
-    def ask_qwen(self, prompt: str, temperature: float = 0.3) -> str:
+    @staticmethod
+    def _qwen_request(prompt: str, temperature: float = 0.3) -> Dict[str, Any]:
+        """Build Qwen generation arguments."""
+        system_prompt = """You are a precise and efficient study assistant.
+Provide clear, concise, and well-formatted answers.
+When asked for structured data (like flashcards), return valid JSON.
+Focus on educational clarity and accuracy."""
+
+        return {
+            "model": QWEN_MODEL,
+            "prompt": prompt,
+            "system": system_prompt,
+            "temperature": temperature,
+            "max_tokens": 1500
+        }
+    
+    
+    async def ask_mixtral_async(self, prompt: str, context: Optional[str] = None,
+                                semantic: Optional[SemanticKey] = None) -> str:
+        """
+        Ask Mixtral for deep reasoning and complex analysis.
+        Best for: detailed explanations, problem-solving, research.
+        
+        Args:
+            prompt: User question or task
+            context: Optional context from memory retrieval
+            semantic: Optional question-level cache key
+        
+        Returns:
+            Detailed, well-reasoned response
+        """
+        return await self._generate_async(**self._mixtral_request(prompt, context), semantic=semantic)
+    
+    
+    def ask_mixtral(self, prompt: str, context: Optional[str] = None) -> str:
+        """Blocking wrapper for ask_mixtral_async."""
+        return self._run_sync(self.ask_mixtral_async(prompt, context))
+    
+    
+    async def ask_mixtral_stream(self, prompt: str, context: Optional[str] = None,
+                                 semantic: Optional[SemanticKey] = None) -> AsyncIterator[str]:
+        """
+        Stream a Mixtral answer token by token.
+        
+        Args:
+            prompt: User question or task
+            context: Optional context from memory retrieval
+            semantic: Optional question-level cache key
+        
+        Yields:
+            Generated text fragments as they arrive
+        """
+        async for fragment in self._stream_async(**self._mixtral_request(prompt, context), semantic=semantic):
+            yield fragment
+    
+    
+    async def ask_qwen_async(self, prompt: str, temperature: float = 0.3) -> str:
         """
         Ask Qwen for clean, structured explanations.
         Best for: flashcards, summaries, concise answers, JSON generation.
@@ -148,21 +503,30 @@ Please provide a comprehensive, well-structured answer using the context above."
         Returns:
             Clean, structured response
         """
-        system_prompt = """You are a precise and efficient study assistant.
-Provide clear, concise, and well-formatted answers.
-When asked for structured data (like flashcards), return valid JSON.
-Focus on educational clarity and accuracy."""
-
-        return self._generate(
-            model=QWEN_MODEL,
-            prompt=prompt,
-            system=system_prompt,
-            temperature=temperature,
-            max_tokens=1500
-        )
+        return await self._generate_async(**self._qwen_request(prompt, temperature))
     
     
-    def generate_flashcards(self, content: str, num_cards: int = 5) -> str:
+    def ask_qwen(self, prompt: str, temperature: float = 0.3) -> str:
+        """Blocking wrapper for ask_qwen_async."""
+        return self._run_sync(self.ask_qwen_async(prompt, temperature))
+    
+    
+    async def ask_qwen_stream(self, prompt: str, temperature: float = 0.3) -> AsyncIterator[str]:
+        """
+        Stream a Qwen answer token by token.
+        
+        Args:
+            prompt: User question or task
+            temperature: Lower = more deterministic (default: 0.3)
+        
+        Yields:
+            Generated text fragments as they arrive
+        """
+        async for fragment in self._stream_async(**self._qwen_request(prompt, temperature)):
+            yield fragment
+    
+    
+    async def generate_flashcards_async(self, content: str, num_cards: int = 5) -> str:
         """
         Generate flashcards in JSON format using Qwen.
         
@@ -187,7 +551,7 @@ Return ONLY a valid JSON array in this exact format:
 Make questions clear and answers comprehensive but concise.
 Focus on key concepts and important details."""
 
-        response = self.ask_qwen(prompt, temperature=0.3)
+        response = await self.ask_qwen_async(prompt, temperature=0.3)
         
         # Try to extract JSON if wrapped in markdown
         if "```json" in response:
@@ -198,7 +562,12 @@ Focus on key concepts and important details."""
         return response
     
     
-    def generate_study_plan(self, subject: str, days: int, current_knowledge: str = "") -> str:
+    def generate_flashcards(self, content: str, num_cards: int = 5) -> str:
+        """Blocking wrapper for generate_flashcards_async."""
+        return self._run_sync(self.generate_flashcards_async(content, num_cards))
+    
+    
+    async def generate_study_plan_async(self, subject: str, days: int, current_knowledge: str = "") -> str:
         """
         Generate a day-by-day study plan using Mixtral.
         
@@ -222,10 +591,15 @@ Provide a day-by-day breakdown with:
 
 Make it realistic and effective for mastery."""
 
-        return self.ask_mixtral(prompt)
+        return await self.ask_mixtral_async(prompt)
     
     
-    def summarize_text(self, text: str) -> str:
+    def generate_study_plan(self, subject: str, days: int, current_knowledge: str = "") -> str:
+        """Blocking wrapper for generate_study_plan_async."""
+        return self._run_sync(self.generate_study_plan_async(subject, days, current_knowledge))
+    
+    
+    async def summarize_text_async(self, text: str) -> str:
         """
         Generate concise summary using Qwen.
         
@@ -241,7 +615,31 @@ Make it realistic and effective for mastery."""
 
 Provide a clear, well-organized summary."""
 
-        return self.ask_qwen(prompt, temperature=0.3)
+        return await self.ask_qwen_async(prompt, temperature=0.3)
+    
+    
+    def summarize_text(self, text: str) -> str:
+        """Blocking wrapper for summarize_text_async."""
+        return self._run_sync(self.summarize_text_async(text))
+    
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get per-model concurrency statistics.
+        
+        Returns:
+            Dictionary of model name to in-flight/waiting/rejected counts
+        """
+        return {model: limiter.stats() for model, limiter in list(self._limiters.items())}
+    
+    
+    def close(self):
+        """Close the connection pool and stop the service loop."""
+        if self._client is not None:
+            self._run_sync(self._client.aclose())
+            self._client = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=5)
 
 
 # Global instance
@@ -255,3 +653,13 @@ def get_ollama_service() -> OllamaService:
     if ollama_service is None:
         ollama_service = OllamaService()
     return ollama_service
+
+
+def shutdown_ollama_service():
+    """
+    Close the singleton OllamaService if it was created.
+    """
+    global ollama_service
+    if ollama_service is not None:
+        ollama_service.close()
+        ollama_service = None
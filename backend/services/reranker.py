@@ -0,0 +1,151 @@
+"""
+Reranker - Cross-encoder re-scoring of retrieved chunks
+Re-scores over-fetched search candidates with a small CPU cross-encoder,
+batch by batch, until a latency budget runs out
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Re-ranking configuration (override with environment variables)
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"       # default for requests that do not choose
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "20"))  # chunks fetched for re-ranking
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "8"))
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "150"))
+RERANK_MAX_LENGTH = 256      # tokens per (query, chunk) pair
+
+
+class Reranker:
+    """
+    Cross-encoder that scores (query, chunk) pairs.
+    Scores are sigmoid probabilities, so a 0.5 relevance threshold means
+    "more likely relevant than not" instead of a raw cosine cut-off.
+    """
+
+    def __init__(self, model_name: str = RERANK_MODEL):
+        """
+        Args:
+            model_name: sentence-transformers CrossEncoder model
+        """
+        import torch
+        from sentence_transformers import CrossEncoder
+        logger.info(f"Loading cross-encoder '{model_name}'...")
+        self.model = CrossEncoder(model_name, max_length=RERANK_MAX_LENGTH, device="cpu")
+        self._activation = torch.nn.Sigmoid()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.scored = 0
+        self.skipped = 0
+        self.budget_exhausted = 0
+        self.total_ms = 0.0
+        logger.info(f"✓ Cross-encoder '{model_name}' loaded")
+
+
+    def rerank(self, query: str, candidates: List[Dict[str, Any]], top_k: int,
+               budget_ms: float = RERANK_BUDGET_MS) -> List[Dict[str, Any]]:
+        """
+        Re-score candidates in retrieval order until the budget runs out.
+
+        The first batch is always scored; later batches only start if the
+        previous batch's duration still fits in the remaining budget.
+        Scored candidates come first, best first, with "score" replaced by
+        the cross-encoder probability (the original is kept as
+        "retrieval_score"); unscored ones follow in retrieval order.
+
+        Args:
+            query: Search query
+            candidates: Search results ({"text", "score", ...}) in retrieval order
+            top_k: Number of results to return
+            budget_ms: Latency budget for scoring
+
+        Returns:
+            Top top_k candidates after re-ranking
+        """
+        start = time.perf_counter()
+        deadline = start + budget_ms / 1000
+        scored: List[Dict[str, Any]] = []
+        batch_seconds = 0.0
+
+        for offset in range(0, len(candidates), RERANK_BATCH_SIZE):
+            now = time.perf_counter()
+            if scored and now + batch_seconds > deadline:
+                break
+            batch = candidates[offset:offset + RERANK_BATCH_SIZE]
+            probabilities = self.model.predict(
+                [(query, candidate.get("text", "")) for candidate in batch],
+                batch_size=len(batch),
+                activation_fct=self._activation,
+                show_progress_bar=False
+            )
+            batch_seconds = time.perf_counter() - now
+            scored.extend(
+                {**candidate, "score": float(probability), "retrieval_score": candidate.get("score"), "reranked": True}
+                for candidate, probability in zip(batch, probabilities)
+            )
+
+        scored.sort(key=lambda candidate: candidate["score"], reverse=True)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self.calls += 1
+            self.scored += len(scored)
+            self.skipped += len(candidates) - len(scored)
+            self.budget_exhausted += len(scored) < len(candidates)
+            self.total_ms += elapsed_ms
+
+        logger.info(f"✓ Re-ranked {len(scored)}/{len(candidates)} candidates in {elapsed_ms:.0f} ms")
+        return (scored + candidates[len(scored):])[:top_k]
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get re-ranking counters and average latency.
+        """
+        with self._lock:
+            return {
+                "model": RERANK_MODEL,
+                "calls": self.calls,
+                "scored": self.scored,
+                "skipped": self.skipped,
+                "budget_exhausted": self.budget_exhausted,
+                "avg_ms": round(self.total_ms / self.calls, 1) if self.calls else 0.0,
+                "budget_ms": RERANK_BUDGET_MS
+            }
+
+
+# Global instance
+reranker = None
+_reranker_failed = False
+
+def get_reranker() -> Optional[Reranker]:
+    """
+    Get or create singleton Reranker instance.
+    Returns None when the model cannot be loaded.
+    """
+    global reranker, _reranker_failed
+    if reranker is None and not _reranker_failed:
+        try:
+            reranker = Reranker()
+        except Exception as e:
+            _reranker_failed = True
+            logger.warning(f"⚠ Cross-encoder unavailable, using retrieval order: {e}")
+            return None
+    return reranker
+
+
+def rerank_candidates(query: str, candidates: List[Dict[str, Any]], top_k: int) -> List[Dict[str, Any]]:
+    """
+    Re-rank search results (retrieval order when the cross-encoder is unavailable).
+    Blocking: run on the encoder pool.
+    """
+    model = get_reranker()
+    if model is None or not candidates:
+        return candidates[:top_k]
+    return model.rerank(query, candidates, top_k)
@@ -0,0 +1,369 @@
+"""
+Response Cache - LLM answer caching
+Exact (model, system, prompt, temperature, options) cache with an LRU/TTL
+memory tier and a SQLite disk tier, plus an optional semantic tier that
+matches near-identical questions asked against the same retrieved chunks
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cache configuration (override with environment variables)
+CACHE_DIR = os.getenv("STUDYPAL_CACHE_DIR", "/tmp/studypal_cache")
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1024"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+# Sampled outputs (chat/explain at 0.7, creative cards at 0.4-0.5) vary per call
+# and are not replayed; only near-greedy calls at or below this are cached
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.2"))
+LLM_CACHE_SEMANTIC_THRESHOLD = float(os.getenv("LLM_CACHE_SEMANTIC_THRESHOLD", "0.95"))
+LLM_CACHE_DB_PATH = os.getenv("LLM_CACHE_DB_PATH", os.path.join(CACHE_DIR, "llm_responses.sqlite3"))
+LLM_CACHE_DISK_MAX_ENTRIES = int(os.getenv("LLM_CACHE_DISK_MAX_ENTRIES", "20000"))
+LLM_CACHE_PRUNE_EVERY = int(os.getenv("LLM_CACHE_PRUNE_EVERY", "100"))  # disk writes between prunes
+
+
+@dataclass
+class SemanticKey:
+    """
+    Question-level cache key for near-duplicate matching.
+
+    A semantic hit requires the same model and system prompt, the same set of
+    retrieved chunk IDs, and a question embedding within the similarity threshold.
+    """
+    question_embedding: Sequence[float]
+    chunk_ids: Sequence[Any] = ()
+
+
+class ResponseCache:
+    """
+    Two-tier cache for generated LLM responses.
+
+    Semantic vectors are only kept for keys in the memory tier and are
+    dropped when the entry is evicted (LRU or TTL). The disk tier is pruned
+    of expired rows and capped at disk_max_entries every prune_every writes.
+    """
+
+    def __init__(self, db_path: Optional[str] = LLM_CACHE_DB_PATH,
+                 max_entries: int = LLM_CACHE_MAX_ENTRIES,
+                 ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+                 max_temperature: float = LLM_CACHE_MAX_TEMPERATURE,
+                 semantic_threshold: float = LLM_CACHE_SEMANTIC_THRESHOLD,
+                 disk_max_entries: int = LLM_CACHE_DISK_MAX_ENTRIES,
+                 prune_every: int = LLM_CACHE_PRUNE_EVERY):
+        """
+        Args:
+            db_path: SQLite file for the disk tier (None disables it)
+            max_entries: Maximum entries kept in memory (LRU eviction)
+            ttl_seconds: Entry lifetime in both tiers
+            max_temperature: Calls above this temperature are never cached
+            semantic_threshold: Minimum cosine similarity for a semantic hit
+            disk_max_entries: Maximum rows kept in the disk tier (oldest pruned first)
+            prune_every: Disk writes between prunes of expired and excess rows
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_temperature = max_temperature
+        self.semantic_threshold = semantic_threshold
+        self.disk_max_entries = disk_max_entries
+        self.prune_every = max(1, prune_every)
+
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        # scope -> list of (normalized question embedding, exact key)
+        self._semantic: Dict[str, List[Tuple[np.ndarray, str]]] = {}
+        # exact key -> semantic scope, so evicting an entry drops its vector
+        self._semantic_scopes: Dict[str, str] = {}
+        self._writes_since_prune = 0
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "semantic_hits": 0,
+            "misses": 0,
+            "skipped": 0,
+            "stores": 0,
+            "evictions": 0,
+            "disk_pruned": 0
+        }
+
+        self._db = None
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(db_path), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False)
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS responses ("
+                    "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.execute(
+                    "CREATE INDEX IF NOT EXISTS idx_responses_created_at ON responses (created_at)"
+                )
+                self._db.commit()
+                self._prune_disk()
+                logger.info(f"✓ LLM response cache on disk at {db_path}")
+            except Exception as e:
+                logger.warning(f"⚠ LLM response disk cache unavailable: {e}")
+                self._db = None
+
+
+    @staticmethod
+    def make_key(model: str, system: Optional[str], prompt: str,
+                 temperature: float, options: Dict[str, Any]) -> str:
+        """Exact cache key for a generation call."""
+        raw = json.dumps([model, system or "", prompt, temperature, options], sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+    @staticmethod
+    def _scope(model: str, system: Optional[str], chunk_ids: Sequence[Any]) -> str:
+        """Semantic scope: model, system prompt and retrieved chunk set."""
+        raw = json.dumps([model, system or "", sorted(str(c) for c in chunk_ids)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+    def is_cacheable(self, temperature: float) -> bool:
+        """Whether a call at this temperature may be cached."""
+        return LLM_CACHE_ENABLED and temperature <= self.max_temperature
+
+
+    def get(self, key: str, model: str = "", system: Optional[str] = None,
+            semantic: Optional[SemanticKey] = None) -> Optional[str]:
+        """
+        Look up a cached response.
+
+        Args:
+            key: Exact key from make_key
+            model, system: Needed for semantic matching
+            semantic: Optional question-level key
+
+        Returns:
+            Cached response text or None
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                response, created_at = entry
+                if now - created_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    self._counters["memory_hits"] += 1
+                    return response
+                self._forget(key)
+
+        response = self._disk_get(key, now)
+        if response is not None:
+            with self._lock:
+                self._counters["disk_hits"] += 1
+                self._remember(key, response, now)
+            return response
+
+        if semantic is not None:
+            response = self._semantic_get(model, system, semantic, now)
+            if response is not None:
+                with self._lock:
+                    self._counters["semantic_hits"] += 1
+                return response
+
+        with self._lock:
+            self._counters["misses"] += 1
+        return None
+
+
+    def put(self, key: str, response: str, model: str = "", system: Optional[str] = None,
+            semantic: Optional[SemanticKey] = None):
+        """
+        Store a generated response. Error responses are never cached.
+        """
+        if not response or response.startswith("Error:"):
+            return
+
+        now = time.time()
+        with self._lock:
+            self._remember(key, response, now)
+            self._counters["stores"] += 1
+            if semantic is not None and key in self._entries:
+                vector = self._normalize(semantic.question_embedding)
+                if vector is not None:
+                    self._drop_semantic(key)
+                    scope = self._scope(model, system, semantic.chunk_ids)
+                    self._semantic.setdefault(scope, []).append((vector, key))
+                    self._semantic_scopes[key] = scope
+
+        if self._db is not None:
+            try:
+                with self._lock:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO responses (key, response, created_at) VALUES (?, ?, ?)",
+                        (key, response, now)
+                    )
+                    self._db.commit()
+                    self._writes_since_prune += 1
+                    if self._writes_since_prune >= self.prune_every:
+                        self._prune_disk(now)
+            except Exception as e:
+                logger.warning(f"Failed to write LLM response cache: {e}")
+
+
+    def record_skip(self):
+        """Count a call that bypassed the cache (e.g. high temperature)."""
+        with self._lock:
+            self._counters["skipped"] += 1
+
+
+    def _remember(self, key: str, response: str, created_at: float):
+        """Insert into the memory tier and evict LRU entries. Caller holds the lock."""
+        self._entries[key] = (response, created_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+            self._counters["evictions"] += 1
+
+
+    def _forget(self, key: str):
+        """Drop an entry from the memory tier with its semantic vector. Caller holds the lock."""
+        self._entries.pop(key, None)
+        self._drop_semantic(key)
+
+
+    def _drop_semantic(self, key: str):
+        """Remove a key's semantic vector, deleting its bucket once empty. Caller holds the lock."""
+        scope = self._semantic_scopes.pop(key, None)
+        if scope is None:
+            return
+        bucket = [item for item in self._semantic.get(scope, []) if item[1] != key]
+        if bucket:
+            self._semantic[scope] = bucket
+        else:
+            self._semantic.pop(scope, None)
+
+
+    def _prune_disk(self, now: Optional[float] = None):
+        """Delete expired rows and the oldest rows beyond disk_max_entries. Caller holds the lock."""
+        now = time.time() if now is None else now
+        self._writes_since_prune = 0
+        try:
+            expired = self._db.execute(
+                "DELETE FROM responses WHERE created_at < ?", (now - self.ttl_seconds,)
+            ).rowcount
+            excess = self._db.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (self.disk_max_entries,)
+            ).rowcount
+            self._db.commit()
+            self._counters["disk_pruned"] += expired + excess
+        except Exception as e:
+            logger.warning(f"Failed to prune LLM response cache: {e}")
+
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        """Read from the disk tier, dropping expired rows."""
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                if now - row[1] > self.ttl_seconds:
+                    self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._db.commit()
+                    return None
+                return row[0]
+        except Exception as e:
+            logger.warning(f"Failed to read LLM response cache: {e}")
+            return None
+
+
+    def _semantic_get(self, model: str, system: Optional[str],
+                      semantic: SemanticKey, now: float) -> Optional[str]:
+        """Find a cached answer for a near-identical question over the same chunks."""
+        query = self._normalize(semantic.question_embedding)
+        if query is None:
+            return None
+
+        with self._lock:
+            bucket = self._semantic.get(self._scope(model, system, semantic.chunk_ids))
+            if not bucket:
+                return None
+            matrix = np.stack([vector for vector, _ in bucket])
+            scores = matrix @ query
+            best = int(np.argmax(scores))
+            if scores[best] < self.semantic_threshold:
+                return None
+            key = bucket[best][1]
+            entry = self._entries.get(key)
+            if entry is None or now - entry[1] > self.ttl_seconds:
+                self._forget(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+
+    @staticmethod
+    def _normalize(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """Unit-normalize an embedding as float32."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Hit/miss counters, hit rate and tier sizes
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            hits = counters["memory_hits"] + counters["disk_hits"] + counters["semantic_hits"]
+            lookups = hits + counters["misses"]
+            counters.update({
+                "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._entries),
+                "semantic_entries": len(self._semantic_scopes),
+                "disk_enabled": self._db is not None
+            })
+            return counters
+
+
+    def clear(self):
+        """Drop all cached responses from both tiers."""
+        with self._lock:
+            self._entries.clear()
+            self._semantic.clear()
+            self._semantic_scopes.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+
+# Global instance
+response_cache = None
+
+def get_response_cache() -> ResponseCache:
+    """
+    Get or create singleton ResponseCache instance.
+    """
+    global response_cache
+    if response_cache is None:
+        response_cache = ResponseCache()
+    return response_cache
@@ -0,0 +1,364 @@
+"""
+Sparse Index - Local BM25 keyword search
+Compact SQLite inverted index over stored chunks, kept in sync with Qdrant
+upserts so exact terms (course codes, formula names, acronyms) can be
+matched alongside dense search. One index file per vector backend and
+collection, so it only ever holds points of the store it mirrors
+"""
+
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from array import array
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Index configuration (override with environment variables)
+CACHE_DIR = os.getenv("STUDYPAL_CACHE_DIR", "/tmp/studypal_cache")
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", os.path.join(CACHE_DIR, "sparse_index"))
+SPARSE_INDEX_ENABLED = os.getenv("HYBRID_SEARCH", "1") == "1"
+
+# BM25 scoring
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_QUERY_TERMS = 32
+MAX_DF_RATIO = 0.5      # terms in more than this share of a tenant's chunks carry ~no weight; skipped
+SQL_BATCH = 500         # bound parameters per IN (...) lookup
+
+# Metadata columns usable as filters
+DOC_FIELDS = ("course", "topic", "source")
+TENANT_FIELD = "user_id"
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._+-][a-z0-9]+)*")
+SPLIT_PATTERN = re.compile(r"[._+-]")
+STOPWORDS = frozenset(
+    "a an and are as at be by can do does for from has have how in is it its of on or "
+    "that the this to was were what when where which who why will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lowercase keyword tokens. Compound tokens such as "navier-stokes" or
+    "cs-101" are kept whole and also split into their parts.
+    """
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if SPLIT_PATTERN.search(token):
+            tokens.extend(part for part in SPLIT_PATTERN.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+
+def doc_field(value: Any) -> Optional[str]:
+    """Filterable metadata value as stored in docs (non-string values as text)."""
+    return value if value is None or isinstance(value, str) else str(value)
+
+
+class SparseIndex:
+    """
+    BM25 inverted index partitioned by tenant.
+
+    Terms, chunks and tenants are stored as integer IDs; postings are a
+    WITHOUT ROWID table keyed (tenant, term, doc), so a query reads only the
+    posting lists of its own terms within one tenant.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Args:
+            db_path: SQLite database file
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(
+            "CREATE TABLE IF NOT EXISTS tenants ("
+            "id INTEGER PRIMARY KEY, name TEXT UNIQUE NOT NULL, "
+            "docs INTEGER NOT NULL DEFAULT 0, total_length INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, term TEXT UNIQUE NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS docs ("
+            "id INTEGER PRIMARY KEY, point_id TEXT UNIQUE NOT NULL, tenant INTEGER NOT NULL, "
+            "length INTEGER NOT NULL, terms BLOB NOT NULL, course TEXT, topic TEXT, source TEXT);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "tenant INTEGER NOT NULL, term INTEGER NOT NULL, doc INTEGER NOT NULL, tf INTEGER NOT NULL, "
+            "PRIMARY KEY (tenant, term, doc)) WITHOUT ROWID;"
+            "CREATE TABLE IF NOT EXISTS term_df ("
+            "tenant INTEGER NOT NULL, term INTEGER NOT NULL, df INTEGER NOT NULL, "
+            "PRIMARY KEY (tenant, term)) WITHOUT ROWID;"
+        )
+        self._db.commit()
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self.queries = 0
+        logger.info(f"✓ Sparse index at {db_path}")
+
+
+    def _ids(self, table: str, column: str, values: List[str], create: bool) -> Dict[str, int]:
+        """Map names to integer IDs in a lookup table, optionally inserting new ones."""
+        ids: Dict[str, int] = {}
+        for start in range(0, len(values), SQL_BATCH):
+            batch = values[start:start + SQL_BATCH]
+            if create:
+                self._db.executemany(
+                    f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", [(v,) for v in batch]
+                )
+            placeholders = ",".join("?" * len(batch))
+            ids.update(self._db.execute(
+                f"SELECT {column}, id FROM {table} WHERE {column} IN ({placeholders})", batch
+            ).fetchall())
+        return ids
+
+
+    def add(self, chunks: Iterable[Tuple[str, str, Dict[str, Any]]]) -> int:
+        """
+        Index chunks. Point IDs already indexed are skipped (IDs are content-derived).
+
+        Args:
+            chunks: (point_id, text, metadata) tuples
+
+        Returns:
+            Number of newly indexed chunks
+        """
+        chunks = list(chunks)
+        if not chunks:
+            return 0
+
+        with self._lock:
+            point_ids = [point_id for point_id, _, _ in chunks]
+            existing = set()
+            for start in range(0, len(point_ids), SQL_BATCH):
+                batch = point_ids[start:start + SQL_BATCH]
+                existing.update(row[0] for row in self._db.execute(
+                    f"SELECT point_id FROM docs WHERE point_id IN ({','.join('?' * len(batch))})", batch
+                ))
+
+            new_chunks = []
+            for point_id, text, metadata in chunks:
+                if point_id in existing:
+                    continue
+                existing.add(point_id)
+                new_chunks.append((point_id, Counter(tokenize(text)), metadata or {}))
+            if not new_chunks:
+                return 0
+
+            term_ids = self._ids("terms", "term", list({t for _, counts, _ in new_chunks for t in counts}), True)
+            tenant_ids = self._ids(
+                "tenants", "name", list({str(m.get(TENANT_FIELD) or "") for _, _, m in new_chunks}), True
+            )
+
+            for point_id, counts, metadata in new_chunks:
+                tenant = tenant_ids[str(metadata.get(TENANT_FIELD) or "")]
+                length = sum(counts.values())
+                terms = [term_ids[t] for t in counts]
+                doc = self._db.execute(
+                    "INSERT INTO docs (point_id, tenant, length, terms, course, topic, source) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (point_id, tenant, length, array("I", terms).tobytes(),
+                     *(doc_field(metadata.get(field)) for field in DOC_FIELDS))
+                ).lastrowid
+                self._db.executemany(
+                    "INSERT INTO postings (tenant, term, doc, tf) VALUES (?, ?, ?, ?)",
+                    [(tenant, term_ids[t], doc, tf) for t, tf in counts.items()]
+                )
+                self._db.executemany(
+                    "INSERT INTO term_df (tenant, term, df) VALUES (?, ?, 1) "
+                    "ON CONFLICT (tenant, term) DO UPDATE SET df = df + 1",
+                    [(tenant, term) for term in terms]
+                )
+                self._db.execute(
+                    "UPDATE tenants SET docs = docs + 1, total_length = total_length + ? WHERE id = ?",
+                    (length, tenant)
+                )
+            self._db.commit()
+            return len(new_chunks)
+
+
+    def remove(self, point_ids: List[str]) -> int:
+        """
+        Remove chunks from the index.
+
+        Returns:
+            Number of chunks removed
+        """
+        removed = 0
+        with self._lock:
+            for point_id in point_ids:
+                row = self._db.execute(
+                    "SELECT id, tenant, length, terms FROM docs WHERE point_id = ?", (str(point_id),)
+                ).fetchone()
+                if row is None:
+                    continue
+                doc, tenant, length, blob = row
+                terms = array("I")
+                terms.frombytes(blob)
+                self._db.executemany(
+                    "DELETE FROM postings WHERE tenant = ? AND term = ? AND doc = ?",
+                    [(tenant, term, doc) for term in terms]
+                )
+                self._db.executemany(
+                    "UPDATE term_df SET df = df - 1 WHERE tenant = ? AND term = ?",
+                    [(tenant, term) for term in terms]
+                )
+                self._db.execute("DELETE FROM docs WHERE id = ?", (doc,))
+                self._db.execute(
+                    "UPDATE tenants SET docs = docs - 1, total_length = total_length - ? WHERE id = ?",
+                    (length, tenant)
+                )
+                removed += 1
+            self._db.execute("DELETE FROM term_df WHERE df <= 0")
+            self._db.commit()
+        return removed
+
+
+    def search(self, query: str, tenant: str, filters: Optional[Dict[str, Any]] = None,
+               limit: int = 20) -> List[Tuple[str, float]]:
+        """
+        BM25 search within one tenant.
+
+        Args:
+            query: Query text
+            tenant: Tenant whose chunks are searched
+            filters: {field: value or list of values} over DOC_FIELDS
+            limit: Maximum results
+
+        Returns:
+            [(point_id, bm25 score)] best first
+        """
+        return self.search_many([query], tenant, filters, limit)[0]
+
+
+    def search_many(self, queries: List[str], tenant: str, filters: Optional[Dict[str, Any]] = None,
+                    limit: int = 20) -> List[List[Tuple[str, float]]]:
+        """
+        BM25 search for several queries within one tenant, under a single
+        lock acquisition (tenant statistics and the filter are read once).
+
+        Returns:
+            One [(point_id, bm25 score)] list per query, best first
+        """
+        conditions, params = [], []
+        for field, value in (filters or {}).items():
+            if value is None or value == []:
+                continue
+            if field not in DOC_FIELDS:
+                raise ValueError(f"Cannot filter on '{field}'")
+            if isinstance(value, (list, tuple, set)):
+                conditions.append(f"d.{field} IN ({','.join('?' * len(value))})")
+                params.extend(value)
+            else:
+                conditions.append(f"d.{field} = ?")
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        query_terms = [list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS] for query in queries]
+        if not any(query_terms):
+            return [[] for _ in queries]
+
+        with self._lock:
+            self.queries += sum(1 for terms in query_terms if terms)
+            row = self._db.execute(
+                "SELECT id, docs, total_length FROM tenants WHERE name = ?", (tenant,)
+            ).fetchone()
+            if row is None or row[1] <= 0:
+                return [[] for _ in queries]
+            tenant_id, n_docs, total_length = row
+            avgdl = total_length / n_docs
+            return [
+                self._rank(terms, tenant_id, n_docs, avgdl, where, params, limit) if terms else []
+                for terms in query_terms
+            ]
+
+
+    def _rank(self, terms: List[str], tenant_id: int, n_docs: int, avgdl: float,
+              where: str, params: List[Any], limit: int) -> List[Tuple[str, float]]:
+        """Score one query's terms against a tenant's postings (caller holds the lock)."""
+        placeholders = ",".join("?" * len(terms))
+        stats = self._db.execute(
+            f"SELECT t.id, d.df FROM terms t JOIN term_df d ON d.tenant = ? AND d.term = t.id "
+            f"WHERE t.term IN ({placeholders})",
+            (tenant_id, *terms)
+        ).fetchall()
+        weights = [
+            (term, math.log(1 + (n_docs - df + 0.5) / (df + 0.5)))
+            for term, df in stats
+            if df <= max(1, n_docs * MAX_DF_RATIO)
+        ]
+        if not weights:
+            return []
+
+        values = ",".join("(?, ?)" for _ in weights)
+        rows = self._db.execute(
+            f"WITH q(term, idf) AS (VALUES {values}) "
+            f"SELECT d.point_id, SUM(q.idf * p.tf * ? / (p.tf + ? * (1 - ? + ? * d.length / ?))) AS score "
+            f"FROM q JOIN postings p ON p.tenant = ? AND p.term = q.term "
+            f"JOIN docs d ON d.id = p.doc {where} "
+            f"GROUP BY p.doc ORDER BY score DESC LIMIT ?",
+            (*[v for pair in weights for v in pair],
+             BM25_K1 + 1, BM25_K1, BM25_B, BM25_B, avgdl,
+             tenant_id, *params, limit)
+        ).fetchall()
+        return [(point_id, score) for point_id, score in rows]
+
+
+    def count(self) -> int:
+        """Number of indexed chunks."""
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get index statistics.
+
+        Returns:
+            Indexed chunk, term and tenant counts, file size and query counter
+        """
+        with self._lock:
+            docs = self._db.execute("SELECT COUNT(*) FROM docs").fetchone()[0]
+            terms = self._db.execute("SELECT COUNT(*) FROM terms").fetchone()[0]
+            tenants = self._db.execute("SELECT COUNT(*) FROM tenants WHERE docs > 0").fetchone()[0]
+        return {
+            "indexed_chunks": docs,
+            "vocabulary": terms,
+            "tenants": tenants,
+            "size_bytes": os.path.getsize(self._db_path) if os.path.exists(self._db_path) else 0,
+            "queries": self.queries
+        }
+
+
+def sparse_index_path(collection_name: str, backend: str) -> str:
+    """Index file for one vector backend ("qdrant" or "local") and collection."""
+    return os.path.join(SPARSE_INDEX_DIR, f"{backend}-{collection_name}.sqlite3")
+
+
+# Global instances (one per backend and collection)
+sparse_indexes: Dict[Tuple[str, str], SparseIndex] = {}
+_sparse_indexes_lock = threading.Lock()
+
+def get_sparse_index(collection_name: str, backend: str) -> Optional[SparseIndex]:
+    """
+    Get or create the SparseIndex for a backend and collection.
+    Returns None when hybrid search is disabled or the index cannot be opened.
+    """
+    if not SPARSE_INDEX_ENABLED:
+        return None
+    key = (backend, collection_name)
+    with _sparse_indexes_lock:
+        if key not in sparse_indexes:
+            try:
+                sparse_indexes[key] = SparseIndex(sparse_index_path(collection_name, backend))
+            except Exception as e:
+                logger.warning(f"⚠ Sparse index unavailable, using dense search only: {e}")
+                return None
+        return sparse_indexes[key]
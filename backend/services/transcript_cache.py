@@ -0,0 +1,211 @@
+"""
+Transcript Cache - Persistent transcription results
+Maps hash(audio bytes) + Whisper model + inference backend + VAD settings +
+language to the transcript, segments and chunks so re-uploaded recordings
+skip transcription
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from services.vad import vad_key
+from services.whisper_backends import backend_key, OPENAI_BACKEND
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Cache configuration (override with environment variables)
+CACHE_DIR = os.getenv("STUDYPAL_CACHE_DIR", "/tmp/studypal_cache")
+TRANSCRIPT_CACHE_PATH = os.getenv("TRANSCRIPT_CACHE_PATH", os.path.join(CACHE_DIR, "transcripts.sqlite3"))
+TRANSCRIPT_CACHE_ENABLED = os.getenv("TRANSCRIPT_CACHE_ENABLED", "1") == "1"
+
+# Backend (and compute type) and VAD settings of transcripts made by this process
+TRANSCRIPT_BACKEND = backend_key()
+TRANSCRIPT_VAD = vad_key()
+# Rows cached before VAD was part of the key; their setting is unknown, so they never match
+UNKNOWN_VAD = "unknown"
+
+
+class TranscriptCache:
+    """
+    SQLite-backed cache of transcription results keyed by
+    (audio hash, model, backend, VAD settings, language), so switching
+    WHISPER_BACKEND, WHISPER_COMPUTE_TYPE or the VAD never serves a transcript
+    made with other numerics or other silence skipping.
+    """
+
+    def __init__(self, db_path: str = TRANSCRIPT_CACHE_PATH):
+        """
+        Args:
+            db_path: SQLite database file
+        """
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._create_table()
+        self._db.commit()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        logger.info(f"✓ Transcript cache at {db_path}")
+
+
+    def _create_table(self):
+        """Create the transcripts table, migrating rows from before the backend or VAD was part of the key."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(transcripts)")}
+        migrate = bool(columns) and not {"backend", "vad"} <= columns
+        if migrate:
+            self._db.execute("ALTER TABLE transcripts RENAME TO transcripts_unkeyed")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "audio_hash TEXT NOT NULL, model TEXT NOT NULL, backend TEXT NOT NULL, vad TEXT NOT NULL, "
+            "language TEXT NOT NULL, transcript TEXT NOT NULL, segments TEXT NOT NULL, chunks TEXT NOT NULL, "
+            "created_at REAL NOT NULL, PRIMARY KEY (audio_hash, model, backend, vad, language))"
+        )
+        if migrate:
+            # Only the FP32 openai-whisper backend existed before the backend was keyed
+            backend = "backend" if "backend" in columns else "?"
+            migrated = self._db.execute(
+                f"INSERT INTO transcripts "
+                f"SELECT audio_hash, model, {backend}, ?, language, transcript, segments, chunks, created_at "
+                f"FROM transcripts_unkeyed",
+                (OPENAI_BACKEND,) * (backend == "?") + (UNKNOWN_VAD,)
+            ).rowcount
+            self._db.execute("DROP TABLE transcripts_unkeyed")
+            logger.info(f"✓ Transcript cache: {migrated} transcripts migrated (VAD setting unknown, not served)")
+
+
+    def get(self, audio_hash: str, model: str, language: str,
+            backend: str = TRANSCRIPT_BACKEND, vad: str = TRANSCRIPT_VAD) -> Optional[Dict[str, Any]]:
+        """
+        Look up a transcription.
+
+        Args:
+            backend: backend_key() of the transcription (default: this process's)
+            vad: vad_key() of the transcription (default: this process's)
+
+        Returns:
+            {"transcript", "segments", "chunks", "language", "model", "backend", "vad"} or None
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT transcript, segments, chunks FROM transcripts "
+                "WHERE audio_hash = ? AND model = ? AND backend = ? AND vad = ? AND language = ?",
+                (audio_hash, model, backend, vad, language)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return {
+            "transcript": row[0],
+            "segments": json.loads(row[1]),
+            "chunks": json.loads(row[2]),
+            "language": language,
+            "model": model,
+            "backend": backend,
+            "vad": vad
+        }
+
+
+    def get_any(self, audio_hash: str, models: List[str], language: str,
+                backend: str = TRANSCRIPT_BACKEND, vad: str = TRANSCRIPT_VAD) -> Optional[Dict[str, Any]]:
+        """
+        Look up a transcription made by any of the given models (same backend and VAD).
+
+        Args:
+            models: Acceptable models in order of preference
+            backend: backend_key() of the transcription (default: this process's)
+            vad: vad_key() of the transcription (default: this process's)
+
+        Returns:
+            The most preferred cached transcription, or None
+        """
+        if not models:
+            return None
+        placeholders = ",".join("?" * len(models))
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT model FROM transcripts WHERE audio_hash = ? AND backend = ? AND vad = ? "
+                f"AND language = ? AND model IN ({placeholders})",
+                (audio_hash, backend, vad, language, *models)
+            ).fetchall()
+        cached = {row[0] for row in rows}
+        for model in models:
+            if model in cached:
+                return self.get(audio_hash, model, language, backend, vad)
+        with self._lock:
+            self.misses += 1
+        return None
+
+
+    def put(self, audio_hash: str, model: str, language: str, transcript: str,
+            segments: List[Dict[str, Any]], chunks: List[Any], backend: str = TRANSCRIPT_BACKEND,
+            vad: str = TRANSCRIPT_VAD):
+        """
+        Store a transcription.
+
+        Args:
+            audio_hash: sha256 of the audio bytes
+            model: Whisper model name
+            language: Transcription language
+            transcript: Full transcript
+            segments: Segments ({"start", "end", "text"})
+            chunks: Chunks as stored in memory
+            backend: backend_key() of the transcription (default: this process's)
+            vad: vad_key() of the transcription (default: this process's)
+        """
+        segments = [
+            {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+            for seg in segments
+        ]
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO transcripts "
+                "(audio_hash, model, backend, vad, language, transcript, segments, chunks, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (audio_hash, model, backend, vad, language, transcript,
+                 json.dumps(segments), json.dumps(chunks), time.time())
+            )
+            self._db.commit()
+
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get cache statistics.
+
+        Returns:
+            Stored transcript count and lookup hit/miss counters
+        """
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM transcripts").fetchone()[0]
+            return {
+                "stored_transcripts": count,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+
+# Global instance
+transcript_cache = None
+
+def get_transcript_cache() -> Optional[TranscriptCache]:
+    """
+    Get or create singleton TranscriptCache instance.
+    Returns None when the cache is disabled or cannot be opened.
+    """
+    global transcript_cache
+    if transcript_cache is None and TRANSCRIPT_CACHE_ENABLED:
+        try:
+            transcript_cache = TranscriptCache()
+        except Exception as e:
+            logger.warning(f"⚠ Transcript cache unavailable, transcribing every upload: {e}")
+            return None
+    return transcript_cache
@@ -0,0 +1,131 @@
+"""
+Voice Activity Detection - Skip silence before transcription
+Energy-based, streaming VAD that keeps only speech frames and records how
+the compacted speech timeline maps back to the original recording
+"""
+
+import bisect
+import os
+from collections import deque
+from typing import Deque, List, Tuple
+
+import numpy as np
+
+# VAD configuration (override with environment variables)
+VAD_ENABLED = os.getenv("WHISPER_VAD", "0") == "1"
+VAD_FRAME_MS = 30
+VAD_MIN_DB = float(os.getenv("VAD_MIN_DB", "-50"))        # frames quieter than this are never speech
+VAD_MARGIN_DB = float(os.getenv("VAD_MARGIN_DB", "8"))    # speech must exceed the noise floor by this much
+VAD_HANGOVER_MS = int(os.getenv("VAD_HANGOVER_MS", "400"))  # keep after speech ends (trailing syllables)
+VAD_PREROLL_MS = int(os.getenv("VAD_PREROLL_MS", "200"))    # keep before speech starts (onsets)
+NOISE_FLOOR_ALPHA = 0.05                                    # EMA rate of the noise floor on silent frames
+
+
+def vad_key(enabled: bool = VAD_ENABLED) -> str:
+    """
+    Identify the VAD settings a transcription was made with ("off", or the
+    thresholds); transcripts with different settings keep different audio.
+    """
+    if not enabled:
+        return "off"
+    return f"min{VAD_MIN_DB:g}:margin{VAD_MARGIN_DB:g}:hang{VAD_HANGOVER_MS}:pre{VAD_PREROLL_MS}"
+
+
+class StreamingVAD:
+    """
+    Frame-level energy VAD over a stream of 16 kHz float32 blocks.
+
+    process() returns only the speech samples (with pre-roll and hangover)
+    and extends the span map used by to_original().
+    """
+
+    def __init__(self, sample_rate: int = 16000):
+        """
+        Args:
+            sample_rate: Input sample rate
+        """
+        self.sample_rate = sample_rate
+        self.frame = sample_rate * VAD_FRAME_MS // 1000
+        self.hangover_frames = VAD_HANGOVER_MS // VAD_FRAME_MS
+        self.preroll: Deque[Tuple[int, np.ndarray]] = deque(maxlen=max(1, VAD_PREROLL_MS // VAD_FRAME_MS))
+        self.noise_db = None
+        self._hang = 0
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._next_frame = 0        # original frame index of the next input frame
+        self._last_kept = -2        # original frame index of the last kept frame
+        self._kept_frames = 0
+        # Kept runs of consecutive frames: compact start frame -> original start frame
+        self._span_starts: List[int] = []
+        self._span_origins: List[int] = []
+
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        """
+        Filter one block of audio.
+
+        Returns:
+            Speech samples from this block (possibly empty)
+        """
+        samples = np.concatenate([self._remainder, samples])
+        n_frames = len(samples) // self.frame
+        self._remainder = samples[n_frames * self.frame:]
+        if n_frames == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        frames = samples[:n_frames * self.frame].reshape(n_frames, self.frame)
+        energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+        if self.noise_db is None:
+            self.noise_db = float(np.percentile(energy_db, 10))
+
+        kept: List[np.ndarray] = []
+        for i in range(n_frames):
+            index = self._next_frame + i
+            level = energy_db[i]
+            if level > max(VAD_MIN_DB, self.noise_db + VAD_MARGIN_DB):
+                while self.preroll:
+                    kept.append(self._keep(*self.preroll.popleft()))
+                kept.append(self._keep(index, frames[i]))
+                self._hang = self.hangover_frames
+            elif self._hang > 0:
+                kept.append(self._keep(index, frames[i]))
+                self._hang -= 1
+            else:
+                self.noise_db += NOISE_FLOOR_ALPHA * (level - self.noise_db)
+                self.preroll.append((index, frames[i]))
+
+        self._next_frame += n_frames
+        return np.concatenate(kept) if kept else np.zeros(0, dtype=np.float32)
+
+
+    def _keep(self, index: int, frame: np.ndarray) -> np.ndarray:
+        if index != self._last_kept + 1:
+            self._span_starts.append(self._kept_frames)
+            self._span_origins.append(index)
+        self._last_kept = index
+        self._kept_frames += 1
+        return frame
+
+
+    def to_original(self, seconds: float, is_end: bool = False) -> float:
+        """
+        Map a time on the compacted speech timeline to the original recording.
+
+        Args:
+            seconds: Compacted time
+            is_end: Map an end time (a boundary belongs to the span it closes)
+        """
+        if not self._span_starts:
+            return seconds
+        frame_seconds = VAD_FRAME_MS / 1000
+        position = seconds / frame_seconds
+        if is_end:
+            i = bisect.bisect_left(self._span_starts, position) - 1
+        else:
+            i = bisect.bisect_right(self._span_starts, position) - 1
+        i = max(i, 0)
+        return round((self._span_origins[i] + position - self._span_starts[i]) * frame_seconds, 2)
+
+
+    def speech_ratio(self) -> float:
+        """Fraction of processed audio kept as speech."""
+        return self._kept_frames / self._next_frame if self._next_frame else 0.0
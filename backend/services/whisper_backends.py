@@ -0,0 +1,124 @@
+"""
+Whisper Backends - Pluggable CPU inference
+Loads a Whisper model through one of several implementations behind a
+common transcribe() call, selected with WHISPER_BACKEND
+"""
+
+import os
+from typing import Any, Dict, Optional, Union
+
+import numpy as np
+
+# Backend configuration (override with environment variables)
+OPENAI_BACKEND = "openai"                  # openai-whisper, FP32
+OPENAI_INT8_BACKEND = "openai-int8"        # openai-whisper, int8 dynamic quantization of Linear layers
+FASTER_WHISPER_BACKEND = "faster-whisper"  # CTranslate2 (pip install faster-whisper)
+WHISPER_BACKENDS = [OPENAI_BACKEND, OPENAI_INT8_BACKEND, FASTER_WHISPER_BACKEND]
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", OPENAI_BACKEND)
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "int8")   # faster-whisper only
+
+Audio = Union[str, np.ndarray]
+
+
+class OpenAIWhisperBackend:
+    """
+    openai-whisper on CPU, optionally with int8-quantized Linear layers.
+    """
+
+    def __init__(self, model_name: str, quantize: bool = False):
+        """
+        Args:
+            model_name: Whisper model size
+            quantize: Apply torch dynamic int8 quantization (encoder/decoder Linear layers)
+        """
+        import torch
+        import whisper
+        self.model = whisper.load_model(model_name, device="cpu")
+        if quantize:
+            # whisper's Linear only adds dtype casting; quantize_dynamic matches exact types
+            for module in self.model.modules():
+                if isinstance(module, whisper.model.Linear):
+                    module.__class__ = torch.nn.Linear
+            self.model = torch.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+    def transcribe(self, audio: Audio, language: str, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        result = self.model.transcribe(
+            audio,
+            fp16=False,  # Use FP32 for CPU compatibility
+            language=language,
+            initial_prompt=initial_prompt
+        )
+        return {
+            "text": result["text"].strip(),
+            "segments": result.get("segments", []),
+            "language": result.get("language", language)
+        }
+
+
+class FasterWhisperBackend:
+    """
+    CTranslate2 Whisper (faster-whisper) with quantized weights.
+    """
+
+    def __init__(self, model_name: str, compute_type: str = WHISPER_COMPUTE_TYPE, threads: int = 0):
+        """
+        Args:
+            model_name: Whisper model size
+            compute_type: CTranslate2 compute type (int8, int8_float32, float32)
+            threads: CPU threads (0 = CTranslate2 default)
+        """
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError as e:
+            raise RuntimeError("WHISPER_BACKEND=faster-whisper needs 'pip install faster-whisper'") from e
+        self.model = WhisperModel(model_name, device="cpu", compute_type=compute_type, cpu_threads=threads)
+
+
+    def transcribe(self, audio: Audio, language: str, initial_prompt: Optional[str] = None) -> Dict[str, Any]:
+        segments, info = self.model.transcribe(
+            audio,
+            language=language,
+            initial_prompt=initial_prompt,
+            beam_size=1  # greedy, like openai-whisper's transcribe()
+        )
+        segments = [
+            {"start": seg.start, "end": seg.end, "text": seg.text}
+            for seg in segments
+        ]
+        return {
+            "text": "".join(seg["text"] for seg in segments).strip(),
+            "segments": segments,
+            "language": info.language or language
+        }
+
+
+def backend_key(backend: str = WHISPER_BACKEND, compute_type: str = WHISPER_COMPUTE_TYPE) -> str:
+    """
+    Identify the numerics a backend transcribes with (e.g. "openai",
+    "openai-int8", "faster-whisper:int8"); outputs differ between them.
+    """
+    if backend == FASTER_WHISPER_BACKEND:
+        return f"{backend}:{compute_type}"
+    return backend
+
+
+def load_backend(model_name: str, backend: str = WHISPER_BACKEND, threads: int = 0):
+    """
+    Load a Whisper model with the given backend.
+
+    Args:
+        model_name: Whisper model size
+        backend: One of WHISPER_BACKENDS
+        threads: CPU threads for backends that take them (0 = default)
+
+    Raises:
+        ValueError if the backend is unknown
+    """
+    if backend == OPENAI_BACKEND:
+        return OpenAIWhisperBackend(model_name)
+    if backend == OPENAI_INT8_BACKEND:
+        return OpenAIWhisperBackend(model_name, quantize=True)
+    if backend == FASTER_WHISPER_BACKEND:
+        return FasterWhisperBackend(model_name, threads=threads)
+    raise ValueError(f"Unknown Whisper backend '{backend}' (available: {', '.join(WHISPER_BACKENDS)})")
@@ -0,0 +1,323 @@
+"""
+Whisper Models - Tiered, warm model pool
+Keeps a configurable set of Whisper sizes loaded, picks a tier per request
+(explicitly or from audio duration and queue depth) and evicts idle models
+under memory pressure, on use and from a periodic sweep
+"""
+
+import asyncio
+import logging
+import os
+import subprocess
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional
+
+from services.executor_service import run_in_pool, STORAGE_POOL, WHISPER_POOL
+from services.whisper_service import WhisperService, WHISPER_MODEL, WHISPER_PROCESSES
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Tier configuration (override with environment variables)
+AUTO_TIER = "auto"
+WHISPER_TIERS = [t.strip() for t in os.getenv("WHISPER_TIERS", "tiny,base,small").split(",") if t.strip()]
+WHISPER_WARM_TIERS = [t.strip() for t in os.getenv("WHISPER_WARM_TIERS", WHISPER_MODEL).split(",") if t.strip()]
+WHISPER_DEFAULT_TIER = os.getenv("WHISPER_DEFAULT_TIER", WHISPER_MODEL)  # a tier or "auto"
+WHISPER_MAX_LOADED = int(os.getenv("WHISPER_MAX_LOADED", str(len(WHISPER_TIERS))))
+WHISPER_IDLE_SECONDS = int(os.getenv("WHISPER_IDLE_SECONDS", "300"))
+WHISPER_MIN_AVAILABLE_MB = int(os.getenv("WHISPER_MIN_AVAILABLE_MB", "1024"))
+WHISPER_SWEEP_SECONDS = int(os.getenv("WHISPER_SWEEP_SECONDS", str(WHISPER_IDLE_SECONDS)))
+
+# Automatic tier selection
+AUTO_SHORT_SECONDS = 120     # clips up to this long get the most accurate tier when idle
+AUTO_LONG_SECONDS = 3600     # recordings this long get the fastest tier
+AUTO_BUSY_QUEUE_DEPTH = 3    # waiting transcriptions that count as busy
+
+
+def available_memory_mb() -> Optional[int]:
+    """MemAvailable from /proc/meminfo (None where unavailable)."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except OSError:
+        pass
+    return None
+
+
+def audio_duration(audio_path: str) -> Optional[float]:
+    """Duration in seconds via ffprobe (None if it cannot be read)."""
+    try:
+        output = subprocess.run(
+            ["ffprobe", "-v", "error", "-show_entries", "format=duration", "-of", "csv=p=0", audio_path],
+            capture_output=True, text=True, timeout=30
+        ).stdout.strip()
+        return float(output) if output else None
+    except (OSError, ValueError, subprocess.SubprocessError):
+        return None
+
+
+class WhisperModelManager:
+    """
+    Loads Whisper tiers on demand and keeps them warm until evicted.
+    The default tier is never evicted.
+    """
+
+    def __init__(self, tiers: List[str] = WHISPER_TIERS, default_tier: str = WHISPER_DEFAULT_TIER,
+                 processes: int = WHISPER_PROCESSES):
+        """
+        Args:
+            tiers: Allowed model sizes, fastest first
+            default_tier: Tier used when a request does not choose one (or "auto")
+            processes: Worker processes per tier (0 = in-process model)
+        """
+        self.tiers = tiers
+        self.default_tier = default_tier
+        self.processes = processes
+        # Tier that always stays loaded
+        self.pinned_tier = WHISPER_MODEL if WHISPER_MODEL in tiers else tiers[0]
+        self._models: Dict[str, WhisperService] = {}
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._load_locks = {tier: threading.Lock() for tier in tiers}
+        self.loads = 0
+        self.evictions = 0
+
+
+    def resolve_tier(self, tier: Optional[str], duration: Optional[float] = None,
+                     queue_depth: int = 0) -> str:
+        """
+        Resolve a requested tier (None, "auto" or a size) to a configured tier.
+
+        Auto selection trades accuracy for speed as recordings get longer or
+        the transcription queue gets deeper.
+
+        Raises:
+            ValueError if the tier is not configured
+        """
+        tier = tier or self.default_tier
+        if tier != AUTO_TIER:
+            if tier not in self.tiers:
+                raise ValueError(f"Unknown Whisper tier '{tier}' (available: {', '.join(self.tiers)})")
+            return tier
+
+        if queue_depth >= AUTO_BUSY_QUEUE_DEPTH or (duration is not None and duration >= AUTO_LONG_SECONDS):
+            return self.tiers[0]
+        if queue_depth == 0 and duration is not None and duration <= AUTO_SHORT_SECONDS:
+            return self.tiers[-1]
+        return self.pinned_tier
+
+
+    def _evict(self, reserve: int = 0):
+        """
+        Evict idle tiers, least recently used first, while over the loaded-model
+        cap (leaving room for `reserve` new loads) or under memory pressure.
+        """
+        while True:
+            with self._lock:
+                loaded = len(self._models)
+                candidates = sorted(
+                    (tier for tier in self._models
+                     if tier != self.pinned_tier and not self._in_use.get(tier)),
+                    key=lambda tier: self._last_used.get(tier, 0.0)
+                )
+                available = available_memory_mb()
+                over_cap = loaded + reserve > WHISPER_MAX_LOADED
+                pressure = available is not None and available < WHISPER_MIN_AVAILABLE_MB
+                if pressure and not over_cap:
+                    now = time.time()
+                    candidates = [t for t in candidates if now - self._last_used.get(t, 0.0) >= WHISPER_IDLE_SECONDS]
+                if not candidates or not (over_cap or pressure):
+                    return
+                tier = candidates[0]
+                service = self._models.pop(tier)
+                self._last_used.pop(tier, None)
+                self.evictions += 1
+
+            service.close()
+            logger.info(f"✓ Evicted Whisper '{tier}' (available memory: {available} MB)")
+
+
+    def sweep(self):
+        """Evict idle tiers under memory pressure (called periodically, not only on use)."""
+        self._evict()
+
+
+    def _touch(self, tier: str, acquire: bool):
+        """Mark a tier used and optionally borrowed. Caller holds the lock."""
+        self._last_used[tier] = time.time()
+        if acquire:
+            self._in_use[tier] = self._in_use.get(tier, 0) + 1
+
+
+    def get(self, tier: str, acquire: bool = False) -> WhisperService:
+        """
+        Get a loaded tier, loading it if needed.
+
+        Args:
+            tier: Model size
+            acquire: Also mark the tier in use, under the same lock that hands
+                     out the service, so a concurrent eviction cannot close it
+                     (use() releases it)
+        """
+        if tier not in self.tiers:
+            raise ValueError(f"Unknown Whisper tier '{tier}'")
+
+        with self._load_locks[tier]:
+            with self._lock:
+                service = self._models.get(tier)
+                if service is not None:
+                    self._touch(tier, acquire)
+            if service is None:
+                self._evict(reserve=1)
+                service = WhisperService(model_name=tier, processes=self.processes)
+                with self._lock:
+                    self._models[tier] = service
+                    self.loads += 1
+                    self._touch(tier, acquire)
+
+        return service
+
+
+    @contextmanager
+    def use(self, tier: str) -> Iterator[WhisperService]:
+        """
+        Borrow a tier for one transcription; it is not evicted while in use.
+        """
+        service = self.get(tier, acquire=True)
+        try:
+            yield service
+        finally:
+            self._release(tier)
+            self._evict()
+
+
+    @asynccontextmanager
+    async def use_async(self, tier: str) -> AsyncIterator[WhisperService]:
+        """
+        use() for async callers. Loading and acquiring run on the Whisper pool
+        and eviction (which closes worker processes) on the storage pool, so
+        the event loop never waits on the tier locks, a model load or a close.
+        """
+        acquiring = asyncio.ensure_future(run_in_pool(WHISPER_POOL, self.get, tier, acquire=True))
+        try:
+            service = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # The load keeps running; give the tier back once it is acquired
+            def release(future: asyncio.Future):
+                if not future.cancelled() and future.exception() is None:
+                    self._release(tier)
+            acquiring.add_done_callback(release)
+            raise
+        try:
+            yield service
+        finally:
+            self._release(tier)
+            await run_in_pool(STORAGE_POOL, self._evict)
+
+
+    def _release(self, tier: str):
+        """Return a borrowed tier (lock only; eviction is left to the caller)."""
+        with self._lock:
+            self._in_use[tier] -= 1
+            self._last_used[tier] = time.time()
+
+
+    def warm_up(self, tiers: List[str] = WHISPER_WARM_TIERS):
+        """
+        Load the warm tiers (call at startup, off the event loop).
+        """
+        for tier in tiers:
+            if tier not in self.tiers:
+                continue
+            try:
+                self.get(tier)
+            except Exception as e:
+                logger.warning(f"⚠ Could not warm Whisper '{tier}': {e}")
+        logger.info(f"✓ Whisper tiers warm: {', '.join(self.loaded())}")
+
+
+    def loaded(self) -> List[str]:
+        """Currently loaded tiers."""
+        with self._lock:
+            return [tier for tier in self.tiers if tier in self._models]
+
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get loaded tiers, usage and eviction counters.
+        """
+        with self._lock:
+            now = time.time()
+            return {
+                "tiers": self.tiers,
+                "default_tier": self.default_tier,
+                "loaded": {
+                    tier: {
+                        "in_use": self._in_use.get(tier, 0),
+                        "idle_seconds": round(now - self._last_used.get(tier, now), 1)
+                    }
+                    for tier in self._models
+                },
+                "available_memory_mb": available_memory_mb(),
+                "loads": self.loads,
+                "evictions": self.evictions
+            }
+
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Default tier state for health checks. Never loads or borrows a tier,
+        so it does not wait behind a running transcription.
+        """
+        with self._lock:
+            service = self._models.get(self.pinned_tier)
+        return {
+            "model": self.pinned_tier,
+            "loaded": service is not None,
+            "backend": service.backend if service is not None else None,
+            "processes": service.pool.processes if service is not None and service.pool else 0,
+            "tiers": self.stats()
+        }
+
+
+    def close(self):
+        """Release every loaded tier."""
+        with self._lock:
+            services = list(self._models.values())
+            self._models.clear()
+        for service in services:
+            service.close()
+
+
+# Global instance
+whisper_models = None
+
+def get_whisper_models() -> WhisperModelManager:
+    """
+    Get or create singleton WhisperModelManager instance.
+    """
+    global whisper_models
+    if whisper_models is None:
+        whisper_models = WhisperModelManager()
+    return whisper_models
+
+
+async def sweep_idle_tiers(interval: float = WHISPER_SWEEP_SECONDS):
+    """
+    Evict idle tiers under memory pressure every `interval` seconds, so an
+    idle server frees memory too. Run as a lifespan task.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        if whisper_models is None:
+            continue
+        try:
+            await run_in_pool(STORAGE_POOL, whisper_models.sweep)
+        except Exception as e:
+            logger.warning(f"⚠ Whisper eviction sweep failed: {e}")
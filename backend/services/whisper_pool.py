@@ -0,0 +1,148 @@
+"""
+Whisper Process Pool - Multi-core transcription
+Worker processes each load the Whisper model once and transcribe audio
+windows from a shared queue; results are stitched back in order
+"""
+
+import logging
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import multiprocessing
+from typing import Any, Deque, Dict, Iterator, List, Tuple
+
+import numpy as np
+
+from services.vad import StreamingVAD, VAD_ENABLED
+from services.whisper_backends import load_backend, WHISPER_BACKEND
+from services.whisper_service import (
+    iter_audio_windows, stitch_segments, remap_window, SAMPLE_RATE,
+    STREAM_WINDOW_SECONDS, STREAM_OVERLAP_SECONDS, WHISPER_PROCESSES, WHISPER_LANGUAGE
+)
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Pool configuration (override with environment variables)
+WHISPER_THREADS_PER_PROCESS = int(os.getenv(
+    "WHISPER_THREADS_PER_PROCESS", str(max(1, (os.cpu_count() or 1) // max(1, WHISPER_PROCESSES)))
+))
+WINDOWS_IN_FLIGHT_PER_FILE = 2      # per worker, bounds decoded audio held per file
+
+# Worker-process state
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int, backend: str):
+    """Load the model once per worker process."""
+    global _worker_model
+    import torch
+    torch.set_num_threads(threads)
+    _worker_model = load_backend(model_name, backend, threads)
+
+
+def _transcribe_window(audio: np.ndarray, language: str) -> Dict[str, Any]:
+    """Transcribe one window in a worker process (window-relative times)."""
+    result = _worker_model.transcribe(audio, language=language)
+    return {
+        "segments": [
+            {"start": seg["start"], "end": seg["end"], "text": seg["text"]}
+            for seg in result["segments"]
+        ],
+        "language": result["language"]
+    }
+
+
+class WhisperProcessPool:
+    """
+    Process pool that transcribes audio windows in parallel.
+    Windows of one long file fan out across workers; windows of concurrent
+    files share the same queue.
+    """
+
+    def __init__(self, model_name: str = "base", processes: int = WHISPER_PROCESSES,
+                 threads_per_process: int = WHISPER_THREADS_PER_PROCESS, backend: str = WHISPER_BACKEND):
+        """
+        Args:
+            model_name: Whisper model size loaded by every worker
+            processes: Number of worker processes
+            threads_per_process: CPU threads per worker (avoids oversubscription)
+            backend: Inference backend loaded by every worker
+        """
+        self.model_name = model_name
+        self.processes = max(1, processes)
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads_per_process, backend)
+        )
+        logger.info(
+            f"✓ Whisper process pool: {self.processes} workers x {threads_per_process} threads "
+            f"('{model_name}', {backend})"
+        )
+
+    def transcribe_stream(self, audio_path: str,
+                          window_seconds: int = STREAM_WINDOW_SECONDS,
+                          overlap_seconds: int = STREAM_OVERLAP_SECONDS,
+                          language: str = WHISPER_LANGUAGE) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe windows in parallel and yield them in order.
+        Same output as WhisperService.transcribe_stream, except that windows
+        are not prompted with the previous window's text (they run concurrently).
+        """
+        max_in_flight = self.processes * WINDOWS_IN_FLIGHT_PER_FILE
+        in_flight: Deque[Tuple[float, float, bool, Future]] = deque()
+        committed_end = 0.0
+        vad = StreamingVAD(SAMPLE_RATE) if VAD_ENABLED else None
+
+        def finish_oldest() -> Dict[str, Any]:
+            nonlocal committed_end
+            offset, end, is_last, future = in_flight.popleft()
+            result = future.result()
+            cut = None if is_last else end - overlap_seconds / 2
+            segments = stitch_segments(result["segments"], offset, committed_end, cut)
+            if segments:
+                committed_end = max(committed_end, segments[-1]["end"])
+            return remap_window({
+                "start": round(offset, 2),
+                "end": round(end, 2),
+                "segments": segments,
+                "language": result["language"],
+                "is_last": is_last
+            }, vad)
+
+        try:
+            for offset, audio, is_last in iter_audio_windows(audio_path, window_seconds, overlap_seconds, vad):
+                end = offset + len(audio) / SAMPLE_RATE
+                future = self.executor.submit(_transcribe_window, audio, language)
+                in_flight.append((offset, end, is_last, future))
+                if len(in_flight) >= max_in_flight:
+                    yield finish_oldest()
+            while in_flight:
+                yield finish_oldest()
+        finally:
+            for _, _, _, future in in_flight:
+                future.cancel()
+
+    def transcribe(self, audio_path: str) -> Dict[str, Any]:
+        """
+        Transcribe a whole file across the pool.
+        Same output as WhisperService.transcribe.
+        """
+        segments: List[Dict[str, Any]] = []
+        language = WHISPER_LANGUAGE
+        for window in self.transcribe_stream(audio_path):
+            segments.extend(window["segments"])
+            language = window["language"]
+        return {
+            "transcript": " ".join(seg["text"] for seg in segments),
+            "segments": segments,
+            "language": language
+        }
+
+    def shutdown(self):
+        """Stop worker processes."""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("✓ Whisper process pool shut down")
@@ -4,33 +4,176 @@ Handles audio transcription using OpenAI Whisper (local)
 """
 
 import logging
-import whisper
+import subprocess
+import numpy as np
 import os
-from typing import List, Dict, Any
-import re
+from typing import List, Dict, Any, Iterator, Optional, Tuple
+
+from services.chunking import chunk_segments, TRANSCRIPT_CHUNK_TOKENS, TRANSCRIPT_OVERLAP_TOKENS
+from services.vad import StreamingVAD, VAD_ENABLED
+from services.whisper_backends import load_backend, WHISPER_BACKEND
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Model and language (override with environment variables)
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+WHISPER_LANGUAGE = os.getenv("WHISPER_LANGUAGE", "en")
+
+# Streaming transcription (override with environment variables)
+SAMPLE_RATE = 16000                 # Whisper's expected input rate
+STREAM_WINDOW_SECONDS = int(os.getenv("WHISPER_WINDOW_SECONDS", "30"))
+STREAM_OVERLAP_SECONDS = int(os.getenv("WHISPER_OVERLAP_SECONDS", "2"))
+OVERLAP_TOLERANCE = 0.5             # seconds of slack when dropping repeated segments
+PROMPT_CHARS = 200                  # previous text passed as the next window's prompt
+
+# Multi-process transcription (0 = transcribe in the calling thread)
+WHISPER_PROCESSES = int(os.getenv("WHISPER_PROCESSES", "0"))
+
+
+def iter_pcm_blocks(audio_path: str, block_samples: int) -> Iterator[np.ndarray]:
+    """
+    Decode audio through an ffmpeg pipe as float32 mono 16 kHz blocks.
+
+    Raises:
+        RuntimeError if ffmpeg produced no audio
+    """
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", audio_path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE),
+        "-loglevel", "error", "-"
+    ]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    decoded = 0
+
+    try:
+        while True:
+            raw = process.stdout.read(block_samples * 2)
+            raw = raw[:len(raw) - len(raw) % 2]
+            if not raw:
+                break
+            decoded += len(raw)
+            yield np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+        if decoded == 0:
+            raise RuntimeError(f"ffmpeg could not decode audio: {audio_path}")
+    finally:
+        process.kill()
+        process.wait()
+
+
+def iter_audio_windows(audio_path: str,
+                       window_seconds: int = STREAM_WINDOW_SECONDS,
+                       overlap_seconds: int = STREAM_OVERLAP_SECONDS,
+                       vad: Optional[StreamingVAD] = None) -> Iterator[Tuple[float, np.ndarray, bool]]:
+    """
+    Decode audio through an ffmpeg pipe and yield overlapping windows.
+    Only about one window of samples is held in memory at a time.
+
+    Args:
+        audio_path: Path to audio file
+        window_seconds: Window length
+        overlap_seconds: Overlap between consecutive windows
+        vad: Drop non-speech before windowing; offsets are then on the
+             compacted speech timeline (map back with vad.to_original)
+
+    Yields:
+        (offset_seconds, float32 mono 16 kHz samples, is_last)
+    """
+    window = window_seconds * SAMPLE_RATE
+    step = (window_seconds - overlap_seconds) * SAMPLE_RATE
+    buffer = np.zeros(0, dtype=np.float32)
+    offset = 0
+
+    for block in iter_pcm_blocks(audio_path, window):
+        if vad is not None:
+            block = vad.process(block)
+        buffer = np.concatenate([buffer, block])
+        while len(buffer) >= window:
+            yield offset / SAMPLE_RATE, buffer[:window], False
+            buffer = buffer[step:]
+            offset += step
+
+    # An overlap-only tail is still yielded: the previous window left
+    # segments past its cut point to this one
+    if len(buffer) > 0:
+        yield offset / SAMPLE_RATE, buffer, True
+
+
+def remap_window(window: Dict[str, Any], vad: Optional[StreamingVAD]) -> Dict[str, Any]:
+    """
+    Map a stitched window from the VAD's compacted timeline back to the recording.
+    """
+    if vad is None:
+        return window
+    return {
+        **window,
+        "start": vad.to_original(window["start"]),
+        "end": vad.to_original(window["end"], is_end=True),
+        "segments": [
+            {**seg, "start": vad.to_original(seg["start"]), "end": vad.to_original(seg["end"], is_end=True)}
+            for seg in window["segments"]
+        ]
+    }
+
+
+def stitch_segments(segments: List[Dict[str, Any]], offset: float,
+                    committed_end: float, cut: Optional[float]) -> List[Dict[str, Any]]:
+    """
+    Shift one window's segments onto the recording timeline and drop the
+    ones that repeat the previous window's overlap.
+
+    Args:
+        segments: Whisper segments for the window (window-relative times)
+        offset: Window start in the recording (seconds)
+        committed_end: End of the last segment already kept
+        cut: Midpoint of the overlap with the next window (None for the last window);
+             segments starting after it are left to the next window
+
+    Returns:
+        Kept segments as {"start", "end", "text"} on the recording timeline
+    """
+    kept = []
+    for segment in segments:
+        start = segment["start"] + offset
+        end = segment["end"] + offset
+        text = segment["text"].strip()
+        if not text or start < committed_end - OVERLAP_TOLERANCE:
+            continue
+        if cut is not None and start >= cut:
+            continue
+        kept.append({"start": round(start, 2), "end": round(end, 2), "text": text})
+        committed_end = max(committed_end, end)
+    return kept
+
 
 class WhisperService:
     """
     Service for audio transcription using Whisper.
-    Converts speech to text and chunks into meaningful segments.
+    Converts speech to text and chunks it into timestamped passages.
     """
     
-    def __init__(self, model_name: str = "base"):
+    def __init__(self, model_name: str = "base", processes: int = 0, backend: str = WHISPER_BACKEND):
         """
         Initialize Whisper service with specified model.
         
         Args:
             model_name: Whisper model size (tiny, base, small, medium, large)
                        'base' is recommended for balance of speed/accuracy
+            processes: Worker processes for parallel transcription (0 = in-process model)
+            backend: Inference backend (openai, openai-int8, faster-whisper)
         """
+        self.model_name = model_name
+        self.backend = backend
+        self.model = None
+        self.pool = None
         try:
-            logger.info(f"Loading Whisper model '{model_name}'...")
-            self.model = whisper.load_model(model_name)
+            if processes > 0:
+                from services.whisper_pool import WhisperProcessPool
+                self.pool = WhisperProcessPool(model_name=model_name, processes=processes, backend=backend)
+                return
+            logger.info(f"Loading Whisper model '{model_name}' ({backend})...")
+            self.model = load_backend(model_name, backend)
             logger.info(f"✓ Whisper model '{model_name}' loaded successfully")
         except Exception as e:
             logger.error(f"Failed to load Whisper model: {e}")
@@ -53,22 +196,25 @@ class WhisperService:
             
             logger.info(f"Transcribing audio file: {audio_path}")
             
-            # Transcribe with Whisper
-            result = self.model.transcribe(
-                audio_path,
-                fp16=False,  # Use FP32 for CPU compatibility
-                language="en"  # Can be set to None for auto-detect
-            )
+            # Fan windows out across worker processes
+            if self.pool is not None:
+                result = self.pool.transcribe(audio_path)
+                logger.info(f"✓ Transcription complete: {len(result['transcript'])} characters")
+                return result
             
-            full_text = result["text"].strip()
-            segments = result.get("segments", [])
+            # Transcribe only the speech regions, then map times back
+            if VAD_ENABLED:
+                return self._transcribe_speech(audio_path)
             
-            logger.info(f"✓ Transcription complete: {len(full_text)} characters")
+            # Transcribe with Whisper
+            result = self.model.transcribe(audio_path, language=WHISPER_LANGUAGE)
+            
+            logger.info(f"✓ Transcription complete: {len(result['text'])} characters")
             
             return {
-                "transcript": full_text,
-                "segments": segments,
-                "language": result.get("language", "en")
+                "transcript": result["text"],
+                "segments": result["segments"],
+                "language": result["language"]
             }
             
         except Exception as e:
@@ -76,83 +222,131 @@ class WhisperService:
             raise
     
     
-    def chunk_transcript(self, transcript: str, chunk_size: int = 500) -> List[str]:
+    def _transcribe_speech(self, audio_path: str) -> Dict[str, Any]:
+        """
+        Transcribe a file with silence removed by the VAD pre-pass.
+        Segment times are mapped back to the original recording.
         """
-        Split transcript into meaningful chunks for memory storage.
-        Attempts to split on sentence boundaries.
+        vad = StreamingVAD(SAMPLE_RATE)
+        speech = [vad.process(block) for block in iter_pcm_blocks(audio_path, STREAM_WINDOW_SECONDS * SAMPLE_RATE)]
+        speech = np.concatenate(speech) if speech else np.zeros(0, dtype=np.float32)
+        logger.info(f"VAD kept {vad.speech_ratio():.0%} of the audio as speech")
+        
+        if len(speech) == 0:
+            return {"transcript": "", "segments": [], "language": WHISPER_LANGUAGE}
+        
+        result = self.model.transcribe(speech, language=WHISPER_LANGUAGE)
+        segments = [
+            {**seg, "start": vad.to_original(seg["start"]), "end": vad.to_original(seg["end"], is_end=True)}
+            for seg in result["segments"]
+        ]
+        
+        logger.info(f"✓ Transcription complete: {len(result['text'])} characters")
+        
+        return {
+            "transcript": result["text"],
+            "segments": segments,
+            "language": result["language"]
+        }
+    
+    
+    def transcribe_stream(self, audio_path: str,
+                          window_seconds: int = STREAM_WINDOW_SECONDS,
+                          overlap_seconds: int = STREAM_OVERLAP_SECONDS) -> Iterator[Dict[str, Any]]:
+        """
+        Transcribe audio window by window, yielding each window as it finishes.
+        Peak memory is one window instead of the whole decoded recording.
         
         Args:
-            transcript: Full transcript text
-            chunk_size: Target size for each chunk (characters)
+            audio_path: Path to audio file
+            window_seconds: Window length
+            overlap_seconds: Overlap between windows (keeps words at boundaries intact)
         
-        Returns:
-            List of text chunks
+        Yields:
+            {"start", "end", "segments", "language", "is_last"} per window
+            (times on the original recording, also with WHISPER_VAD=1)
         """
-        try:
-            # Split into sentences
-            sentences = re.split(r'(?<=[.!?])\s+', transcript)
-            
-            chunks = []
-            current_chunk = ""
-            
-            for sentence in sentences:
-                # If adding this sentence would exceed chunk_size and we have content
-                if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-                    chunks.append(current_chunk.strip())
-                    current_chunk = sentence
-                else:
-                    current_chunk += " " + sentence if current_chunk else sentence
-            
-            # Add final chunk
-            if current_chunk.strip():
-                chunks.append(current_chunk.strip())
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(f"Audio file not found: {audio_path}")
+        
+        logger.info(f"Streaming transcription: {audio_path}")
+        if self.pool is not None:
+            yield from self.pool.transcribe_stream(audio_path, window_seconds, overlap_seconds, WHISPER_LANGUAGE)
+            return
+        
+        committed_end = 0.0
+        prompt = None
+        vad = StreamingVAD(SAMPLE_RATE) if VAD_ENABLED else None
+        
+        for offset, audio, is_last in iter_audio_windows(audio_path, window_seconds, overlap_seconds, vad):
+            result = self.model.transcribe(audio, language=WHISPER_LANGUAGE, initial_prompt=prompt)
             
-            logger.info(f"✓ Split transcript into {len(chunks)} chunks")
-            return chunks
+            end = offset + len(audio) / SAMPLE_RATE
+            cut = None if is_last else end - overlap_seconds / 2
+            segments = stitch_segments(result["segments"], offset, committed_end, cut)
+            if segments:
+                committed_end = max(committed_end, segments[-1]["end"])
+                prompt = " ".join(seg["text"] for seg in segments)[-PROMPT_CHARS:]
             
-        except Exception as e:
-            logger.error(f"Failed to chunk transcript: {e}")
-            # Fallback: return as single chunk
-            return [transcript]
+            yield remap_window({
+                "start": round(offset, 2),
+                "end": round(end, 2),
+                "segments": segments,
+                "language": result["language"],
+                "is_last": is_last
+            }, vad)
     
     
-    def transcribe_and_chunk(self, audio_path: str, chunk_size: int = 500) -> Dict[str, Any]:
+    def transcribe_and_chunk(self, audio_path: str,
+                             max_tokens: int = TRANSCRIPT_CHUNK_TOKENS,
+                             overlap_tokens: int = TRANSCRIPT_OVERLAP_TOKENS) -> Dict[str, Any]:
         """
         Complete pipeline: transcribe audio and split into chunks.
         
         Args:
             audio_path: Path to audio file
-            chunk_size: Target chunk size
+            max_tokens: Maximum tokens per chunk
+            overlap_tokens: Tokens repeated between consecutive chunks
         
         Returns:
-            Dictionary with full transcript and chunks
+            Dictionary with full transcript, segments and timestamped chunks
         """
         # Transcribe
         transcription = self.transcribe(audio_path)
         
-        # Chunk
-        chunks = self.chunk_transcript(
-            transcription["transcript"],
-            chunk_size=chunk_size
-        )
+        # Chunk on segment boundaries, keeping start/end times
+        chunks = chunk_segments(transcription["segments"], max_tokens, overlap_tokens)
+        logger.info(f"✓ Split transcript into {len(chunks)} chunks")
         
         return {
             "transcript": transcription["transcript"],
             "language": transcription["language"],
+            "segments": transcription["segments"],
             "chunks": chunks,
             "num_chunks": len(chunks)
         }
 
 
-# Global instance
-whisper_service = None
+    def close(self):
+        """Stop worker processes (if any)."""
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
 
 def get_whisper_service() -> WhisperService:
     """
-    Get or create singleton WhisperService instance.
+    Get the default-tier WhisperService from the model manager.
     Lazy loading to avoid model loading on import.
     """
-    global whisper_service
-    if whisper_service is None:
-        whisper_service = WhisperService(model_name="base")
-    return whisper_service
+    from services.whisper_models import get_whisper_models
+    models = get_whisper_models()
+    return models.get(models.pinned_tier)
+
+
+def shutdown_whisper_service():
+    """
+    Release every loaded Whisper tier.
+    """
+    from services.whisper_models import get_whisper_models
+    get_whisper_models().close()
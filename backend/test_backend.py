@@ -262,6 +262,42 @@ def test_memory_stats() -> Dict[str, Any]:
         return {}
 
 
+def test_llm_cache_skips_sampled_answers() -> bool:
+    """Test that sampled (temperature 0.7) answers are not cached"""
+    print("\n" + "="*60)
+    print("TEST 7: LLM Cache Skips Sampled Answers")
+    print("="*60)
+    
+    try:
+        def cache_stats() -> Dict[str, Any]:
+            health = requests.get(f"{BASE_URL}/health", timeout=10).json()
+            return health.get('cache', {}).get('llm_responses', {})
+        
+        before = cache_stats()
+        payload = {"question": "Explain paging in one sentence.", "use_memory": False}
+        for _ in range(2):
+            response = requests.post(f"{BASE_URL}/ai/ask", json=payload, timeout=120)
+            if response.status_code != 200:
+                print_error(f"Failed: {response.json().get('detail', 'Unknown error')}")
+                return False
+        after = cache_stats()
+        
+        skipped = after.get('skipped', 0) - before.get('skipped', 0)
+        stores = after.get('stores', 0) - before.get('stores', 0)
+        hits = sum(after.get(k, 0) - before.get(k, 0) for k in ('memory_hits', 'disk_hits', 'semantic_hits'))
+        print_info(f"Skipped: {skipped}, stored: {stores}, hits: {hits}")
+        
+        if skipped >= 2 and stores == 0 and hits == 0:
+            print_success("Explain call at temperature 0.7 bypassed the cache")
+            return True
+        print_error("Sampled answer was cached or replayed")
+        return False
+        
+    except Exception as e:
+        print_error(f"LLM cache check failed: {e}")
+        return False
+
+
 def main():
     """Run all tests"""
     print("\n" + "="*60)
@@ -285,6 +321,7 @@ def main():
         ("Generate Flashcards", test_generate_flashcards),
         ("Create Study Plan", test_create_study_plan),
         ("Memory Stats", test_memory_stats),
+        ("LLM Cache Skips Sampled Answers", test_llm_cache_skips_sampled_answers),
     ]
     
     results = {}